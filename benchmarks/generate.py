@@ -0,0 +1,198 @@
+import argparse
+import csv
+import json
+import random
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from pydantic import BaseModel
+
+# (source table, source column, target table, target column, transformation)
+Edge = Tuple[int, int, int, int, int]
+
+
+class DatasetSpec(BaseModel):
+    """
+    Shape of a synthetic lineage dataset. The same spec and seed always generate the same dataset.
+
+    :param systems: Number of systems, the tables are spread evenly over them
+    :param tables: Number of tables
+    :param columns: Number of columns per table
+    :param edges: Number of lineage relationships (column to column)
+    :param source_code_reuse: Probability that a lineage relationship reuses the transformation of a previous one
+        instead of having its own
+    :param files: Number of csv files, or number of codebase files for the v1 lineage.json
+    :param seed: Seed of the random generator
+    """
+
+    systems: int = 2
+    tables: int = 1000
+    columns: int = 20
+    edges: int = 1000
+    source_code_reuse: float = 0.5
+    files: int = 1
+    seed: int = 0
+
+
+def iter_edges(spec: DatasetSpec) -> Iterator[Edge]:
+    """
+    Yields the lineage relationships of the dataset. Transformations are numbered in order of appearance, so the
+    source code of a transformation is derived from its number and nothing but a counter is kept in memory.
+    """
+    rng = random.Random(spec.seed)
+    transformations = 0
+    for _ in range(spec.edges):
+        if transformations and rng.random() < spec.source_code_reuse:
+            transformation = rng.randrange(transformations)
+        else:
+            transformation = transformations
+            transformations += 1
+        yield (
+            rng.randrange(spec.tables),
+            rng.randrange(spec.columns),
+            rng.randrange(spec.tables),
+            rng.randrange(spec.columns),
+            transformation,
+        )
+
+
+def _table_path(spec: DatasetSpec, table: int) -> List[Tuple[str, str]]:
+    # (type, name) of the nodes and parent of a table
+    return [
+        ("System", f"system_{table % spec.systems}"),
+        ("Database", f"DB_{table % spec.systems}"),
+        ("Schema", "PUBLIC"),
+        ("Table", f"T{table}"),
+    ]
+
+
+def source_code_text(spec: DatasetSpec, transformation: int) -> str:
+    return (
+        f"CREATE OR REPLACE VIEW PUBLIC.V{transformation} AS\n"
+        f"SELECT C{transformation % spec.columns} FROM PUBLIC.T{transformation % spec.tables};\n"
+    )
+
+
+def generate_csv(output_directory: str, spec: DatasetSpec) -> List[Path]:
+    """
+    Generates csv files for tools.ingest_csv; the lineage relationships are split evenly over `spec.files` files.
+
+    :returns: the paths of the csv files
+    :rtype: List[Path]
+    """
+    output_path = Path(output_directory)
+    output_path.mkdir(parents=True, exist_ok=True)
+    header = ["System", "Database", "Schema", "Table", "Column", "fullname", "domain_id"] * 2 + [
+        "source_code",
+        "highlights",
+        "transformation_display_name",
+    ]
+    csv_paths = [output_path / f"lineage_{index:05d}.csv" for index in range(spec.files)]
+    csv_files = [open(csv_path, "w", newline="", encoding="utf-8") for csv_path in csv_paths]
+    try:
+        csv_writers = [csv.writer(csv_file) for csv_file in csv_files]
+        for csv_writer in csv_writers:
+            csv_writer.writerow(header)
+        edges_per_file = -(-spec.edges // spec.files)
+        for index, (src_table, src_column, trg_table, trg_column, transformation) in enumerate(iter_edges(spec)):
+            source_code = source_code_text(spec, transformation)
+            csv_writers[index // edges_per_file].writerow(
+                [name for _, name in _table_path(spec, src_table)]
+                + [f"C{src_column}", "", ""]
+                + [name for _, name in _table_path(spec, trg_table)]
+                + [f"C{trg_column}", "", ""]
+                + [source_code, f"[0:{len(source_code)}]", f"transformation_{transformation}"]
+            )
+    finally:
+        for csv_file in csv_files:
+            csv_file.close()
+    return csv_paths
+
+
+def generate_v1(output_directory: str, spec: DatasetSpec) -> Path:
+    """
+    Generates an advanced custom technical lineage v1 lineage.json, and its codebase files, for
+    tools.translate_to_batch_format. The lineages are written one by one, so large datasets can be generated.
+
+    :returns: the path of lineage.json
+    :rtype: Path
+    """
+    output_path = Path(output_directory)
+    output_path.mkdir(parents=True, exist_ok=True)
+    lineage_path = output_path / "lineage.json"
+    transformations = 0
+    with open(lineage_path, "w") as out_file:
+        out_file.write('{"version": "1.0", "tree": [')
+        for system in range(spec.systems):
+            tables = [
+                {
+                    "name": f"T{table}",
+                    "type": "table",
+                    "leaves": [{"name": f"C{column}", "type": "column"} for column in range(spec.columns)],
+                }
+                for table in range(system, spec.tables, spec.systems)
+            ]
+            tree = {
+                "name": f"system_{system}",
+                "type": "system",
+                "children": [
+                    {
+                        "name": f"DB_{system}",
+                        "type": "database",
+                        "children": [{"name": "PUBLIC", "type": "schema", "children": tables}],
+                    }
+                ],
+            }
+            out_file.write((", " if system else "") + json.dumps(tree))
+
+        out_file.write('], "lineages": [')
+        for index, (src_table, src_column, trg_table, trg_column, transformation) in enumerate(iter_edges(spec)):
+            transformations = max(transformations, transformation + 1)
+            lineage = {
+                "src_path": [{type.lower(): name} for type, name in _table_path(spec, src_table)]
+                + [{"column": f"C{src_column}"}],
+                "trg_path": [{type.lower(): name} for type, name in _table_path(spec, trg_table)]
+                + [{"column": f"C{trg_column}"}],
+                "mapping_ref": {
+                    "source_code": f"codebase_{transformation % spec.files:05d}.sql",
+                    "mapping": f"transformation_{transformation}",
+                    "codebase_pos": [{"pos_start": 0, "pos_len": 6}],
+                },
+            }
+            out_file.write((", " if index else "") + json.dumps(lineage))
+
+        # the transformations are spread over the codebase files, in order
+        codebase_files: Dict[str, dict] = {}
+        codebase_positions = [0] * spec.files
+        codebase_paths = [output_path / f"codebase_{index:05d}.sql" for index in range(spec.files)]
+        codebase_out_files = [open(codebase_path, "w", newline="") for codebase_path in codebase_paths]
+        try:
+            for transformation in range(transformations):
+                index = transformation % spec.files
+                text = source_code_text(spec, transformation)
+                codebase_out_files[index].write(text)
+                codebase_files.setdefault(codebase_paths[index].name, {"mapping_refs": {}})["mapping_refs"][
+                    f"transformation_{transformation}"
+                ] = {"pos_start": codebase_positions[index], "pos_len": len(text)}
+                codebase_positions[index] += len(text)
+        finally:
+            for codebase_out_file in codebase_out_files:
+                codebase_out_file.close()
+        out_file.write('], "codebase_files": ')
+        json.dump(codebase_files, out_file)
+        out_file.write("}")
+    return lineage_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic lineage dataset")
+    parser.add_argument("format", choices=["csv", "v1"], help="csv files or v1 lineage.json")
+    parser.add_argument("target_directory", help="Directory in which the dataset is generated")
+    for field_name, field in DatasetSpec.model_fields.items():
+        parser.add_argument(f"--{field_name}", type=field.annotation, default=field.default)  # type: ignore[arg-type]
+    args = parser.parse_args()
+    dataset_spec = DatasetSpec(**{field_name: getattr(args, field_name) for field_name in DatasetSpec.model_fields})
+    if args.format == "csv":
+        generate_csv(args.target_directory, dataset_spec)
+    else:
+        generate_v1(args.target_directory, dataset_spec)
@@ -0,0 +1,237 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from benchmarks.generate import DatasetSpec, generate_csv, generate_v1, iter_edges, source_code_text
+from src.profiling import peak_rss
+
+TOOLS = ("ingest_csv", "ingest_csv_columnar", "translate_to_batch_format", "generate_json_files")
+# the in-memory tools scale linearly: at 10**5 edges they take 3 to 30 seconds and 270 to 650 MiB each, so the
+# 10**6 and 10**7 runs of the full preset take hours and need tens of GiB of memory; they are opt-in
+EDGE_PRESETS = {
+    "quick": (10**3, 10**4, 10**5),
+    "full": (10**3, 10**4, 10**5, 10**6, 10**7),
+}
+DEFAULT_EDGES = EDGE_PRESETS["quick"]
+
+
+def _run_generate_json_files(spec: DatasetSpec, output_directory: str) -> float:
+    from src.helper import generate_json_files, generate_source_code
+    from src.models import AssetPool, CustomLineageConfig
+    from tools.ingest_csv import _get_default_asset_types
+
+    config = CustomLineageConfig(
+        application_name="benchmark", output_directory=output_directory, deduplicate_source_code=True
+    )
+    asset_pool = AssetPool(trusted=True)
+
+    def column(table: int, column: int) -> Any:
+        return asset_pool.leaf_asset(
+            nodes=asset_pool.nodes(
+                [(f"system_{table % spec.systems}", "System"), (f"DB_{table % spec.systems}", "Database")]
+                + [("PUBLIC", "Schema")]
+            ),
+            parent=asset_pool.asset(name=f"T{table}", type="Table"),
+            leaf=asset_pool.asset(name=f"C{column}", type="Column"),
+        )
+
+    # only the serialization is measured, the lineage relationships are built beforehand
+    lineages = [
+        asset_pool.lineage(
+            src=column(src_table, src_column),
+            trg=column(trg_table, trg_column),
+            source_code=generate_source_code(
+                source_code_text=source_code_text(spec, transformation),
+                custom_lineage_config=config,
+                transformation_display_name=f"transformation_{transformation}",
+            ),
+        )
+        for src_table, src_column, trg_table, trg_column, transformation in iter_edges(spec)
+    ]
+    start = time.perf_counter()
+    generate_json_files(lineages=lineages, asset_types=_get_default_asset_types(), custom_lineage_config=config)
+    return time.perf_counter() - start
+
+
+def _measure(tool: str, spec: DatasetSpec, input_directory: str, output_directory: str) -> Dict[str, Any]:
+    # runs in a fresh process, so the peak RSS is the one of the measured tool only
+    if tool in ("ingest_csv", "ingest_csv_columnar"):
+        from src.models import CustomLineageConfig
+        from tools.ingest_csv import ingest_csv_files
+
+        start = time.perf_counter()
+        ingest_csv_files(
+            source_directory=input_directory,
+            custom_lineage_config=CustomLineageConfig(
+                application_name="benchmark",
+                output_directory=output_directory,
+                source_code_directory_name="source_codes",
+            ),
+            engine="columnar" if tool == "ingest_csv_columnar" else "row",
+        )
+        wall_time = time.perf_counter() - start
+    elif tool == "translate_to_batch_format":
+        from tools.translate_to_batch_format import convert
+
+        start = time.perf_counter()
+        convert(input_directory=input_directory, output_directory=output_directory, migrate_source_code=True)
+        wall_time = time.perf_counter() - start
+    elif tool == "generate_json_files":
+        wall_time = _run_generate_json_files(spec, output_directory)
+    else:
+        raise ValueError(f"Unknown tool {tool}, expected one of {', '.join(TOOLS)}")
+    return {"wall_time": wall_time, "peak_rss_bytes": peak_rss()}
+
+
+def _directory_size(directory: Path) -> Dict[str, int]:
+    files = [path for path in directory.rglob("*") if path.is_file()]
+    return {"output_bytes": sum(path.stat().st_size for path in files), "output_files": len(files)}
+
+
+def run_benchmark(tool: str, spec: DatasetSpec, work_directory: str) -> Dict[str, Any]:
+    """
+    Generates the input of a tool, runs the tool in a separate process and returns its measurements
+
+    :param tool: One of TOOLS
+    :type tool: str
+    :param spec: Dataset to generate
+    :type spec: DatasetSpec
+    :param work_directory: Directory in which the input and the output are written
+    :type work_directory: str
+    :returns: wall time, rows per second, peak RSS and size of the output
+    :rtype: Dict[str, Any]
+    """
+    work_path = Path(work_directory) / f"{tool}_{spec.edges}"
+    input_path = work_path / "input"
+    output_path = work_path / "output"
+    shutil.rmtree(work_path, ignore_errors=True)
+    if tool in ("ingest_csv", "ingest_csv_columnar"):
+        generate_csv(str(input_path), spec)
+    elif tool == "translate_to_batch_format":
+        generate_v1(str(input_path), spec)
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        measurements = executor.submit(_measure, tool, spec, str(input_path), str(output_path)).result()
+
+    result = {"tool": tool, "edges": spec.edges, **measurements}
+    result["rows_per_second"] = spec.edges / measurements["wall_time"] if measurements["wall_time"] else None
+    result.update(_directory_size(output_path))
+    result["spec"] = spec.model_dump()
+    shutil.rmtree(work_path, ignore_errors=True)
+    return result
+
+
+def run_benchmarks(
+    tools: Sequence[str],
+    edges: Sequence[int],
+    spec: DatasetSpec,
+    work_directory: Optional[str] = None,
+    label: str = "",
+) -> Dict[str, Any]:
+    """
+    Runs every tool for every number of edges and returns the report
+
+    :param tools: Tools to benchmark
+    :type tools: Sequence[str]
+    :param edges: Numbers of lineage relationships
+    :type edges: Sequence[int]
+    :param spec: Shape of the datasets; its number of edges is replaced by each value of `edges`
+    :type spec: DatasetSpec
+    :param work_directory: Optional parameter - directory for the temporary input and output, defaults to a temporary
+        directory
+    :type work_directory: str
+    :param label: Optional parameter - label of the report, e.g. the version under test
+    :type label: str
+    :returns: the report
+    :rtype: Dict[str, Any]
+    """
+    report: Dict[str, Any] = {
+        "label": label,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(dir=work_directory) as temporary_directory:
+        for edge_count in edges:
+            for tool in tools:
+                result = run_benchmark(tool, spec.model_copy(update={"edges": edge_count}), temporary_directory)
+                print(
+                    f"{tool:<26} {edge_count:>10} edges {result['wall_time']:>9.2f}s "
+                    f"{result['rows_per_second'] or 0:>12.0f} rows/s {result['peak_rss_bytes'] / 1024**2:>9.1f} MiB "
+                    f"{result['output_bytes'] / 1024**2:>9.1f} MiB output"
+                )
+                report["results"].append(result)
+    return report
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Compares two reports; returns, for every (tool, edges) in both, the ratio current / baseline of the wall time and
+    peak RSS. A ratio above 1 is a regression.
+    """
+    baseline_results = {(result["tool"], result["edges"]): result for result in baseline["results"]}
+    comparisons = []
+    for result in current["results"]:
+        baseline_result = baseline_results.get((result["tool"], result["edges"]))
+        if baseline_result is None:
+            continue
+        comparisons.append(
+            {
+                "tool": result["tool"],
+                "edges": result["edges"],
+                "wall_time_ratio": result["wall_time"] / baseline_result["wall_time"],
+                "peak_rss_ratio": result["peak_rss_bytes"] / baseline_result["peak_rss_bytes"],
+            }
+        )
+    return comparisons
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the conversion tools on synthetic datasets")
+    parser.add_argument("--tools", nargs="+", choices=TOOLS, default=list(TOOLS), help="Tools to benchmark")
+    parser.add_argument("--edges", nargs="+", type=int, help="Numbers of lineage relationships, overrides --preset")
+    parser.add_argument(
+        "--preset",
+        choices=EDGE_PRESETS,
+        default="quick",
+        help="Numbers of lineage relationships: quick is 10^3 to 10^5, full is 10^3 to 10^7",
+    )
+    for field_name, field in DatasetSpec.model_fields.items():
+        if field_name != "edges":
+            parser.add_argument(f"--{field_name}", type=field.annotation, default=field.default)  # type: ignore
+    parser.add_argument("--output", default="benchmark_results.json", help="Path of the json report")
+    parser.add_argument("--compare", help="Path of a previous json report to compare the results with")
+    parser.add_argument("--label", default="", help="Label of the report, e.g. the version under test")
+    parser.add_argument("--work_directory", help="Directory for the temporary input and output files")
+    args = parser.parse_args()
+
+    dataset_spec = DatasetSpec(
+        **{field_name: getattr(args, field_name) for field_name in DatasetSpec.model_fields if field_name != "edges"}
+    )
+    benchmark_report = run_benchmarks(
+        tools=args.tools,
+        edges=args.edges or EDGE_PRESETS[args.preset],
+        spec=dataset_spec,
+        work_directory=args.work_directory,
+        label=args.label,
+    )
+    with open(args.output, "w") as report_file:
+        json.dump(benchmark_report, report_file, indent=4)
+    print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            for comparison in compare_reports(json.load(baseline_file), benchmark_report):
+                print(
+                    f"{comparison['tool']:<26} {comparison['edges']:>10} edges "
+                    f"wall time x{comparison['wall_time_ratio']:.2f} peak RSS x{comparison['peak_rss_ratio']:.2f}"
+                )
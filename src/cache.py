@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Dict, Optional, Type
+
+__all__ = ["MetadataCache"]
+DEFAULT_CACHE_TTL = 7 * 24 * 60 * 60
+CACHE_DIRECTORY_ENVIRONMENT_VARIABLE = "CUSTOM_LINEAGE_CACHE_DIR"
+
+
+def default_cache_directory() -> Path:
+    cache_directory = os.environ.get(CACHE_DIRECTORY_ENVIRONMENT_VARIABLE)
+    if cache_directory:
+        return Path(cache_directory)
+    return Path.home() / ".cache" / "custom-technical-lineage"
+
+
+class MetadataCache:
+    """
+    Persistent cache for metadata fetched from Collibra, such as asset type IDs and asset fullnames.
+
+    Entries are stored in a SQLite database, keyed by the Collibra instance and the query (kind of metadata and its
+    filters), and expire after `ttl` seconds.
+
+    :param cache_directory: Directory of the cache database, defaults to $CUSTOM_LINEAGE_CACHE_DIR or
+        ~/.cache/custom-technical-lineage
+    :type cache_directory: str, optional
+    :param ttl: Number of seconds after which an entry expires
+    :type ttl: float
+    """
+
+    def __init__(self, cache_directory: Optional[str] = None, ttl: float = DEFAULT_CACHE_TTL) -> None:
+        self.cache_directory_path = Path(cache_directory) if cache_directory else default_cache_directory()
+        self.cache_directory_path.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._connection = sqlite3.connect(self.cache_directory_path / "metadata.sqlite")
+        with self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS metadata (
+                    instance TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (instance, query)
+                )"""
+            )
+
+    def __enter__(self) -> "MetadataCache":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    @staticmethod
+    def _query_key(kind: str, filters: Dict[str, Optional[str]]) -> str:
+        return json.dumps(
+            {"kind": kind, "filters": {key: value or "" for key, value in filters.items()}}, sort_keys=True
+        )
+
+    def get(self, collibra_instance: str, kind: str, filters: Dict[str, Optional[str]]) -> Optional[Any]:
+        """
+        Returns the cached value of a query, or None when it is not cached or expired
+
+        :param collibra_instance: Collibra instance name
+        :type collibra_instance: str
+        :param kind: Kind of metadata, e.g. "assetTypes"
+        :type kind: str
+        :param filters: Filters of the query
+        :type filters: Dict[str, Optional[str]]
+        :returns: the cached value
+        :rtype: Any
+        """
+        row = self._connection.execute(
+            "SELECT value, created_at FROM metadata WHERE instance = ? AND query = ?",
+            (collibra_instance, self._query_key(kind, filters)),
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def set(self, collibra_instance: str, kind: str, filters: Dict[str, Optional[str]], value: Any) -> None:
+        """
+        Stores the value of a query; the value must be json serializable
+
+        :param collibra_instance: Collibra instance name
+        :type collibra_instance: str
+        :param kind: Kind of metadata, e.g. "assetTypes"
+        :type kind: str
+        :param filters: Filters of the query
+        :type filters: Dict[str, Optional[str]]
+        :param value: Value to cache
+        :type value: Any
+        """
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO metadata (instance, query, value, created_at) VALUES (?, ?, ?, ?)",
+                (collibra_instance, self._query_key(kind, filters), json.dumps(value), time.time()),
+            )
+
+    def invalidate(self, collibra_instance: Optional[str] = None) -> int:
+        """
+        Removes the cached entries of a Collibra instance, or all the entries when no instance is provided
+
+        :param collibra_instance: Optional parameter - Collibra instance name
+        :type collibra_instance: str
+        :returns: number of removed entries
+        :rtype: int
+        """
+        with self._connection:
+            if collibra_instance is None:
+                cursor = self._connection.execute("DELETE FROM metadata")
+            else:
+                cursor = self._connection.execute("DELETE FROM metadata WHERE instance = ?", (collibra_instance,))
+        return cursor.rowcount
@@ -0,0 +1,170 @@
+import email.utils
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from types import TracebackType
+from typing import Optional, Tuple, Type
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.connection import NameResolutionError
+
+from src.exceptions import CollibraAPIError
+
+from . import profiling
+
+__all__ = ["CollibraClient"]
+MAX_HTTP_RETRY = 5
+RETRY_AFTER_STATUS_CODES = (429, 503)
+DEFAULT_MAX_RETRY_AFTER = 300.0
+
+
+class CollibraClient:
+    """
+    HTTP client used to call the Collibra REST API.
+
+    The client owns a pooled `requests.Session`, so consecutive calls (e.g. the pages of a paginated endpoint) reuse
+    the same keep-alive connections instead of doing a TCP/TLS handshake per call. Failed calls are retried with
+    exponential backoff and jitter, and the `Retry-After` header is honoured on 429 and 503 responses.
+
+    :param username: Collibra username
+    :type username: str
+    :param password: Collibra user's password
+    :type password: str
+    :param pool_size: Maximum number of connections kept alive per host
+    :type pool_size: int
+    :param max_retries: Maximum number of attempts per call
+    :type max_retries: int
+    :param backoff_factor: Delay in seconds before the first retry, doubled on every following attempt
+    :type backoff_factor: float
+    :param max_backoff: Upper bound in seconds of the exponential backoff
+    :type max_backoff: float
+    :param max_retry_after: Upper bound in seconds of the delay requested by a `Retry-After` header
+    :type max_retry_after: float
+    :param timeout: Connect and read timeout in seconds
+    :type timeout: Tuple[float, float]
+    """
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        pool_size: int = 10,
+        max_retries: int = MAX_HTTP_RETRY,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30.0,
+        max_retry_after: float = DEFAULT_MAX_RETRY_AFTER,
+        timeout: Tuple[float, float] = (10.0, 60.0),
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(username=username, password=password)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __enter__(self) -> "CollibraClient":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def get(self, url: str) -> requests.Response:
+        """
+        Sends a GET request, retrying on connection errors and 5xx responses
+
+        :param url: URL to call
+        :type url: str
+        :returns: successful response
+        :rtype: requests.Response
+        """
+        return self.request("GET", url)
+
+    def post(self, url: str) -> requests.Response:
+        """
+        Sends a POST request. As POST calls are not idempotent, they are only retried when the server explicitly
+        asks to (429 and 503 responses); connection errors are raised and other responses are returned as is.
+
+        :param url: URL to call
+        :type url: str
+        :returns: response
+        :rtype: requests.Response
+        """
+        return self.request("POST", url, retry=False)
+
+    def request(self, method: str, url: str, retry: bool = True) -> requests.Response:
+        attempt = 1
+        while attempt <= self.max_retries:
+            delay = None
+            try:
+                logging.info(f"Sending {method} {url}")
+                profiling.count("http.attempts")
+                ret = self.session.request(method, url, timeout=self.timeout)
+            except NameResolutionError as e:
+                raise e
+            except Exception as e:
+                if not retry:
+                    raise e
+                logging.warning(f"{method} {url} failed with\n{e}")
+            else:
+                if ret.status_code == 200:
+                    logging.info(f"Response received for {method} {url}: {ret.status_code}")
+                    return ret
+                elif ret.status_code in RETRY_AFTER_STATUS_CODES:
+                    delay = self._retry_after(ret)
+                    if delay is not None and delay > self.max_retry_after:
+                        logging.warning(
+                            f"{method} {url} asked to retry after {delay:.0f}s, waiting {self.max_retry_after:.0f}s"
+                        )
+                        delay = self.max_retry_after
+                elif ret.status_code >= 400 and ret.status_code < 500:
+                    raise CollibraAPIError(f"{method} {url} failed with {ret.status_code} {ret.text}")
+                elif not retry:
+                    return ret
+                logging.warning(
+                    f"attempt {attempt}/{self.max_retries} {method} {url} failed with {ret.status_code} {ret.text}"
+                )
+
+            if attempt < self.max_retries:
+                time.sleep(delay if delay is not None else self._backoff(attempt))
+            attempt += 1
+
+        raise CollibraAPIError(f"Failed {method} {url} after {self.max_retries} attempts")
+
+    def _backoff(self, attempt: int) -> float:
+        # exponential backoff with jitter: half of the delay is fixed, the other half is random
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        # Retry-After is either a number of seconds or an HTTP date
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
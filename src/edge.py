@@ -1,18 +1,168 @@
+import hashlib
+import json
 import logging
-from typing import Optional
+import posixpath
+import queue
+import select
+import shlex
+import tarfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
 
 import paramiko
+from pydantic import BaseModel
 from scp import SCPClient
 
+from src import profiling
+from src.exceptions import EdgeCommandError, EdgeCommandTimeoutError, EdgeUploadError
+
+MANIFEST_FILE_NAME = ".lineage-manifest.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_RETRY = 3
+UPLOAD_RETRY_DELAY = 1.0
+PROGRESS_INTERVAL = 10.0
+DEFAULT_COMMAND_TIMEOUT = 60 * 60
+COMMAND_READ_SIZE = 32 * 1024
+COMMAND_SELECT_INTERVAL = 1.0
+DEFAULT_KEEPALIVE_INTERVAL = 30
+
+
+class UploadReport(BaseModel):
+    """
+    Summary of an upload to Edge
+    """
+
+    files_uploaded: int = 0
+    files_deleted: int = 0
+    files_unchanged: int = 0
+    bytes_sent: int = 0
+    duration: float = 0.0
+
+
+def _file_sha256(file_path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def local_manifest(source_folder: str) -> Dict[str, str]:
+    """
+    Returns the sha256 of every file of a folder, keyed by their path relative to the folder (with / separators)
+
+    :param source_folder: Local folder
+    :type source_folder: str
+    :returns: the manifest of the folder
+    :rtype: Dict[str, str]
+    """
+    source_path = Path(source_folder)
+    return {
+        file_path.relative_to(source_path).as_posix(): _file_sha256(file_path)
+        for file_path in sorted(source_path.rglob("*"))
+        if file_path.is_file() and file_path.name != MANIFEST_FILE_NAME
+    }
+
+
+class CommandResult(BaseModel):
+    """
+    Result of a command run on Edge
+    """
+
+    command: str
+    exit_status: int
+    stdout: str = ""
+    stderr: str = ""
+
+
+def _log_output(stream: str, line: str) -> None:
+    if stream == "stderr":
+        logging.warning(line)
+    else:
+        logging.info(line)
+
+
+class EdgeHost(BaseModel):
+    """
+    SSH connection details of an Edge site
+    """
+
+    address: str
+    username: str
+    certificate_path: str
+    port: int = 22
+
+
+class PublishResult(BaseModel):
+    """
+    Result of the publication of a folder to an Edge site
+    """
+
+    address: str
+    success: bool
+    error: Optional[str] = None
+    upload_report: Optional[UploadReport] = None
+    command_result: Optional[CommandResult] = None
+    upload_duration: float = 0.0
+    command_duration: float = 0.0
+    duration: float = 0.0
+
+
+class _HashingWriter(object):
+    """
+    File-like wrapper computing the sha256 and size of the data written through it
+    """
+
+    def __init__(self, out_file: Any) -> None:
+        self.out_file = out_file
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        self.out_file.write(data)
+        return len(data)
+
 
 class EdgeConnection(object):
-    def __init__(self, address: str, username: str, certificate_path: str, port: int = 22):
+    def __init__(
+        self,
+        address: str,
+        username: str,
+        certificate_path: str,
+        port: int = 22,
+        keepalive: Optional[int] = DEFAULT_KEEPALIVE_INTERVAL,
+    ):
         self.address = address
         self.username = username
         self.certificate = certificate_path
         self.port = port
+        self.keepalive = keepalive
         self.ssh_client = self.connect()
 
+    @property
+    def is_active(self) -> bool:
+        transport = self.ssh_client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def ensure_connected(self) -> None:
+        """
+        Reconnects to Edge when the SSH connection was dropped
+        """
+        if not self.is_active:
+            logging.warning(f"SSH connection to {self.address} was dropped, reconnecting")
+            self.ssh_client.close()
+            self.ssh_client = self.connect()
+
+    def close(self) -> None:
+        self.ssh_client.close()
+
     def connect(self) -> paramiko.SSHClient:
         try:
             ssh_client = paramiko.SSHClient()
@@ -25,6 +175,9 @@ class EdgeConnection(object):
                 timeout=20,
                 look_for_keys=False,
             )
+            transport = ssh_client.get_transport()
+            if self.keepalive and transport is not None:
+                transport.set_keepalive(self.keepalive)
             logging.info(f"Connected to {self.address} over SSH")
 
         except Exception as e:
@@ -33,24 +186,536 @@ class EdgeConnection(object):
         else:
             return ssh_client
 
-    def send_command(self, command: str) -> None:
+    def send_command(
+        self,
+        command: str,
+        timeout: Optional[float] = DEFAULT_COMMAND_TIMEOUT,
+        output_callback: Optional[Callable[[str, str], None]] = None,
+    ) -> CommandResult:
+        """
+        Runs a command on Edge and waits for its completion.
+
+        The output is read when the channel signals that data is available (select), instead of polling it, and
+        stdout and stderr are passed line by line to `output_callback` as they arrive. By default, stdout lines are
+        logged as info and stderr lines as warnings.
+
+        :param command: Command to run
+        :type command: str
+        :param timeout: Maximum number of seconds the command may run, or None to wait without limit
+        :type timeout: float, optional
+        :param output_callback: Optional parameter - function called with the name of the stream ("stdout" or
+            "stderr") and each line of output, without line ending
+        :type output_callback: Callable[[str, str], None]
+        :returns: the exit status and the output of the command
+        :rtype: CommandResult
+        :raises EdgeCommandTimeoutError: when the command does not complete within the timeout; the channel is closed
+        """
+        with profiling.stage("edge.command"):
+            return self._send_command(command=command, timeout=timeout, output_callback=output_callback)
+
+    def _send_command(
+        self, command: str, timeout: Optional[float], output_callback: Optional[Callable[[str, str], None]]
+    ) -> CommandResult:
         stdin, stdout, stderr = self.ssh_client.exec_command(command)
-        while not stdout.channel.exit_status_ready():
-            # Print data when available
-            if stdout.channel.recv_ready():
-                alldata = stdout.channel.recv(1024)
-                prevdata = b"1"
-                while prevdata:
-                    prevdata = stdout.channel.recv(1024)
-                    alldata += prevdata
-                logging.info(str(alldata))
-
-    def upload_folder(self, source_folder: str, target_folder: str) -> None:
+        stdin.close()
+        channel = stdout.channel
+        callback = output_callback or _log_output
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        buffers = {"stdout": bytearray(), "stderr": bytearray()}
+        output: Dict[str, List[str]] = {"stdout": [], "stderr": []}
+
+        def emit(stream: str, data: bytes, final: bool = False) -> None:
+            buffer = buffers[stream]
+            buffer += data
+            *lines, rest = buffer.split(b"\n")
+            if final and rest:
+                lines.append(rest)
+                rest = bytearray()
+            buffers[stream] = bytearray(rest)
+            for line in lines:
+                text = line.decode("utf-8", errors="replace").rstrip("\r")
+                output[stream].append(text)
+                callback(stream, text)
+
+        while True:
+            while channel.recv_ready():
+                emit("stdout", channel.recv(COMMAND_READ_SIZE))
+            while channel.recv_stderr_ready():
+                emit("stderr", channel.recv_stderr(COMMAND_READ_SIZE))
+            if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                break
+
+            wait = COMMAND_SELECT_INTERVAL
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    channel.close()
+                    raise EdgeCommandTimeoutError(f"Command on {self.address} timed out after {timeout}s: {command}")
+                wait = min(wait, remaining)
+            if channel.eof_received:
+                # all the output was received, only the exit status is missing
+                channel.status_event.wait(wait)
+            else:
+                # the channel is readable when stdout data arrives; stderr data and the exit status are picked up
+                # at the latest after the select interval
+                select.select([channel], [], [], wait)
+
+        emit("stdout", b"", final=True)
+        emit("stderr", b"", final=True)
+        return CommandResult(
+            command=command,
+            exit_status=channel.recv_exit_status(),
+            stdout="\n".join(output["stdout"]),
+            stderr="\n".join(output["stderr"]),
+        )
+
+    def upload_folder(self, source_folder: str, target_folder: str, bundle: bool = False) -> None:
+        if bundle:
+            self.upload_bundle(source_folder=source_folder, target_folder=target_folder)
+            return
         scp = SCPClient(self.ssh_client.get_transport())
-        scp.put(files=source_folder, remote_path=target_folder, recursive=True)
+        with profiling.stage("edge.upload_scp"):
+            scp.put(files=source_folder, remote_path=target_folder, recursive=True)
+
+    def upload_bundle(self, source_folder: str, target_folder: str, remote_temporary_folder: str = "/tmp") -> str:
+        """
+        Uploads the content of a folder as a single gzip compressed tar archive and extracts it into the target folder.
+
+        The archive is streamed over one SFTP channel, without creating it locally first, so the upload time depends
+        on the size of the folder instead of its number of files. The sha256 of the archive is verified on Edge
+        before it is extracted.
+
+        :param source_folder: Local folder whose content is uploaded
+        :type source_folder: str
+        :param target_folder: Folder on Edge in which the content is extracted, it is created when needed
+        :type target_folder: str
+        :param remote_temporary_folder: Folder on Edge in which the archive is stored until it is extracted
+        :type remote_temporary_folder: str
+        :returns: sha256 of the uploaded archive
+        :rtype: str
+        """
+        remote_archive = f"{remote_temporary_folder.rstrip('/')}/lineage-bundle-{uuid.uuid4().hex}.tar.gz"
+        sftp = self.ssh_client.open_sftp()
+        try:
+            with profiling.stage("edge.upload_bundle"), sftp.open(remote_archive, "wb") as remote_file:
+                remote_file.set_pipelined(True)
+                writer = _HashingWriter(remote_file)
+                with tarfile.open(fileobj=writer, mode="w|gz") as archive:  # type: ignore[call-overload]
+                    archive.add(str(Path(source_folder)), arcname=".")
+        finally:
+            sftp.close()
+        sha256 = writer.sha256.hexdigest()
+        profiling.count("edge.bytes_sent", writer.size)
+        logging.info(f"Uploaded {source_folder} to {self.address}:{remote_archive} ({writer.size} bytes)")
+
+        archive_path = shlex.quote(remote_archive)
+        target_path = shlex.quote(target_folder)
+        result = self.send_command(
+            command=f"echo '{sha256}  '{archive_path} | sha256sum -c --status - && mkdir -p {target_path} "
+            f"&& tar -xzf {archive_path} -C {target_path}; status=$?; rm -f {archive_path}; exit $status"
+        )
+        if result.exit_status != 0:
+            raise EdgeCommandError(
+                f"Failed to verify and extract {remote_archive} into {target_folder} on {self.address} "
+                f"(exit status {result.exit_status})"
+            )
+        return sha256
 
-    def upload_edge_shared_folder(self, edge_directory: str, shared_connection_folder: str) -> None:
-        self.send_command(
+    def sync_folder(
+        self, source_folder: str, target_folder: str, channels: int = 1, max_retries: int = MAX_UPLOAD_RETRY
+    ) -> UploadReport:
+        """
+        Uploads only the files of a folder that are new or changed since the previous sync, and deletes on Edge the
+        files that are no longer in the folder.
+
+        The sha256 of the synchronized files is kept on Edge in a manifest file (.lineage-manifest.json) in the
+        target folder. The manifest is read back over SFTP and compared to the local files; it is only rewritten once
+        all the transfers succeeded, so an interrupted sync is resumed by the next one. Files changed on Edge by other
+        means than this method are not detected.
+
+        :param source_folder: Local folder to synchronize
+        :type source_folder: str
+        :param target_folder: Folder on Edge to synchronize, it is created when needed
+        :type target_folder: str
+        :param channels: Number of SFTP channels used in parallel to upload the files, see `upload_files_parallel`
+        :type channels: int
+        :param max_retries: Maximum number of attempts per file
+        :type max_retries: int
+        :returns: the number of files uploaded, deleted and unchanged, the number of bytes sent and the duration
+        :rtype: UploadReport
+        """
+        start = time.perf_counter()
+        report = UploadReport()
+        manifest = local_manifest(source_folder)
+        remote_manifest_path = posixpath.join(target_folder, MANIFEST_FILE_NAME)
+
+        sftp = self.ssh_client.open_sftp()
+        try:
+            try:
+                with sftp.open(remote_manifest_path, "rb") as remote_file:
+                    remote_manifest: Dict[str, str] = json.loads(remote_file.read())
+            except FileNotFoundError:
+                remote_manifest = {}
+
+            changed_files = [path for path, sha256 in manifest.items() if remote_manifest.get(path) != sha256]
+            obsolete_files = [path for path in remote_manifest if path not in manifest]
+            report.files_unchanged = len(manifest) - len(changed_files)
+
+            uploaded_files = set(
+                self._upload_files(
+                    source_folder=source_folder,
+                    target_folder=target_folder,
+                    paths=changed_files,
+                    report=report,
+                    channels=channels,
+                    max_retries=max_retries,
+                )
+            )
+            for path in obsolete_files:
+                try:
+                    sftp.remove(posixpath.join(target_folder, path))
+                except FileNotFoundError:
+                    pass
+                report.files_deleted += 1
+
+            # only the files confirmed on Edge are recorded, the others are uploaded again by the next sync
+            synced_manifest = {
+                path: sha256
+                for path, sha256 in manifest.items()
+                if path in uploaded_files or remote_manifest.get(path) == sha256
+            }
+            with sftp.open(remote_manifest_path, "wb") as remote_file:
+                remote_file.write(json.dumps(synced_manifest).encode())
+        finally:
+            sftp.close()
+
+        report.duration = time.perf_counter() - start
+        logging.info(
+            f"Synchronized {source_folder} to {self.address}:{target_folder}: {report.files_uploaded} files uploaded "
+            f"({report.bytes_sent} bytes), {report.files_deleted} deleted, {report.files_unchanged} unchanged "
+            f"in {report.duration:.1f}s"
+        )
+        return report
+
+    def upload_files_parallel(
+        self, source_folder: str, target_folder: str, channels: int = 4, max_retries: int = MAX_UPLOAD_RETRY
+    ) -> UploadReport:
+        """
+        Uploads the files of a folder over several SFTP channels in parallel.
+
+        The channels are opened on the existing SSH transport and take the files from a shared work queue, so the
+        latency of one file transfer no longer bounds the throughput on high-latency links. A failed file transfer is
+        retried up to `max_retries` times; the progress and throughput are logged while uploading.
+
+        :param source_folder: Local folder to upload
+        :type source_folder: str
+        :param target_folder: Folder on Edge in which the files are uploaded, it is created when needed
+        :type target_folder: str
+        :param channels: Number of SFTP channels used in parallel
+        :type channels: int
+        :param max_retries: Maximum number of attempts per file
+        :type max_retries: int
+        :returns: the number of files uploaded, the number of bytes sent and the duration
+        :rtype: UploadReport
+        """
+        start = time.perf_counter()
+        report = UploadReport()
+        source_path = Path(source_folder)
+        paths = [
+            file_path.relative_to(source_path).as_posix()
+            for file_path in sorted(source_path.rglob("*"))
+            if file_path.is_file()
+        ]
+        self._upload_files(
+            source_folder=source_folder,
+            target_folder=target_folder,
+            paths=paths,
+            report=report,
+            channels=channels,
+            max_retries=max_retries,
+        )
+        report.duration = time.perf_counter() - start
+        logging.info(
+            f"Uploaded {source_folder} to {self.address}:{target_folder}: {report.files_uploaded} files "
+            f"({report.bytes_sent} bytes) in {report.duration:.1f}s"
+        )
+        return report
+
+    def _upload_files(
+        self,
+        source_folder: str,
+        target_folder: str,
+        paths: List[str],
+        report: UploadReport,
+        channels: int,
+        max_retries: int,
+    ) -> List[str]:
+        # returns the paths uploaded, raises EdgeUploadError when some of them could not be uploaded
+        directories = {posixpath.dirname(posixpath.join(target_folder, path)) for path in paths}
+        directories.add(target_folder)
+        result = self.send_command(
+            command="mkdir -p " + " ".join(shlex.quote(directory) for directory in sorted(directories))
+        )
+        if result.exit_status != 0:
+            raise EdgeCommandError(f"Failed to create the folders of {target_folder} on {self.address}")
+
+        work_queue: "queue.Queue[str]" = queue.Queue()
+        for path in paths:
+            work_queue.put(path)
+        uploaded_paths: List[str] = []
+        failed_paths: List[str] = []
+        errors: List[Exception] = []
+        lock = threading.Lock()
+        start = time.perf_counter()
+        last_progress = start
+
+        def upload_worker() -> None:
+            nonlocal last_progress
+            path: Optional[str] = None
+            try:
+                sftp = self.ssh_client.open_sftp()
+            except Exception as e:
+                logging.warning(f"failed to open an SFTP channel to {self.address}: {e}")
+                with lock:
+                    errors.append(e)
+                return
+            try:
+                while True:
+                    try:
+                        path = work_queue.get_nowait()
+                    except queue.Empty:
+                        return
+                    for attempt in range(1, max_retries + 1):
+                        try:
+                            attributes = sftp.put(str(Path(source_folder, path)), posixpath.join(target_folder, path))
+                        except (OSError, paramiko.SSHException) as e:
+                            logging.warning(f"attempt {attempt}/{max_retries} to upload {path} failed with {e}")
+                            if attempt == max_retries:
+                                with lock:
+                                    failed_paths.append(path)
+                            else:
+                                time.sleep(UPLOAD_RETRY_DELAY * attempt)
+                        else:
+                            with lock:
+                                uploaded_paths.append(path)
+                                report.files_uploaded += 1
+                                report.bytes_sent += attributes.st_size or 0
+                                now = time.perf_counter()
+                                if now - last_progress >= PROGRESS_INTERVAL:
+                                    last_progress = now
+                                    logging.info(
+                                        f"Uploaded {report.files_uploaded}/{len(paths)} files to {self.address} "
+                                        f"({report.bytes_sent / (now - start) / 1024 / 1024:.2f} MiB/s)"
+                                    )
+                            break
+                    path = None
+            except Exception as e:
+                # an unexpected error stops this channel, the other channels keep emptying the queue
+                logging.warning(f"upload of {path} to {self.address} failed with {e}")
+                with lock:
+                    errors.append(e)
+                    if path is not None:
+                        failed_paths.append(path)
+            finally:
+                sftp.close()
+
+        files_uploaded, bytes_sent = report.files_uploaded, report.bytes_sent
+        workers = [threading.Thread(target=upload_worker) for _ in range(max(1, min(channels, len(paths))))]
+        with profiling.stage("edge.upload_files"):
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        profiling.count("edge.files_uploaded", report.files_uploaded - files_uploaded)
+        profiling.count("edge.bytes_sent", report.bytes_sent - bytes_sent)
+        if failed_paths:
+            raise EdgeUploadError(
+                f"Failed to upload {len(failed_paths)} files to {self.address}:{target_folder}, "
+                f"e.g. {sorted(failed_paths)[0]}"
+            )
+        # every channel failed before taking all the files from the queue, or stopped on an unexpected error
+        if not work_queue.empty() or report.files_uploaded - files_uploaded != len(paths):
+            raise EdgeUploadError(
+                f"Uploaded {report.files_uploaded - files_uploaded}/{len(paths)} files to {self.address}:"
+                f"{target_folder}" + (f", e.g. failed with {errors[0]}" if errors else "")
+            )
+        return uploaded_paths
+
+    def upload_edge_shared_folder(
+        self, edge_directory: str, shared_connection_folder: str, timeout: Optional[float] = DEFAULT_COMMAND_TIMEOUT
+    ) -> CommandResult:
+        return self.send_command(
             command=f"sudo ./edgecli objects folder-upload --source {edge_directory} \
-            --target {shared_connection_folder}"
+            --target {shared_connection_folder}",
+            timeout=timeout,
+        )
+
+
+class EdgeConnectionPool(object):
+    """
+    Keeps SSH connections to several Edge sites alive and publishes a folder to all of them concurrently.
+
+    There is one connection per host (address, port, username and certificate). The connections are opened on first
+    use, kept alive with SSH keepalives and re-opened when they were dropped, so they can be reused across
+    publications. Usage::
+
+        with EdgeConnectionPool(hosts=[EdgeHost(address="10.0.0.1", username="edge", certificate_path="key")]) as pool:
+            results = pool.publish(
+                source_folder="output", edge_directory="/tmp/cl3/", shared_connection_folder="shared-folder"
+            )
+
+    :param hosts: Edge sites
+    :type hosts: List[EdgeHost]
+    :param keepalive: Number of seconds between SSH keepalive packets
+    :type keepalive: int
+    :param max_workers: Maximum number of Edge sites handled in parallel, defaults to the number of sites
+    :type max_workers: int, optional
+    """
+
+    def __init__(
+        self, hosts: List[EdgeHost], keepalive: int = DEFAULT_KEEPALIVE_INTERVAL, max_workers: Optional[int] = None
+    ) -> None:
+        self.hosts = hosts
+        self.keepalive = keepalive
+        self.max_workers = max_workers or max(1, len(hosts))
+        self._connections: Dict[Tuple[str, int, str, str], EdgeConnection] = {}
+        self._host_locks: Dict[Tuple[str, int, str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "EdgeConnectionPool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            connection.close()
+
+    def connection(self, host: EdgeHost) -> EdgeConnection:
+        """
+        Returns the connection to an Edge site, connecting or reconnecting when needed
+        """
+        key = (host.address, host.port, host.username, host.certificate_path)
+        with self._lock:
+            host_lock = self._host_locks.setdefault(key, threading.Lock())
+        # connecting holds the lock of the site only, the other sites connect concurrently
+        with host_lock:
+            with self._lock:
+                connection = self._connections.get(key)
+            if connection is None:
+                connection = EdgeConnection(
+                    address=host.address,
+                    username=host.username,
+                    certificate_path=host.certificate_path,
+                    port=host.port,
+                    keepalive=self.keepalive,
+                )
+                with self._lock:
+                    self._connections[key] = connection
+            else:
+                connection.ensure_connected()
+        return connection
+
+    def publish(
+        self,
+        source_folder: str,
+        edge_directory: str,
+        shared_connection_folder: str,
+        bundle: bool = False,
+        channels: int = 1,
+        timeout: Optional[float] = DEFAULT_COMMAND_TIMEOUT,
+    ) -> List[PublishResult]:
+        """
+        Uploads a folder to all the Edge sites and triggers `upload_edge_shared_folder` on each of them, concurrently.
+
+        The folder is uploaded with `sync_folder`, or with `upload_bundle` when `bundle` is True. A site failing does
+        not stop the publication to the other sites: its error is reported in its result. The operations of a site
+        are retried once over a new connection when its SSH connection is dropped.
+
+        :param source_folder: Local folder to publish
+        :type source_folder: str
+        :param edge_directory: Folder on Edge to which the files are uploaded
+        :type edge_directory: str
+        :param shared_connection_folder: Name of the shared folder as configured on the capability
+        :type shared_connection_folder: str
+        :param bundle: Upload the folder as a single compressed archive instead of synchronizing it file by file
+        :type bundle: bool
+        :param channels: Number of SFTP channels per Edge site used by `sync_folder`
+        :type channels: int
+        :param timeout: Maximum number of seconds of the edgecli command
+        :type timeout: float, optional
+        :returns: the result and the timings of every Edge site, in the order of the hosts
+        :rtype: List[PublishResult]
+        """
+
+        def publish_host(host: EdgeHost) -> PublishResult:
+            return self._publish_host(
+                host, source_folder, edge_directory, shared_connection_folder, bundle, channels, timeout
+            )
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(publish_host, self.hosts))
+        logging.info(
+            f"Published {source_folder} to {sum(result.success for result in results)}/{len(results)} Edge sites "
+            f"in {time.perf_counter() - start:.1f}s"
         )
+        return results
+
+    def _publish_host(
+        self,
+        host: EdgeHost,
+        source_folder: str,
+        edge_directory: str,
+        shared_connection_folder: str,
+        bundle: bool,
+        channels: int,
+        timeout: Optional[float],
+    ) -> PublishResult:
+        start = time.perf_counter()
+        result = PublishResult(address=host.address, success=False)
+        for attempt in (1, 2):
+            try:
+                connection = self.connection(host)
+                upload_start = time.perf_counter()
+                if bundle:
+                    connection.upload_bundle(source_folder=source_folder, target_folder=edge_directory)
+                else:
+                    result.upload_report = connection.sync_folder(
+                        source_folder=source_folder, target_folder=edge_directory, channels=channels
+                    )
+                command_start = time.perf_counter()
+                result.upload_duration = command_start - upload_start
+                result.command_result = connection.upload_edge_shared_folder(
+                    edge_directory=edge_directory, shared_connection_folder=shared_connection_folder, timeout=timeout
+                )
+                result.command_duration = time.perf_counter() - command_start
+            except (paramiko.SSHException, EOFError, ConnectionError) as e:
+                if attempt == 1:
+                    logging.warning(f"Publication to {host.address} failed with {e}, retrying")
+                    continue
+                result.error = str(e)
+            except Exception as e:
+                result.error = str(e)
+            else:
+                if result.command_result.exit_status == 0:
+                    result.success = True
+                else:
+                    result.error = f"edgecli failed with exit status {result.command_result.exit_status}"
+            break
+
+        result.duration = time.perf_counter() - start
+        if result.success:
+            logging.info(f"Published {source_folder} to {host.address} in {result.duration:.1f}s")
+        else:
+            logging.error(f"Failed to publish {source_folder} to {host.address}: {result.error}")
+        return result
@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class MissingInputExpection(Exception):
     """"""
 
@@ -11,4 +14,31 @@ class CollibraAPIError(Exception):
 
 
 class InvalidCSVException(Exception):
+    """
+    `line` is the line of the csv file the error is about, when there is one; the message refers to it as "(line N)".
+    """
+
+    def __init__(self, message: str = "", line: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.line = line
+
+    def shift_line(self, offset: int) -> "InvalidCSVException":
+        """
+        Returns the same error `offset` lines further in the file, e.g. for an error raised on a part of the file
+        """
+        if self.line is None:
+            return self
+        line = self.line + offset
+        return InvalidCSVException(str(self).replace(f"(line {self.line})", f"(line {line})"), line=line)
+
+
+class EdgeCommandError(Exception):
+    """"""
+
+
+class EdgeUploadError(Exception):
+    """"""
+
+
+class EdgeCommandTimeoutError(Exception):
     """"""
@@ -0,0 +1,272 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+from array import array
+from types import TracebackType
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Set, Type, Union
+
+from . import profiling
+from .models import LeafAsset, Lineage, ParentAsset, SourceCode
+
+__all__ = ["LineageDigestSet", "LineageGraph"]
+# about 80 bytes per digest in a python set
+DEFAULT_MAX_DIGESTS_IN_MEMORY = 2_000_000
+SPILL_CACHE_SIZE_KIB = 64 * 1024
+# initial number of slots of the edge hash table, a power of two
+INITIAL_EDGE_SLOTS = 1024
+
+
+class LineageGraph:
+    """
+    Compact in-memory graph of lineage relationships, used to drop duplicate relationships.
+
+    Assets and source codes are interned to integer IDs and the edges are stored as arrays of IDs. Duplicates are
+    detected with an open-addressing hash table whose slots hold edge indices in an array as well, so no python object
+    is allocated per edge: an edge costs about 20 to 30 bytes instead of a pair of pydantic objects. Two lineage
+    relationships are duplicates when they have the same source, target and source code (path, highlights and
+    transformation name); the first one is kept.
+
+    Usage::
+
+        lineage_graph = LineageGraph()
+        lineage_graph.add_lineages(lineages)
+        generate_json_files(lineages=lineage_graph.lineages(), ...)
+    """
+
+    def __init__(self) -> None:
+        self.duplicates = 0
+        self._assets: List[Union[LeafAsset, ParentAsset]] = []
+        self._asset_ids: Dict[Hashable, int] = {}
+        # source code ID 0 means no source code
+        self._source_codes: List[Optional[SourceCode]] = [None]
+        self._source_code_ids: Dict[Hashable, int] = {}
+        # id() of the interned objects themselves; these are kept alive by the graph so their id() cannot be reused
+        self._asset_identities: Dict[int, int] = {}
+        self._source_code_identities: Dict[int, int] = {}
+        self._src = array("I")
+        self._trg = array("I")
+        self._source_code = array("I")
+        # hash table of the edges: edge index + 1 per slot, 0 for an empty slot; kept at most half full
+        self._edge_slots = array("I", [0]) * INITIAL_EDGE_SLOTS
+
+    def __len__(self) -> int:
+        return len(self._src)
+
+    @staticmethod
+    def _asset_key(asset: Union[LeafAsset, ParentAsset]) -> Hashable:
+        return (
+            tuple((node.name, node.type) for node in asset.nodes),
+            asset.parent.name,
+            asset.parent.type,
+            (asset.leaf.name, asset.leaf.type) if isinstance(asset, LeafAsset) else None,
+            (asset.props.fullname, asset.props.domain_id) if asset.props else None,
+        )
+
+    @staticmethod
+    def _source_code_key(source_code: SourceCode) -> Hashable:
+        return (
+            source_code.path,
+            tuple((highlight.start, highlight.len) for highlight in source_code.highlights or []),
+            source_code.highlights is None,
+            source_code.transformation_display_name,
+        )
+
+    def asset_id(self, asset: Union[LeafAsset, ParentAsset]) -> int:
+        """
+        Returns the integer ID of an asset, interning the asset when it is not known yet
+        """
+        asset_id = self._asset_identities.get(id(asset))
+        if asset_id is not None:
+            return asset_id
+        key = self._asset_key(asset)
+        asset_id = self._asset_ids.get(key)
+        if asset_id is None:
+            asset_id = self._asset_ids[key] = len(self._assets)
+            self._assets.append(asset)
+            self._asset_identities[id(asset)] = asset_id
+        return asset_id
+
+    def asset(self, asset_id: int) -> Union[LeafAsset, ParentAsset]:
+        return self._assets[asset_id]
+
+    def _source_code_id(self, source_code: Optional[SourceCode]) -> int:
+        if source_code is None:
+            return 0
+        source_code_id = self._source_code_identities.get(id(source_code))
+        if source_code_id is not None:
+            return source_code_id
+        key = self._source_code_key(source_code)
+        source_code_id = self._source_code_ids.get(key)
+        if source_code_id is None:
+            source_code_id = self._source_code_ids[key] = len(self._source_codes)
+            self._source_codes.append(source_code)
+            self._source_code_identities[id(source_code)] = source_code_id
+        return source_code_id
+
+    def add(self, lineage: Lineage) -> bool:
+        """
+        Adds a lineage relationship to the graph
+
+        :param lineage: Lineage relationship to add
+        :type lineage: Lineage
+        :returns: False when the lineage relationship is a duplicate, True otherwise
+        :rtype: bool
+        """
+        src_id = self.asset_id(lineage.src)
+        trg_id = self.asset_id(lineage.trg)
+        source_code_id = self._source_code_id(lineage.source_code)
+        # open addressing with linear probing, on the edge index + 1 stored in each slot
+        edge_slots, src, trg, source_code = self._edge_slots, self._src, self._trg, self._source_code
+        mask = len(edge_slots) - 1
+        slot = hash((src_id, trg_id, source_code_id)) & mask
+        edge = edge_slots[slot]
+        while edge:
+            if src[edge - 1] == src_id and trg[edge - 1] == trg_id and source_code[edge - 1] == source_code_id:
+                self.duplicates += 1
+                return False
+            slot = (slot + 1) & mask
+            edge = edge_slots[slot]
+        src.append(src_id)
+        trg.append(trg_id)
+        source_code.append(source_code_id)
+        edge_slots[slot] = len(src)
+        if 2 * len(src) > len(edge_slots):
+            self._grow_edge_slots()
+        return True
+
+    def _grow_edge_slots(self) -> None:
+        edge_slots = array("I", [0]) * (2 * len(self._edge_slots))
+        mask = len(edge_slots) - 1
+        for edge, key in enumerate(zip(self._src, self._trg, self._source_code), start=1):
+            slot = hash(key) & mask
+            while edge_slots[slot]:
+                slot = (slot + 1) & mask
+            edge_slots[slot] = edge
+        self._edge_slots = edge_slots
+
+    def add_lineages(self, lineages: Iterable[Lineage]) -> int:
+        """
+        Adds lineage relationships to the graph
+
+        :param lineages: Lineage relationships to add
+        :type lineages: Iterable[Lineage]
+        :returns: number of lineage relationships added, duplicates excluded
+        :rtype: int
+        """
+        return sum(self.add(lineage) for lineage in lineages)
+
+    def lineages(self) -> Iterator[Lineage]:
+        """
+        Yields the distinct lineage relationships, in the order in which they were added
+        """
+        for src_id, trg_id, source_code_id in zip(self._src, self._trg, self._source_code):
+            # all the parts were validated when the lineage relationship was added
+            yield Lineage.model_construct(
+                src=self._assets[src_id], trg=self._assets[trg_id], source_code=self._source_codes[source_code_id]
+            )
+
+
+class LineageDigestSet:
+    """
+    Set of lineage relationship digests, used to drop duplicate relationships without keeping the relationships
+    themselves in memory, e.g. when streaming.
+
+    A lineage relationship is identified by the blake2b digest of its json serialization, so two lineage
+    relationships are duplicates in the same cases as for `LineageGraph`. The digests are kept in a python set up to
+    `max_in_memory`; beyond that, they are moved to a temporary SQLite database and all the following lookups go to
+    disk, so memory usage stays bounded whatever the number of distinct lineage relationships.
+
+    Usage::
+
+        with LineageDigestSet() as seen:
+            for lineage in lineages:
+                if seen.add(lineage):
+                    writer.add_lineage(lineage)
+
+    :param max_in_memory: Maximum number of digests kept in memory before spilling to disk
+    :type max_in_memory: int
+    :param spill_directory: Directory of the temporary database, defaults to the system temporary directory
+    :type spill_directory: str, optional
+    """
+
+    def __init__(
+        self, max_in_memory: int = DEFAULT_MAX_DIGESTS_IN_MEMORY, spill_directory: Optional[str] = None
+    ) -> None:
+        self.max_in_memory = max_in_memory
+        self.spill_directory = spill_directory
+        self.duplicates = 0
+        self._count = 0
+        self._digests: Set[bytes] = set()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._spill_path: Optional[str] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "LineageDigestSet":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    @property
+    def spilled(self) -> bool:
+        return self._connection is not None
+
+    @staticmethod
+    def digest(lineage: Lineage) -> bytes:
+        return hashlib.blake2b(lineage.model_dump_json(exclude_none=True).encode(), digest_size=16).digest()
+
+    def _spill(self) -> None:
+        file_descriptor, self._spill_path = tempfile.mkstemp(suffix=".sqlite", dir=self.spill_directory)
+        os.close(file_descriptor)
+        # the database is thrown away at the end, so it does not need to survive a crash
+        self._connection = sqlite3.connect(self._spill_path)
+        self._connection.execute("PRAGMA journal_mode = OFF")
+        self._connection.execute("PRAGMA synchronous = OFF")
+        self._connection.execute(f"PRAGMA cache_size = -{SPILL_CACHE_SIZE_KIB}")
+        self._connection.execute("CREATE TABLE digests (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+        self._connection.executemany("INSERT INTO digests VALUES (?)", ((digest,) for digest in self._digests))
+        profiling.count("lineage.digests_spilled", len(self._digests))
+        self._digests = set()
+
+    def add(self, lineage: Lineage) -> bool:
+        """
+        Adds the digest of a lineage relationship to the set
+
+        :param lineage: Lineage relationship to add
+        :type lineage: Lineage
+        :returns: False when the lineage relationship is a duplicate, True otherwise
+        :rtype: bool
+        """
+        digest = self.digest(lineage)
+        if self._connection is None:
+            if digest in self._digests:
+                self.duplicates += 1
+                return False
+            self._digests.add(digest)
+            if len(self._digests) > self.max_in_memory:
+                self._spill()
+        elif not self._connection.execute("INSERT OR IGNORE INTO digests VALUES (?)", (digest,)).rowcount:
+            self.duplicates += 1
+            return False
+        self._count += 1
+        return True
+
+    def close(self) -> None:
+        """
+        Removes the temporary database, if any
+        """
+        self._digests = set()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if self._spill_path is not None:
+            os.unlink(self._spill_path)
+            self._spill_path = None
@@ -1,18 +1,23 @@
+import hashlib
 import json
 import logging
+import os
 import shutil
 import urllib.parse
 import uuid
 from pathlib import Path
-from typing import List, Optional, Sequence, TypeAlias, Union
+from types import TracebackType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, TextIO, Type, TypeAlias, Union
 
 import requests
 from pydantic.json import pydantic_encoder
-from requests.auth import HTTPBasicAuth
 from urllib3.connection import NameResolutionError
 
-from src.exceptions import CollibraAPIError, InvalidUUIDException, MissingInputExpection
+from src.exceptions import InvalidUUIDException, MissingInputExpection
 
+from . import profiling
+from .cache import MetadataCache
+from .client import MAX_HTTP_RETRY, CollibraClient
 from .models import (
     Asset,
     AssetFullnameDomain,
@@ -27,48 +32,336 @@ from .models import (
     SourceCodeHighLight,
 )
 
-__all__ = ["generate_json_files", "generate_source_code"]
-MAX_HTTP_RETRY = 5
+__all__ = ["AssetTypeResolver", "LineageWriter", "generate_json_files", "generate_source_code"]
+WRITE_BUFFER_SIZE = 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
 AssetTypeSequence: TypeAlias = Sequence[Union[NodeAsset, ParentAsset, LeafAsset]]
 
 
+class LineageWriter:
+    """
+    Incremental writer for the json files of the custom technical lineage batch format.
+
+    Lineages and assets are serialized one by one and appended to the json arrays in lineage.json and assets.json,
+    so memory usage does not depend on the number of lineage relationships written. metadata.json is written when
+    the writer is closed, which allows the asset types to be set once all the input has been processed.
+
+    When `max_lineages_per_file` or `max_bytes_per_file` is set, the output is sharded: every shard is a directory
+    (lineage_00001, lineage_00002, ...) containing a complete batch definition, i.e. its own lineage.json,
+    metadata.json, assets.json and the source code files referred to by its lineage relationships. The shards are
+    listed in manifest.json, in the output directory, and can be processed independently of each other.
+
+    Usage::
+
+        with LineageWriter(custom_lineage_config=config, asset_types=asset_types) as writer:
+            for lineage in lineages:
+                writer.add_lineage(lineage)
+
+    :param custom_lineage_config: Configuration object
+    :type custom_lineage_config: CustomLineageConfig
+    :param asset_types: List of asset types which will be used to construct metadata.json file
+    :type asset_types: List[AssetType], optional
+    :param max_lineages_per_file: Maximum number of lineage relationships per shard
+    :type max_lineages_per_file: int, optional
+    :param max_bytes_per_file: Maximum size in bytes of the lineage.json file of a shard. A shard always contains at
+        least one lineage relationship, even if it is larger.
+    :type max_bytes_per_file: int, optional
+    """
+
+    def __init__(
+        self,
+        custom_lineage_config: CustomLineageConfig,
+        asset_types: Optional[List[AssetType]] = None,
+        max_lineages_per_file: Optional[int] = None,
+        max_bytes_per_file: Optional[int] = None,
+    ) -> None:
+        self.custom_lineage_config = custom_lineage_config
+        self.asset_types: List[AssetType] = list(asset_types) if asset_types else []
+        self.max_lineages_per_file = max_lineages_per_file
+        self.max_bytes_per_file = max_bytes_per_file
+        self.lineage_count = 0
+        self.asset_count = 0
+        self.shards: List[Dict[str, Any]] = []
+        self._assets_file: Optional[TextIO] = None
+        self._lineage_file: Optional[TextIO] = None
+        self._shard_lineage_count = 0
+        self._shard_bytes = 0
+        self._shard_source_codes: Set[str] = set()
+        self._closed = False
+        if self.sharded:
+            self._open_shard()
+        else:
+            self._lineage_file = self._open_array(self.output_directory_path / "lineage.json")
+
+    def __enter__(self) -> "LineageWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # do not mark incomplete output as valid by writing metadata.json
+            self._close_files()
+
+    @property
+    def output_directory_path(self) -> Path:
+        return self.custom_lineage_config.output_directory_path
+
+    @property
+    def sharded(self) -> bool:
+        return self.max_lineages_per_file is not None or self.max_bytes_per_file is not None
+
+    @staticmethod
+    def _open_array(path: Path) -> TextIO:
+        out_file = open(path, "w", buffering=WRITE_BUFFER_SIZE)
+        out_file.write("[")
+        return out_file
+
+    @staticmethod
+    def _close_array(out_file: TextIO) -> None:
+        out_file.write("]")
+        if profiling.get_profiler() is not None:
+            out_file.flush()
+            profiling.count("json.bytes_written", os.fstat(out_file.fileno()).st_size)
+        out_file.close()
+
+    @staticmethod
+    def _write_item(out_file: TextIO, item: str, first: bool) -> None:
+        # same separators as json.dump of the complete list
+        if not first:
+            out_file.write(", ")
+        out_file.write(item)
+
+    def _open_shard(self) -> None:
+        if self._lineage_file is not None:
+            self._close_array(self._lineage_file)
+        shard: Dict[str, Any] = {
+            "directory": f"lineage_{len(self.shards) + 1:05d}",
+            "lineages": 0,
+            "bytes": 2,
+            "source_codes": 0,
+        }
+        self.shards.append(shard)
+        shard_directory_path = self.output_directory_path / shard["directory"]
+        shard_directory_path.mkdir(parents=True, exist_ok=True)
+        self._lineage_file = self._open_array(shard_directory_path / "lineage.json")
+        self._shard_lineage_count = 0
+        self._shard_bytes = 2
+        self._shard_source_codes = set()
+
+    def _shard_is_full(self, item_bytes: int) -> bool:
+        if self._shard_lineage_count == 0:
+            return False
+        if self.max_lineages_per_file is not None and self._shard_lineage_count >= self.max_lineages_per_file:
+            return True
+        return self.max_bytes_per_file is not None and self._shard_bytes + 2 + item_bytes > self.max_bytes_per_file
+
+    def _distribute_source_code(self, source_code_path: str) -> None:
+        # each shard gets its own (hard linked when possible) copy of the source code files it refers to
+        if source_code_path in self._shard_source_codes:
+            return
+        source = self.output_directory_path / source_code_path
+        if not source.is_file():
+            logging.warning(f"Source code file {source} does not exist and is not added to the shard")
+            return
+        target = self.output_directory_path / self.shards[-1]["directory"] / source_code_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+        self._shard_source_codes.add(source_code_path)
+        self.shards[-1]["source_codes"] += 1
+
+    def add_lineage(self, lineage: Lineage) -> None:
+        """
+        Appends a lineage relationship to lineage.json
+
+        :param lineage: Lineage relationship to write
+        :type lineage: Lineage
+        """
+        if self._lineage_file is None:
+            raise ValueError("Cannot add a lineage relationship to a closed LineageWriter")
+        item = json.dumps(lineage.model_dump(exclude_none=True), default=pydantic_encoder)
+
+        if self.sharded:
+            item_bytes = len(item.encode("utf-8"))
+            if self._shard_is_full(item_bytes):
+                self._open_shard()
+            if lineage.source_code is not None:
+                self._distribute_source_code(lineage.source_code.path)
+            self._shard_bytes += item_bytes + (2 if self._shard_lineage_count else 0)
+            self.shards[-1]["lineages"] += 1
+            self.shards[-1]["bytes"] = self._shard_bytes
+
+        self._write_item(self._lineage_file, item, first=self._shard_lineage_count == 0)
+        self._shard_lineage_count += 1
+        self.lineage_count += 1
+
+    def add_lineages(self, lineages: Iterable[Lineage]) -> None:
+        for lineage in lineages:
+            self.add_lineage(lineage)
+
+    def add_asset(self, asset: Union[NodeAsset, ParentAsset, LeafAsset]) -> None:
+        """
+        Appends an asset to assets.json. The file is only created once the first asset is added.
+
+        :param asset: Asset to write
+        :type asset: Union[NodeAsset, ParentAsset, LeafAsset]
+        """
+        if self._closed:
+            raise ValueError("Cannot add an asset to a closed LineageWriter")
+        if self._assets_file is None:
+            self._assets_file = self._open_array(self.output_directory_path / "assets.json")
+        self._write_item(self._assets_file, json.dumps(asset, default=pydantic_encoder), first=self.asset_count == 0)
+        self.asset_count += 1
+
+    def add_assets(self, assets: Iterable[Union[NodeAsset, ParentAsset, LeafAsset]]) -> None:
+        for asset in assets:
+            self.add_asset(asset)
+
+    def _close_files(self) -> None:
+        for out_file in (self._lineage_file, self._assets_file):
+            if out_file is not None:
+                self._close_array(out_file)
+        self._lineage_file = None
+        self._assets_file = None
+        self._closed = True
+
+    def _write_metadata(self, directory_path: Path) -> None:
+        with open(directory_path / "metadata.json", "w") as out_file:
+            metadata = {
+                "version": 3,
+                "application_name": self.custom_lineage_config.application_name,
+                "asset_types": {asset_type.name: {"uuid": asset_type.uuid} for asset_type in self.asset_types},
+            }
+            json.dump(metadata, out_file)
+
+    def _close_shards(self) -> None:
+        # the assets and the metadata are needed by every shard
+        assets_path = self.output_directory_path / "assets.json"
+        for shard in self.shards:
+            shard_directory_path = self.output_directory_path / shard["directory"]
+            if self.asset_count:
+                shutil.copyfile(assets_path, shard_directory_path / "assets.json")
+            self._write_metadata(shard_directory_path)
+        if self.asset_count:
+            assets_path.unlink()
+
+        # the source code files referred to by the lineage relationships now live in the shards, the other ones (e.g.
+        # of dropped duplicates) are not referred to by any shard
+        source_code_directory_path = self.custom_lineage_config.source_code_directory_path
+        if source_code_directory_path.resolve() != self.output_directory_path.resolve():
+            shutil.rmtree(source_code_directory_path, ignore_errors=True)
+
+        with open(self.output_directory_path / "manifest.json", "w") as out_file:
+            manifest = {
+                "version": 3,
+                "application_name": self.custom_lineage_config.application_name,
+                "lineages": self.lineage_count,
+                "shards": self.shards,
+            }
+            json.dump(manifest, out_file, indent=4)
+
+    def close(self) -> None:
+        """
+        Finalizes lineage.json and assets.json and writes metadata.json (and manifest.json when sharded)
+        """
+        if self._closed:
+            return
+        self._close_files()
+        profiling.count("json.lineages", self.lineage_count)
+        profiling.count("json.assets", self.asset_count)
+        if self.sharded:
+            self._close_shards()
+        else:
+            self._write_metadata(self.output_directory_path)
+
+
 def generate_json_files(
-    lineages: List[Lineage],
+    lineages: Iterable[Lineage],
     asset_types: List[AssetType],
     custom_lineage_config: CustomLineageConfig,
-    assets: Optional[AssetTypeSequence] = None,
+    assets: Optional[Iterable[Union[NodeAsset, ParentAsset, LeafAsset]]] = None,
+    max_lineages_per_file: Optional[int] = None,
+    max_bytes_per_file: Optional[int] = None,
 ) -> None:
     """
     Helper function that generates the json files which can be used as input for custom technical lineage batch format
 
-    :param assets: List of assets which will be used to construct assets.json file
-    :type assets: Sequence[Union[NodeAsset, ParentAsset, LeafAsset]]
-    :param lineages: List of lineage relationships which will be used to construct lineage.json
-    :type lineages: List[Lineage]
+    :param assets: Assets which will be used to construct assets.json file
+    :type assets: Iterable[Union[NodeAsset, ParentAsset, LeafAsset]]
+    :param lineages: Lineage relationships which will be used to construct lineage.json
+    :type lineages: Iterable[Lineage]
     :param asset_types: List of asset types which will be used to construct metadata.json file
     :type asset_types: List[AssetType]
     :param custom_lineage_config: Configuration object
     :type custom_lineage_config: CustomLineageConfig
+    :param max_lineages_per_file: Optional parameter - shard the output, see LineageWriter
+    :type max_lineages_per_file: int
+    :param max_bytes_per_file: Optional parameter - shard the output, see LineageWriter
+    :type max_bytes_per_file: int
     :returns: nothing
     :rtype: None
     """
-    # creating assets.json
-    if assets:
-        with open(custom_lineage_config.output_directory_path / "assets.json", "w") as out_file:
-            json.dump(assets, out_file, default=pydantic_encoder)
-
-    # creating lineage.json
-    with open(custom_lineage_config.output_directory_path / "lineage.json", "w") as out_file:
-        json.dump([lineage.model_dump(exclude_none=True) for lineage in lineages], out_file, default=pydantic_encoder)
-
-    # creating metadata.json
-    with open(custom_lineage_config.output_directory_path / "metadata.json", "w") as out_file:
-        metadata = {
-            "version": 3,
-            "application_name": custom_lineage_config.application_name,
-            "asset_types": {asset_type.name: {"uuid": asset_type.uuid} for asset_type in asset_types},
-        }
-        json.dump(metadata, out_file)
+    with profiling.stage("json.write"):
+        with LineageWriter(
+            custom_lineage_config=custom_lineage_config,
+            asset_types=asset_types,
+            max_lineages_per_file=max_lineages_per_file,
+            max_bytes_per_file=max_bytes_per_file,
+        ) as writer:
+            writer.add_assets(assets or [])
+            writer.add_lineages(lineages)
+
+
+def _write_source_code_file_once(
+    file_name: str, custom_lineage_config: CustomLineageConfig, write: Callable[[Path], Any]
+) -> None:
+    target = custom_lineage_config.source_code_directory_path / file_name
+    if target.exists():
+        return
+    # write to a temporary file first so that concurrent writers never expose a partially written file
+    tmp_target = target.with_name(f".{file_name}.{os.getpid()}.tmp")
+    write(tmp_target)
+    if profiling.get_profiler() is not None:
+        profiling.count("source_code.files_written")
+        profiling.count("source_code.bytes_written", tmp_target.stat().st_size)
+    os.replace(tmp_target, target)
+
+
+def _deduplicated_source_code_file(source_code_text: str, custom_lineage_config: CustomLineageConfig) -> str:
+    index = custom_lineage_config.source_code_index
+    source_code_path = Path(source_code_text)
+
+    # in case of a file: hash the content once per version of the file
+    if source_code_path.is_file():
+        stat = source_code_path.stat()
+        key = f"{source_code_path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+        file_name = index.get(key)
+        if file_name is None:
+            digest = hashlib.sha256()
+            with open(source_code_path, "rb") as source_code_file:
+                for chunk in iter(lambda: source_code_file.read(HASH_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            file_name = f"{digest.hexdigest()}{source_code_path.suffix}"
+            _write_source_code_file_once(
+                file_name, custom_lineage_config, lambda target: shutil.copyfile(source_code_path, target)
+            )
+            index[key] = file_name
+        return file_name
+
+    content = source_code_text.encode("utf-8")
+    file_name = f"{hashlib.sha256(content).hexdigest()}.txt"
+    if file_name not in index:
+        _write_source_code_file_once(file_name, custom_lineage_config, lambda target: target.write_bytes(content))
+        index[file_name] = file_name
+    return file_name
 
 
 def generate_source_code(
@@ -80,6 +373,10 @@ def generate_source_code(
     """
     Helper function that generates `SourceCode` object.
 
+    When `deduplicate_source_code` is enabled on the configuration, the source code file is named after the sha256
+    hash of its content. Identical source code is then stored only once and shared by all the lineage relationships
+    referring to it.
+
     :param source_code_text: Text to use as source code or path of a file to be used
     :type source_code_text: str
     :param custom_lineage_config: Configuration object
@@ -91,15 +388,20 @@ def generate_source_code(
     :returns: SourceCode object constructed using the provided input
     :rtype: SourceCode
     """
+    if custom_lineage_config.deduplicate_source_code:
+        file_name = _deduplicated_source_code_file(source_code_text, custom_lineage_config)
     # in case of a file
-    if Path(source_code_text).is_file():
+    elif Path(source_code_text).is_file():
         file_name = Path(source_code_text).name
         shutil.copy(source_code_text, custom_lineage_config.source_code_directory_path / file_name)
+        profiling.count("source_code.files_written")
     else:
         # generate file name
         file_name = f"{str(uuid.uuid4())}.txt"
         with open(custom_lineage_config.source_code_directory_path / file_name, "w") as out_file:
-            out_file.write(source_code_text)
+            written = out_file.write(source_code_text)
+        profiling.count("source_code.files_written")
+        profiling.count("source_code.bytes_written", written)
     return SourceCode(
         path=f"{custom_lineage_config.source_code_directory_name}/{file_name}",
         highlights=highlights,
@@ -107,32 +409,18 @@ def generate_source_code(
     )
 
 
-def _http_get(url: str, auth: HTTPBasicAuth) -> requests.Response:
-    attempt = 1
-    while attempt <= MAX_HTTP_RETRY:
-        try:
-            logging.info(f"Sending GET {url}")
-            ret = requests.get(url, auth=auth)
-        except NameResolutionError as e:
-            raise e
-        except Exception as e:
-            attempt += 1
-            logging.warning(f"GET {url} failed with\n{e}")
-        else:
-            if ret.status_code >= 400 and ret.status_code < 500:
-                raise CollibraAPIError(f"GET {url} failed with {ret.status_code} {ret.text}")
-            elif ret.status_code == 200:
-                logging.info(f"Response received for GET {url}: {ret.status_code}")
-                return ret
-            else:
-                logging.warning(f"attempt {attempt}/5 GET {url} failed with {ret.status_code} {ret.text}")
-                attempt += 1
-
-    raise CollibraAPIError(f"Failed GET {url} after {MAX_HTTP_RETRY} attempts")
+def _http_get(url: str, client: CollibraClient) -> requests.Response:
+    with profiling.stage("http.get"):
+        return client.get(url)
 
 
 def collect_assets_typeid(
-    collibra_instance: str, username: str, password: str, asset_type: Optional[str] = None
+    collibra_instance: str,
+    username: str,
+    password: str,
+    asset_type: Optional[str] = None,
+    client: Optional[CollibraClient] = None,
+    cache: Optional[MetadataCache] = None,
 ) -> List[AssetType]:
     """
     Helper function that collect asset types ID from Collibra
@@ -145,30 +433,120 @@ def collect_assets_typeid(
     :type password: str
     :param asset_type: Optional parameter - Asset type name
     :type asset_type: str
+    :param client: Optional parameter - HTTP client to reuse, a new one is created for this call when not provided
+    :type client: CollibraClient
+    :param cache: Optional parameter - cache read before, and updated after, calling Collibra
+    :type cache: MetadataCache
     :returns: list of AssetFullnameDomain objects
     :rtype: list
     """
 
-    asset_types = []
-    limit = 100
-    offset = 0
-    auth = HTTPBasicAuth(username=username, password=password)
-    total = 1
-    while offset < total:
-        url = f"https://{collibra_instance}.collibra.com/rest/2.0/assetTypes?limit={limit}&offset={offset}"
-        search_by_name = "" if not asset_type else f"&name={asset_type}&nameMatchMode=EXACT"
-        ret = _http_get(url=f"{url}{search_by_name}", auth=auth)
-        result = json.loads(ret.text)
-        total = result["total"]
-        offset += limit
-        for entry in result["results"]:
-            name = entry.get("name")
-            id = entry.get("id")
-            asset_types.append(AssetType(name=name, uuid=id))
+    def get_asset_types_from_collibra(client: CollibraClient) -> List[AssetType]:
+        asset_types = []
+        limit = 1000
+        offset = 0
+        total = 1
+        while offset < total:
+            url = f"https://{collibra_instance}.collibra.com/rest/2.0/assetTypes?limit={limit}&offset={offset}"
+            search_by_name = "" if not asset_type else f"&name={asset_type}&nameMatchMode=EXACT"
+            ret = _http_get(url=f"{url}{search_by_name}", client=client)
+            result = json.loads(ret.text)
+            total = result["total"]
+            offset += limit
+            for entry in result["results"]:
+                name = entry.get("name")
+                id = entry.get("id")
+                asset_types.append(AssetType(name=name, uuid=id))
+
+        return asset_types
+
+    filters = {"name": asset_type}
+    if cache is not None:
+        cached_asset_types = cache.get(collibra_instance, "assetTypes", filters)
+        if cached_asset_types is not None:
+            return [AssetType(**entry) for entry in cached_asset_types]
+
+    if client is None:
+        with CollibraClient(username=username, password=password) as new_client:
+            asset_types = get_asset_types_from_collibra(new_client)
+    else:
+        asset_types = get_asset_types_from_collibra(client)
 
+    if cache is not None:
+        cache.set(collibra_instance, "assetTypes", filters, [entry.model_dump() for entry in asset_types])
     return asset_types
 
 
+class AssetTypeResolver:
+    """
+    Resolves asset type names into asset type IDs for a Collibra instance.
+
+    The complete asset type catalogue is fetched once, on the first lookup, and every lookup is answered from an
+    in-memory name index. Names are matched exactly; when no exact match exists, a case insensitive match is used.
+
+    :param collibra_instance: Collibra instance name
+    :type collibra_instance: str
+    :param username: Collibra username
+    :type username: str
+    :param password: Collibra user's password
+    :type password: str
+    :param client: Optional parameter - HTTP client to reuse
+    :type client: CollibraClient
+    :param cache: Optional parameter - cache of the asset type catalogue
+    :type cache: MetadataCache
+    """
+
+    def __init__(
+        self,
+        collibra_instance: str,
+        username: str,
+        password: str,
+        client: Optional[CollibraClient] = None,
+        cache: Optional[MetadataCache] = None,
+    ) -> None:
+        self.collibra_instance = collibra_instance
+        self.username = username
+        self.password = password
+        self.client = client
+        self.cache = cache
+        self._asset_types: Optional[List[AssetType]] = None
+        self._index: Dict[str, List[AssetType]] = {}
+        self._index_lower: Dict[str, List[AssetType]] = {}
+
+    def _load(self) -> List[AssetType]:
+        if self._asset_types is None:
+            self._asset_types = collect_assets_typeid(
+                collibra_instance=self.collibra_instance,
+                username=self.username,
+                password=self.password,
+                client=self.client,
+                cache=self.cache,
+            )
+            for asset_type in self._asset_types:
+                self._index.setdefault(asset_type.name, []).append(asset_type)
+                self._index_lower.setdefault(asset_type.name.lower(), []).append(asset_type)
+        return self._asset_types
+
+    @property
+    def asset_types(self) -> List[AssetType]:
+        """
+        All the asset types of the Collibra instance
+        """
+        return list(self._load())
+
+    def resolve(self, asset_type: str) -> List[AssetType]:
+        """
+        Returns the asset types matching the provided name, or an empty list when the name is unknown
+
+        :param asset_type: Asset type name
+        :type asset_type: str
+        :returns: list of AssetType objects
+        :rtype: list
+        """
+        self._load()
+        return list(self._index.get(asset_type) or self._index_lower.get(asset_type.lower(), []))
+
+
 def collect_assets_fullname(
     collibra_instance: str,
     username: str,
@@ -176,6 +554,8 @@ def collect_assets_fullname(
     type_id: Optional[str] = None,
     domain_id: Optional[str] = None,
     name: Optional[str] = None,
+    client: Optional[CollibraClient] = None,
+    cache: Optional[MetadataCache] = None,
 ) -> List[AssetFullnameDomain]:
     """
     Helper function that collect assets fullname from Collibra
@@ -192,13 +572,16 @@ def collect_assets_fullname(
     :type domain_id: str
     :param name: Optional parameter - Assets name
     :type name: str
+    :param client: Optional parameter - HTTP client to reuse, a new one is created for this call when not provided
+    :type client: CollibraClient
+    :param cache: Optional parameter - cache read before, and updated after, calling Collibra
+    :type cache: MetadataCache
     :returns: list of AssetFullnameDomain objects
     :rtype: list
     """
 
-    def get_assets_fullname_from_collibra() -> List[AssetFullnameDomain]:
+    def get_assets_fullname_from_collibra(client: CollibraClient) -> List[AssetFullnameDomain]:
         fullnames = []
-        auth = HTTPBasicAuth(username=username, password=password)
         cursor = urllib.parse.quote("")
         limit = 1000
         base_path = f"https://{collibra_instance}.collibra.com/rest/2.0/assets?limit={limit}"
@@ -212,7 +595,7 @@ def collect_assets_fullname(
 
         while cursor is not None:
             query_path = base_path + f"&cursor={cursor}"
-            ret = _http_get(url=query_path, auth=auth)
+            ret = _http_get(url=query_path, client=client)
             result = json.loads(ret.text)
             cursor = result.get("nextCursor")
             for entry in result.get("results", []):
@@ -248,7 +631,21 @@ def collect_assets_fullname(
                 raise InvalidUUIDException(f"Domain Id {domain_id} is not a valid UUID")
 
     validate_inputs()
-    return get_assets_fullname_from_collibra()
+    filters = {"typeId": type_id, "domainId": domain_id, "name": name}
+    if cache is not None:
+        cached_fullnames = cache.get(collibra_instance, "assetFullnames", filters)
+        if cached_fullnames is not None:
+            return [AssetFullnameDomain(**entry) for entry in cached_fullnames]
+
+    if client is None:
+        with CollibraClient(username=username, password=password) as new_client:
+            fullnames = get_assets_fullname_from_collibra(new_client)
+    else:
+        fullnames = get_assets_fullname_from_collibra(client)
+
+    if cache is not None:
+        cache.set(collibra_instance, "assetFullnames", filters, [entry.model_dump() for entry in fullnames])
+    return fullnames
 
 
 def get_asset_types_name_from_lineage_json_file(path: str) -> set:
@@ -267,7 +664,11 @@ def get_asset_types_name_from_lineage_json_file(path: str) -> set:
 
 
 def synchronize_capability(
-    collibra_instance: str, username: str, password: str, capability_id: str
+    collibra_instance: str,
+    username: str,
+    password: str,
+    capability_id: str,
+    client: Optional[CollibraClient] = None,
 ) -> Optional[requests.Response]:
     """
     Helper function that triggers the synchronisation of the custom lineage capability
@@ -280,22 +681,25 @@ def synchronize_capability(
     :type password: str
     :param capability_id: ID of the capability to synchronize
     :type type_id: str
+    :param client: Optional parameter - HTTP client to reuse, a new one is created for this call when not provided
+    :type client: CollibraClient
     :returns: response of the http post call to synchronize the capability
     :rtype: requests.Response
     """
-    auth = HTTPBasicAuth(username=username, password=password)
+    if client is None:
+        with CollibraClient(username=username, password=password) as new_client:
+            return synchronize_capability(collibra_instance, username, password, capability_id, client=new_client)
+
     url = f"https://{collibra_instance}/rest/catalog/1.0/genericIntegration/{capability_id}/run"
-    logging.info(f"Sending POST {url}")
     try:
-        ret = requests.post(url=url, auth=auth)
+        with profiling.stage("http.post"):
+            ret = client.post(url)
     except NameResolutionError as e:
         raise e
-    except Exception as e:
+    except requests.RequestException as e:
         logging.warning(f"POST {url} failed with\n{e}")
     else:
-        if ret.status_code >= 400 and ret.status_code < 500:
-            raise CollibraAPIError(f"POST {url} failed with {ret.status_code} {ret.text}")
-        elif ret.status_code == 200:
-            logging.info(f"Response received for GET {url}: {ret.status_code}")
+        if ret.status_code == 200:
             return ret
+        logging.warning(f"POST {url} failed with {ret.status_code} {ret.text}")
     return None
@@ -0,0 +1,164 @@
+import json
+import re
+from typing import Any, Iterator, TextIO
+
+__all__ = ["JSONStreamReader"]
+READ_CHUNK_SIZE = 1024 * 1024
+_WHITESPACE = " \t\n\r"
+# anything but brackets, complete strings included
+_SKIP_TEXT = r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*'
+# an array or object nested at most 3 levels deep, matched at once
+_SKIP_CONTAINER = r"[\[{]" + _SKIP_TEXT + r"[\]}]"
+for _ in range(2):
+    _SKIP_CONTAINER = r"[\[{]" + _SKIP_TEXT + r"(?:" + _SKIP_CONTAINER + _SKIP_TEXT + r")*[\]}]"
+# the next bracket or small container, skipped by `JSONStreamReader.skip`
+_SKIP_TOKEN = re.compile(_SKIP_TEXT + r"(" + _SKIP_CONTAINER + r"|[\[\]{}])", re.DOTALL)
+
+
+class JSONStreamReader:
+    """
+    Incremental reader for large json documents.
+
+    The document is read in chunks and only the values requested by the caller are decoded, so the items of a large
+    array can be processed one by one without loading the whole document in memory. The reader walks the document
+    forwards only: every value returned by `members` has to be consumed with `value`, `items`, `elements`, `members` or
+    `skip` before moving on to the next member.
+
+    Usage::
+
+        with open("lineage.json") as f:
+            reader = JSONStreamReader(f)
+            for key in reader.members():
+                if key == "lineages":
+                    for lineage in reader.items():
+                        ...
+                else:
+                    reader.skip()
+
+    :param in_file: Text file to read
+    :type in_file: TextIO
+    :param chunk_size: Number of characters read at once
+    :type chunk_size: int
+    """
+
+    def __init__(self, in_file: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> None:
+        self.in_file = in_file
+        self.chunk_size = chunk_size
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, size: int) -> bool:
+        # drop the consumed part of the buffer and read at least `size` more characters
+        if self._eof:
+            return False
+        chunk = self.in_file.read(max(size, self.chunk_size))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._position :] + chunk
+        self._position = 0
+        return True
+
+    def _peek(self) -> str:
+        # returns the next non whitespace character without consuming it, or "" at the end of the document
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in _WHITESPACE:
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def _expect(self, characters: str) -> str:
+        character = self._peek()
+        if not character or character not in characters:
+            raise json.JSONDecodeError(f"Expecting one of {characters!r}", self._buffer, self._position)
+        self._position += 1
+        return character
+
+    def value(self) -> Any:
+        """
+        Decodes and returns the next value
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                # the value is incomplete; read at least as much as is buffered so large values are decoded in a
+                # logarithmic number of attempts
+                if not self._fill(len(self._buffer) - self._position):
+                    raise
+                continue
+            # a number at the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill(self.chunk_size):
+                continue
+            self._position = end
+            return value
+
+    def items(self) -> Iterator[Any]:
+        """
+        Yields the items of the next value, which must be an array
+        """
+        for _ in self.elements():
+            yield self.value()
+
+    def elements(self) -> Iterator[int]:
+        """
+        Yields the index of every item of the next value, which must be an array, without decoding the items. Every
+        item has to be consumed with `value`, `items`, `elements`, `members` or `skip` before the next index is
+        requested, so large nested values can be read incrementally as well.
+        """
+        self._expect("[")
+        if self._peek() == "]":
+            self._position += 1
+            return
+        index = 0
+        while True:
+            yield index
+            if self._expect(",]") == "]":
+                return
+            index += 1
+
+    def members(self) -> Iterator[str]:
+        """
+        Yields the keys of the next value, which must be an object. The value of every key has to be consumed before
+        the next key is requested.
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self._position += 1
+            return
+        while True:
+            if self._peek() != '"':
+                raise json.JSONDecodeError("Expecting property name", self._buffer, self._position)
+            key = self.value()
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def skip(self) -> None:
+        """
+        Skips the next value without decoding it. Arrays and objects are scanned for their closing bracket and no
+        object is built, whatever their size; their content is not validated.
+        """
+        if self._peek() not in ("[", "{"):
+            self.value()
+            return
+        depth = 0
+        while True:
+            match = _SKIP_TOKEN.match(self._buffer, self._position)
+            if match is None:
+                # the next token continues in the next chunk
+                if not self._fill(max(len(self._buffer) - self._position, self.chunk_size)):
+                    raise json.JSONDecodeError("Unterminated value", self._buffer, self._position)
+                continue
+            self._position = match.end()
+            token = match.group(1)
+            if len(token) == 1:
+                depth += 1 if token in "[{" else -1
+            if depth == 0:
+                return
@@ -1,7 +1,8 @@
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
 
-from pydantic import BaseModel, model_validator
+from pydantic import BaseModel, TypeAdapter, model_validator
 
 __all__ = [
     "Asset",
@@ -13,8 +14,12 @@ __all__ = [
     "ParentAsset",
     "LeafAsset",
     "Lineage",
+    "AssetPool",
+    "AssetCache",
     "CustomLineageConfig",
+    "validate_lineages",
 ]
+DEFAULT_ASSET_CACHE_SIZE = 100_000
 
 
 class AssetType(BaseModel):
@@ -79,6 +84,172 @@ class Lineage(BaseModel):
         return self
 
 
+_LINEAGES_ADAPTER = TypeAdapter(List[Lineage])
+
+
+def validate_lineages(lineages: List[dict]) -> List[Lineage]:
+    """
+    Validates a list of lineage relationships, provided as dictionaries, in a single call.
+
+    This is a separate post-check, e.g. of the output of a trusted conversion:
+    `validate_lineages(json.load(lineage_json_file))`. The converters do not use it: rebuilding every nested model
+    from dictionaries is about 10 times slower than the validated construction of `Lineage` objects from the interned
+    assets.
+
+    :param lineages: Lineage relationships as dictionaries
+    :type lineages: List[dict]
+    :returns: validated Lineage objects
+    :rtype: List[Lineage]
+    """
+    return _LINEAGES_ADAPTER.validate_python(lineages)
+
+
+class AssetPool:
+    """
+    Registry of interned assets.
+
+    Identical `Asset` and `AssetProperties` objects and node lists are created (and validated) once and shared by all
+    the `ParentAsset` and `LeafAsset` objects built through the pool. Memory usage then depends on the number of
+    distinct assets instead of the number of lineage relationships referring to them.
+
+    The shared objects must be treated as immutable: changing an asset returned by the pool changes it for all the
+    lineage relationships referring to it.
+
+    :param trusted: Construct all the models without validation, including the lineage relationships (and their
+        `verify_allowed_relationship` check). Only use it for input which is known to be valid, e.g. generated
+        files; the output is the same as with validation.
+    :type trusted: bool
+    """
+
+    def __init__(self, trusted: bool = False) -> None:
+        self.trusted = trusted
+        self._assets: Dict[Tuple[str, str], Asset] = {}
+        self._nodes: Dict[Tuple[Tuple[str, str], ...], List[Asset]] = {}
+        self._props: Dict[Tuple[str, str], AssetProperties] = {}
+
+    def asset(self, name: str, type: str) -> Asset:
+        key = (name, type)
+        asset = self._assets.get(key)
+        if asset is None:
+            if self.trusted:
+                asset = Asset.model_construct(name=name, type=type)
+            else:
+                asset = Asset(name=name, type=type)
+            self._assets[key] = asset
+        return asset
+
+    def nodes(self, nodes: Sequence[Tuple[str, str]]) -> List[Asset]:
+        """
+        Returns the shared list of node assets for a sequence of (name, type) pairs
+        """
+        key = tuple(nodes)
+        node_assets = self._nodes.get(key)
+        if node_assets is None:
+            node_assets = self._nodes[key] = [self.asset(name, type) for name, type in key]
+        return node_assets
+
+    def props(self, fullname: str, domain_id: str) -> AssetProperties:
+        key = (fullname, domain_id)
+        props = self._props.get(key)
+        if props is None:
+            if self.trusted:
+                props = AssetProperties.model_construct(fullname=fullname, domain_id=domain_id)
+            else:
+                props = AssetProperties(fullname=fullname, domain_id=domain_id)
+            self._props[key] = props
+        return props
+
+    def parent_asset(self, nodes: List[Asset], parent: Asset, props: Optional[AssetProperties] = None) -> ParentAsset:
+        # the components are validated models, constructing without validation keeps the shared node list
+        return ParentAsset.model_construct(nodes=nodes, parent=parent, props=props)
+
+    def leaf_asset(
+        self, nodes: List[Asset], parent: Asset, leaf: Asset, props: Optional[AssetProperties] = None
+    ) -> LeafAsset:
+        return LeafAsset.model_construct(nodes=nodes, parent=parent, leaf=leaf, props=props)
+
+    def lineage(
+        self,
+        src: Union[LeafAsset, ParentAsset],
+        trg: Union[LeafAsset, ParentAsset],
+        source_code: Optional[SourceCode] = None,
+    ) -> Lineage:
+        if self.trusted:
+            return Lineage.model_construct(src=src, trg=trg, source_code=source_code)
+        return Lineage(src=src, trg=trg, source_code=source_code)
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    def clear(self) -> None:
+        """
+        Forgets the interned objects, e.g. between the batches of a streaming conversion. The objects already returned
+        by the pool are not affected.
+        """
+        self._assets.clear()
+        self._nodes.clear()
+        self._props.clear()
+
+
+class AssetCache:
+    """
+    Bounded least recently used cache of built `ParentAsset` and `LeafAsset` objects.
+
+    The conversion tools key it on what defines an asset in their input, e.g. the asset types and names of a csv row
+    with its fullname and domain id, so an asset referred to by many rows is only built once. Only the `maxsize` most
+    recently used assets are kept, which bounds the memory used whatever the number of distinct assets. `hits` and
+    `misses` count the lookups.
+
+    Usage::
+
+        asset = asset_cache.get(key)
+        if asset is None:
+            asset = asset_cache.put(key, build_asset())
+
+    :param maxsize: Maximum number of assets kept
+    :type maxsize: int
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_ASSET_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._assets: "OrderedDict[Hashable, Union[ParentAsset, LeafAsset]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: Hashable) -> Optional[Union[ParentAsset, LeafAsset]]:
+        """
+        Returns the cached asset of `key`, or None when it is not cached
+        """
+        asset = self._assets.get(key)
+        if asset is None:
+            self.misses += 1
+            return None
+        self._assets.move_to_end(key)
+        self.hits += 1
+        return asset
+
+    def put(self, key: Hashable, asset: Union[ParentAsset, LeafAsset]) -> Union[ParentAsset, LeafAsset]:
+        """
+        Caches the asset of `key`, evicting the least recently used asset when the cache is full, and returns it
+        """
+        self._assets[key] = asset
+        self._assets.move_to_end(key)
+        if len(self._assets) > self.maxsize:
+            self._assets.popitem(last=False)
+        return asset
+
+    def clear(self) -> None:
+        self._assets.clear()
+
+
 class CustomLineageConfig:
     def __init__(
         self,
@@ -88,6 +259,7 @@ class CustomLineageConfig:
         dic_instance: str = "",
         dic_username: str = "",
         dic_password: str = "",
+        deduplicate_source_code: bool = False,
     ):
         self.application_name = application_name
         self.dic_instance = dic_instance
@@ -95,6 +267,9 @@ class CustomLineageConfig:
         self.dic_password = dic_password
         self.output_directory_path = Path(output_directory)
         self.source_code_directory_name = source_code_directory_name
+        # content-addressed source code files, see helper.generate_source_code
+        self.deduplicate_source_code = deduplicate_source_code
+        self.source_code_index: Dict[str, str] = {}
 
         self._create_directories()
 
@@ -0,0 +1,209 @@
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, TypeVar
+
+__all__ = ["Profiler", "count", "disable", "enable", "get_profiler", "snapshot_memory", "stage", "timed"]
+F = TypeVar("F", bound=Callable[..., Any])
+_NULL_STAGE: ContextManager[None] = nullcontext()
+_profiler: Optional["Profiler"] = None
+
+
+class Profiler:
+    """
+    Collects stage timings, counters and memory usage of a run.
+
+    Stages are named sections of the run (e.g. "csv.parse"); for every stage the number of calls and their total and
+    maximum duration are kept, which also gives the latency of calls such as "http.get". Counters accumulate numbers
+    such as rows, files or bytes. When `trace_memory` is set, tracemalloc is started as well, which slows the run
+    down but reports the Python allocations and where they come from.
+
+    The profiler is process wide; stages run in the worker processes of a process pool are not collected.
+
+    :param trace_memory: Trace the Python memory allocations with tracemalloc
+    :type trace_memory: bool
+    """
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.memory_snapshots: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                self.stages[name] = {"calls": 1, "seconds": seconds, "max_seconds": seconds}
+            else:
+                stats["calls"] += 1
+                stats["seconds"] += seconds
+                stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def timed(self, name: str, function: F) -> F:
+        """
+        Returns a wrapper of `function` recording the duration of every call as stage `name`
+        """
+
+        @wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add_time(name, time.perf_counter() - start)
+
+        return wrapper  # type: ignore[return-value]
+
+    def snapshot_memory(self, label: str) -> None:
+        """
+        Records the current and peak memory usage, e.g. at the end of a stage
+        """
+        snapshot: Dict[str, Any] = {"label": label, "peak_rss_bytes": peak_rss()}
+        if tracemalloc.is_tracing():
+            snapshot["traced_current_bytes"], snapshot["traced_peak_bytes"] = tracemalloc.get_traced_memory()
+        with self._lock:
+            self.memory_snapshots.append(snapshot)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns the collected measurements as a json serializable dict
+        """
+        report: Dict[str, Any] = {
+            "duration": time.perf_counter() - self._start,
+            "stages": {
+                name: {**stats, "mean_seconds": stats["seconds"] / stats["calls"]}
+                for name, stats in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            "peak_rss_bytes": peak_rss(),
+            "memory_snapshots": list(self.memory_snapshots),
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report["traced_memory"] = {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top_allocations": [
+                    {"location": str(statistic.traceback), "bytes": statistic.size, "count": statistic.count}
+                    for statistic in tracemalloc.take_snapshot().statistics("lineno")[:10]
+                ],
+            }
+        return report
+
+    def summary(self) -> str:
+        """
+        Returns a human readable summary of the report
+        """
+        report = self.report()
+        lines = [f"Profile ({report['duration']:.2f}s, peak RSS {report['peak_rss_bytes'] / 1024 ** 2:.1f} MiB)"]
+        for name, stats in sorted(report["stages"].items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(
+                f"  {name:<28} {stats['seconds']:>9.3f}s {int(stats['calls']):>10} calls "
+                f"{stats['mean_seconds'] * 1000:>9.3f}ms mean {stats['max_seconds'] * 1000:>9.3f}ms max"
+            )
+        for name, value in sorted(report["counters"].items()):
+            lines.append(f"  {name:<28} {value:>10}")
+        if "traced_memory" in report:
+            lines.append(f"  traced memory peak {report['traced_memory']['peak_bytes'] / 1024 ** 2:.1f} MiB")
+        return "\n".join(lines)
+
+    def write_report(self, path: str) -> None:
+        with open(path, "w") as out_file:
+            json.dump(self.report(), out_file, indent=4)
+
+
+def peak_rss() -> int:
+    """
+    Returns the peak resident set size of the current process in bytes, or 0 when it is not available
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def enable(trace_memory: bool = False) -> Profiler:
+    """
+    Enables the profiling of the current process and returns the profiler collecting the measurements
+    """
+    global _profiler
+    _profiler = Profiler(trace_memory=trace_memory)
+    return _profiler
+
+
+def disable() -> Optional[Profiler]:
+    """
+    Disables the profiling and returns the profiler that was active, if any
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None and profiler.trace_memory:
+        tracemalloc.stop()
+    return profiler
+
+
+def get_profiler() -> Optional[Profiler]:
+    return _profiler
+
+
+def stage(name: str) -> ContextManager[None]:
+    """
+    Times a stage of the run; does nothing when profiling is disabled
+
+    Usage::
+
+        with profiling.stage("json.write"):
+            ...
+    """
+    if _profiler is None:
+        return _NULL_STAGE
+    return _profiler.stage(name)
+
+
+def count(name: str, value: int = 1) -> None:
+    """
+    Adds `value` to a counter; does nothing when profiling is disabled
+    """
+    if _profiler is not None:
+        _profiler.count(name, value)
+
+
+def timed(name: str, function: F) -> F:
+    """
+    Returns `function` itself when profiling is disabled, and a wrapper timing every call otherwise. Meant for
+    functions called in a loop: look the function up once before the loop so the disabled case costs nothing.
+    """
+    if _profiler is None:
+        return function
+    return _profiler.timed(name, function)
+
+
+def snapshot_memory(label: str) -> None:
+    """
+    Records the current memory usage under `label`; does nothing when profiling is disabled
+    """
+    if _profiler is not None:
+        _profiler.snapshot_memory(label)
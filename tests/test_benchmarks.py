@@ -0,0 +1,75 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.generate import DatasetSpec, generate_csv, generate_v1, iter_edges
+from benchmarks.run import TOOLS, compare_reports, run_benchmarks
+from src.models import CustomLineageConfig
+from tools.ingest_csv import ingest_csv_files
+from tools.translate_to_batch_format import convert
+
+
+class BenchmarkTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.spec = DatasetSpec(systems=2, tables=10, columns=3, edges=100, source_code_reuse=0.8, files=3, seed=7)
+
+    def test_generation_is_deterministic(self):
+        self.assertEqual(list(iter_edges(self.spec)), list(iter_edges(self.spec)))
+        self.assertNotEqual(list(iter_edges(self.spec)), list(iter_edges(self.spec.model_copy(update={"seed": 8}))))
+
+        transformations = {edge[-1] for edge in iter_edges(self.spec)}
+        self.assertLess(len(transformations), 50)
+
+        for generate in (generate_csv, generate_v1):
+            generate(str(self.directory / "first"), self.spec)
+            generate(str(self.directory / "second"), self.spec)
+            for path in (self.directory / "first").iterdir():
+                self.assertEqual(path.read_bytes(), (self.directory / "second" / path.name).read_bytes())
+
+    def test_generated_datasets_are_valid_input(self):
+        csv_paths = generate_csv(str(self.directory / "csv"), self.spec)
+        self.assertEqual(len(csv_paths), 3)
+        ingest_csv_files(
+            source_directory=str(self.directory / "csv"),
+            custom_lineage_config=CustomLineageConfig(
+                application_name="benchmark", output_directory=str(self.directory / "csv_output")
+            ),
+        )
+        with open(self.directory / "csv_output" / "lineage.json") as f:
+            self.assertEqual(len(json.load(f)), len(set(iter_edges(self.spec))))
+
+        generate_v1(str(self.directory / "v1"), self.spec)
+        convert(
+            input_directory=str(self.directory / "v1"),
+            output_directory=str(self.directory / "v1_output"),
+            migrate_source_code=True,
+            deduplicate_source_code=True,
+        )
+        with open(self.directory / "v1_output" / "lineage.json") as f:
+            lineages = json.load(f)
+        self.assertEqual(len(lineages), len(set(iter_edges(self.spec))))
+        source_code_path = self.directory / "v1_output" / lineages[0]["source_code"]["path"]
+        self.assertTrue(source_code_path.read_text().startswith("CREATE OR REPLACE VIEW"))
+
+    def test_run_benchmarks(self):
+        report = run_benchmarks(tools=TOOLS, edges=[20, 40], spec=self.spec, work_directory=str(self.directory))
+
+        self.assertEqual(
+            [(result["tool"], result["edges"]) for result in report["results"]][: len(TOOLS)],
+            [(tool, 20) for tool in TOOLS],
+        )
+        for result in report["results"]:
+            self.assertGreater(result["wall_time"], 0)
+            self.assertGreater(result["rows_per_second"], 0)
+            self.assertGreater(result["peak_rss_bytes"], 0)
+            self.assertGreater(result["output_bytes"], 0)
+            self.assertEqual(result["spec"]["edges"], result["edges"])
+        json.dumps(report)
+
+        comparisons = compare_reports(report, report)
+        self.assertEqual(len(comparisons), 2 * len(TOOLS))
+        self.assertTrue(all(comparison["wall_time_ratio"] == 1 for comparison in comparisons))
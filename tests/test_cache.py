@@ -0,0 +1,67 @@
+import json
+import shutil
+import sqlite3
+import unittest
+from unittest import mock
+
+import requests
+
+from src.cache import MetadataCache
+from src.helper import collect_assets_fullname, collect_assets_typeid
+from src.models import AssetType
+
+
+def _response(content: dict) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(content).encode()
+    return response
+
+
+class MetadataCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_directory = "./test_data/cache"
+        self.cache = MetadataCache(cache_directory=self.cache_directory)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+
+    def test_get_set_invalidate(self):
+        self.assertIsNone(self.cache.get("instance", "assetTypes", {"name": "Table"}))
+        self.cache.set("instance", "assetTypes", {"name": "Table"}, [{"name": "Table", "uuid": "1"}])
+        self.cache.set("other", "assetTypes", {"name": "Table"}, [])
+        self.assertEqual(self.cache.get("instance", "assetTypes", {"name": "Table"}), [{"name": "Table", "uuid": "1"}])
+        self.assertIsNone(self.cache.get("instance", "assetTypes", {"name": "Column"}))
+
+        self.assertEqual(self.cache.invalidate(collibra_instance="instance"), 1)
+        self.assertIsNone(self.cache.get("instance", "assetTypes", {"name": "Table"}))
+        self.assertEqual(self.cache.get("other", "assetTypes", {"name": "Table"}), [])
+
+    def test_expired_entries_are_ignored(self):
+        self.cache.set("instance", "assetTypes", {"name": None}, [])
+        self.cache.ttl = -1
+        self.assertIsNone(self.cache.get("instance", "assetTypes", {"name": None}))
+
+    def test_context_manager_closes_the_connection(self):
+        with MetadataCache(cache_directory=self.cache_directory) as cache:
+            cache.set("instance", "assetTypes", {"name": None}, [])
+        with self.assertRaises(sqlite3.ProgrammingError):
+            cache.get("instance", "assetTypes", {"name": None})
+        self.assertEqual(self.cache.get("instance", "assetTypes", {"name": None}), [])
+
+    def test_collectors_read_through_cache(self):
+        asset_types = {"total": 1, "results": [{"name": "Table", "id": "00000000-0000-0000-0000-000000031007"}]}
+        with mock.patch("src.client.CollibraClient.get", return_value=_response(asset_types)) as get:
+            for _ in range(2):
+                result = collect_assets_typeid("instance", "user", "password", cache=self.cache)
+                self.assertEqual(result, [AssetType(name="Table", uuid="00000000-0000-0000-0000-000000031007")])
+        get.assert_called_once()
+
+        fullnames = {"results": [{"name": "DB > T1", "domain": {"id": "d"}, "id": "a"}]}
+        domain_id = "fea1b0b0-705f-4e0d-b5eb-1f21132cc718"
+        with mock.patch("src.client.CollibraClient.get", return_value=_response(fullnames)) as get:
+            for _ in range(2):
+                result = collect_assets_fullname("instance", "user", "password", domain_id=domain_id, cache=self.cache)
+                self.assertEqual(result[0].fullname, "DB > T1")
+        get.assert_called_once()
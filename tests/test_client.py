@@ -0,0 +1,78 @@
+import unittest
+from typing import Dict, Optional
+from unittest import mock
+
+import requests
+
+from src.client import CollibraClient
+from src.exceptions import CollibraAPIError
+
+
+def _response(status_code: int, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = b"{}"
+    return response
+
+
+class CollibraClientTest(unittest.TestCase):
+    def setUp(self):
+        self.client = CollibraClient(username="user", password="password", max_retries=3)
+        sleep_patcher = mock.patch("src.client.time.sleep")
+        self.sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+        self.addCleanup(self.client.close)
+
+    def test_get_reuses_session(self):
+        with mock.patch.object(self.client.session, "request", return_value=_response(200)) as request:
+            self.client.get("https://instance.collibra.com/rest/2.0/assets")
+            self.client.get("https://instance.collibra.com/rest/2.0/assets")
+        self.assertEqual(request.call_count, 2)
+        self.assertEqual(request.call_args.kwargs["timeout"], self.client.timeout)
+        self.sleep.assert_not_called()
+
+    def test_get_honours_retry_after(self):
+        responses = [_response(429, {"Retry-After": "7"}), _response(503), _response(200)]
+        with mock.patch.object(self.client.session, "request", side_effect=responses):
+            ret = self.client.get("https://instance.collibra.com/rest/2.0/assets")
+        self.assertEqual(ret.status_code, 200)
+        self.assertEqual(self.sleep.call_args_list[0].args[0], 7.0)
+        # no Retry-After header: exponential backoff with jitter
+        self.assertTrue(0.5 <= self.sleep.call_args_list[1].args[0] <= 1.0)
+
+    def test_get_clamps_retry_after(self):
+        responses = [_response(429, {"Retry-After": "86400"}), _response(503, {"Retry-After": "0"}), _response(200)]
+        with mock.patch.object(self.client.session, "request", side_effect=responses):
+            with self.assertLogs(level="WARNING") as logs:
+                ret = self.client.get("https://instance.collibra.com/rest/2.0/assets")
+        self.assertEqual(ret.status_code, 200)
+        self.assertEqual(self.sleep.call_args_list[0].args[0], self.client.max_retry_after)
+        self.assertEqual(self.sleep.call_args_list[1].args[0], 0.0)
+        self.assertTrue(any("retry after 86400s" in line for line in logs.output))
+
+    def test_get_raises_on_client_error_and_after_max_retries(self):
+        with mock.patch.object(self.client.session, "request", return_value=_response(404)):
+            with self.assertRaises(CollibraAPIError):
+                self.client.get("https://instance.collibra.com/rest/2.0/assets")
+
+        with mock.patch.object(self.client.session, "request", return_value=_response(500)) as request:
+            with self.assertRaises(CollibraAPIError):
+                self.client.get("https://instance.collibra.com/rest/2.0/assets")
+        self.assertEqual(request.call_count, 3)
+
+    def test_post_is_not_retried_on_server_error(self):
+        with mock.patch.object(self.client.session, "request", return_value=_response(500)) as request:
+            ret = self.client.post("https://instance.collibra.com/rest/catalog/1.0/genericIntegration/id/run")
+        self.assertEqual(ret.status_code, 500)
+        self.assertEqual(request.call_count, 1)
+
+        with mock.patch.object(self.client.session, "request", side_effect=requests.ConnectionError("reset")):
+            with self.assertRaises(requests.ConnectionError):
+                self.client.post("https://instance.collibra.com/rest/catalog/1.0/genericIntegration/id/run")
+
+    def test_retry_after_http_date(self):
+        self.assertEqual(
+            CollibraClient._retry_after(_response(429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})), 0.0
+        )
+        self.assertIsNone(CollibraClient._retry_after(_response(429, {"Retry-After": "soon"})))
@@ -0,0 +1,401 @@
+import hashlib
+import io
+import json
+import shutil
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Any, List, Optional
+from unittest import mock
+
+import paramiko
+
+from src.edge import MANIFEST_FILE_NAME, CommandResult, EdgeConnection, EdgeConnectionPool, EdgeHost, UploadReport
+from src.exceptions import EdgeCommandError, EdgeCommandTimeoutError, EdgeUploadError
+
+
+def _result(exit_status: int) -> CommandResult:
+    return CommandResult(command="", exit_status=exit_status)
+
+
+class _Channel(object):
+    """
+    SSH channel returning predefined chunks of output
+    """
+
+    def __init__(self, stdout_chunks: list, stderr_chunks: list, exit_status: Optional[int] = None) -> None:
+        self.stdout_chunks = stdout_chunks
+        self.stderr_chunks = stderr_chunks
+        self.exit_status = exit_status
+        self.eof_received = False
+        self.status_event = mock.Mock()
+        self.closed = False
+
+    def recv_ready(self) -> bool:
+        return bool(self.stdout_chunks)
+
+    def recv(self, size: int) -> bytes:
+        return self.stdout_chunks.pop(0)
+
+    def recv_stderr_ready(self) -> bool:
+        return bool(self.stderr_chunks)
+
+    def recv_stderr(self, size: int) -> bytes:
+        return self.stderr_chunks.pop(0)
+
+    def exit_status_ready(self) -> bool:
+        return self.exit_status is not None
+
+    def recv_exit_status(self) -> int:
+        assert self.exit_status is not None
+        return self.exit_status
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _RemoteFile(io.BytesIO):
+    def __init__(self, remote_files: dict, path: str) -> None:
+        super().__init__()
+        self.remote_files = remote_files
+        self.path = path
+
+    def set_pipelined(self, pipelined: bool) -> None:
+        pass
+
+    def close(self) -> None:
+        self.remote_files[self.path] = self.getvalue()
+        super().close()
+
+
+class _SFTPClient(object):
+    """
+    In-memory SFTP client
+    """
+
+    def __init__(self, remote_files: dict, failures: Optional[dict] = None) -> None:
+        self.remote_files = remote_files
+        self.failures = failures if failures is not None else {}
+        self.put_calls: List[str] = []
+
+    def open(self, path: str, mode: str) -> io.BytesIO:
+        if "r" in mode:
+            if path not in self.remote_files:
+                raise FileNotFoundError(path)
+            return io.BytesIO(self.remote_files[path])
+        return _RemoteFile(self.remote_files, path)
+
+    def put(self, local_path: str, remote_path: str) -> mock.Mock:
+        self.put_calls.append(remote_path)
+        if self.failures.get(remote_path, 0) > 0:
+            self.failures[remote_path] -= 1
+            raise OSError(f"failed to upload {remote_path}")
+        self.remote_files[remote_path] = Path(local_path).read_bytes()
+        return mock.Mock(st_size=len(self.remote_files[remote_path]))
+
+    def remove(self, path: str) -> None:
+        del self.remote_files[path]
+
+    def close(self) -> None:
+        pass
+
+
+class EdgeConnectionBundleTest(unittest.TestCase):
+    def setUp(self):
+        self.source_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.source_directory)
+        (self.source_directory / "source_codes").mkdir()
+        (self.source_directory / "lineage.json").write_text("[]")
+        for index in range(3):
+            (self.source_directory / "source_codes" / f"{index}.sql").write_text(f"select {index}")
+
+        self.remote_files = {}
+        sftp = mock.Mock()
+        sftp.open.side_effect = lambda path, mode: _RemoteFile(self.remote_files, path)
+        self.ssh_client = mock.Mock()
+        self.ssh_client.open_sftp.return_value = sftp
+        with mock.patch.object(EdgeConnection, "connect", return_value=self.ssh_client):
+            self.edge_connection = EdgeConnection(address="edge", username="user", certificate_path="/cert")
+
+    def test_upload_bundle(self):
+        with mock.patch.object(self.edge_connection, "send_command", return_value=_result(0)) as send_command:
+            self.edge_connection.upload_folder(
+                source_folder=str(self.source_directory), target_folder="/tmp/cl3", bundle=True
+            )
+
+        self.ssh_client.open_sftp.assert_called_once()
+        (remote_archive, archive) = self.remote_files.popitem()
+        sha256 = hashlib.sha256(archive).hexdigest()
+        with tarfile.open(fileobj=io.BytesIO(archive), mode="r:gz") as tar:
+            members = {member.name: member for member in tar.getmembers()}
+            self.assertEqual(tar.extractfile(members["./source_codes/2.sql"]).read(), b"select 2")
+        self.assertIn("./lineage.json", members)
+
+        command = send_command.call_args.kwargs["command"]
+        self.assertIn(f"echo '{sha256}  '{remote_archive} | sha256sum -c", command)
+        self.assertIn(f"tar -xzf {remote_archive} -C /tmp/cl3", command)
+
+    def test_upload_bundle_integrity_check_fails(self):
+        with mock.patch.object(self.edge_connection, "send_command", return_value=_result(1)):
+            with self.assertRaises(EdgeCommandError):
+                self.edge_connection.upload_bundle(source_folder=str(self.source_directory), target_folder="/tmp/cl3")
+
+
+class EdgeConnectionSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.source_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.source_directory)
+        (self.source_directory / "source_codes").mkdir()
+        (self.source_directory / "lineage.json").write_text("[]")
+        (self.source_directory / "source_codes" / "a.sql").write_text("select a")
+        (self.source_directory / "source_codes" / "b.sql").write_text("select b")
+
+        self.remote_files = {}
+        self.sftp = _SFTPClient(self.remote_files)
+        self.ssh_client = mock.Mock()
+        self.ssh_client.open_sftp.return_value = self.sftp
+        with mock.patch.object(EdgeConnection, "connect", return_value=self.ssh_client):
+            self.edge_connection = EdgeConnection(address="edge", username="user", certificate_path="/cert")
+
+    def test_sync_folder(self):
+        with mock.patch.object(self.edge_connection, "send_command", return_value=_result(0)) as send_command:
+            report = self.edge_connection.sync_folder(source_folder=str(self.source_directory), target_folder="/cl3")
+            self.assertEqual(send_command.call_args.kwargs["command"], "mkdir -p /cl3 /cl3/source_codes")
+            self.assertEqual((report.files_uploaded, report.files_deleted, report.files_unchanged), (3, 0, 0))
+            self.assertEqual(report.bytes_sent, 18)
+            self.assertIn(f"/cl3/{MANIFEST_FILE_NAME}", self.remote_files)
+
+            # second sync: one file changed, one removed, one added
+            (self.source_directory / "source_codes" / "a.sql").write_text("select aa")
+            (self.source_directory / "source_codes" / "b.sql").unlink()
+            (self.source_directory / "source_codes" / "c.sql").write_text("select c")
+            self.sftp.put_calls.clear()
+            report = self.edge_connection.sync_folder(source_folder=str(self.source_directory), target_folder="/cl3")
+
+        self.assertEqual(sorted(self.sftp.put_calls), ["/cl3/source_codes/a.sql", "/cl3/source_codes/c.sql"])
+        self.assertEqual((report.files_uploaded, report.files_deleted, report.files_unchanged), (2, 1, 1))
+        self.assertNotIn("/cl3/source_codes/b.sql", self.remote_files)
+        self.assertEqual(self.remote_files["/cl3/source_codes/a.sql"], b"select aa")
+
+        # nothing changed
+        with mock.patch.object(self.edge_connection, "send_command", return_value=_result(0)):
+            report = self.edge_connection.sync_folder(source_folder=str(self.source_directory), target_folder="/cl3")
+        self.assertEqual((report.files_uploaded, report.files_deleted, report.files_unchanged), (0, 0, 3))
+
+    def test_sync_folder_records_only_uploaded_files(self):
+        manifest_path = f"/cl3/{MANIFEST_FILE_NAME}"
+        with mock.patch.object(self.edge_connection, "send_command", return_value=_result(0)):
+            self.edge_connection.sync_folder(source_folder=str(self.source_directory), target_folder="/cl3")
+            (self.source_directory / "source_codes" / "a.sql").write_text("select aa")
+
+            # the upload channel cannot be opened: the manifest keeps the previous sha256 of a.sql
+            self.ssh_client.open_sftp.side_effect = [self.sftp, paramiko.SSHException("channel closed")]
+            with self.assertRaises(EdgeUploadError):
+                self.edge_connection.sync_folder(source_folder=str(self.source_directory), target_folder="/cl3")
+            self.ssh_client.open_sftp.side_effect = None
+            manifest = json.loads(self.remote_files[manifest_path])
+            self.assertEqual(manifest["source_codes/a.sql"], hashlib.sha256(b"select a").hexdigest())
+
+            # a file reported as not uploaded is left out of the manifest
+            with mock.patch.object(self.edge_connection, "_upload_files", return_value=[]):
+                self.edge_connection.sync_folder(source_folder=str(self.source_directory), target_folder="/cl3")
+            manifest = json.loads(self.remote_files[manifest_path])
+            self.assertEqual(sorted(manifest), ["lineage.json", "source_codes/b.sql"])
+
+            self.sftp.put_calls.clear()
+            report = self.edge_connection.sync_folder(source_folder=str(self.source_directory), target_folder="/cl3")
+
+        self.assertEqual(self.sftp.put_calls, ["/cl3/source_codes/a.sql"])
+        self.assertEqual((report.files_uploaded, report.files_unchanged), (1, 2))
+        self.assertEqual(self.remote_files["/cl3/source_codes/a.sql"], b"select aa")
+
+
+class EdgeConnectionParallelUploadTest(unittest.TestCase):
+    def setUp(self):
+        self.source_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.source_directory)
+        for shard in range(3):
+            (self.source_directory / f"lineage_{shard}").mkdir()
+            for index in range(5):
+                (self.source_directory / f"lineage_{shard}" / f"{index}.sql").write_text(f"select {index}")
+
+        self.remote_files = {}
+        self.failures = {}
+        self.ssh_client = mock.Mock()
+        self.ssh_client.open_sftp.side_effect = lambda: _SFTPClient(self.remote_files, self.failures)
+        with mock.patch.object(EdgeConnection, "connect", return_value=self.ssh_client):
+            self.edge_connection = EdgeConnection(address="edge", username="user", certificate_path="/cert")
+        sleep_patcher = mock.patch("src.edge.time.sleep")
+        self.sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+    def test_upload_files_parallel(self):
+        self.failures["/cl3/lineage_1/3.sql"] = 2
+        with mock.patch.object(self.edge_connection, "send_command", return_value=_result(0)) as send_command:
+            report = self.edge_connection.upload_files_parallel(
+                source_folder=str(self.source_directory), target_folder="/cl3", channels=4
+            )
+
+        self.assertEqual(
+            send_command.call_args.kwargs["command"], "mkdir -p /cl3 /cl3/lineage_0 /cl3/lineage_1 /cl3/lineage_2"
+        )
+        self.assertEqual(self.ssh_client.open_sftp.call_count, 4)
+        self.assertEqual(report.files_uploaded, 15)
+        self.assertEqual(report.bytes_sent, 15 * 8)
+        self.assertEqual(len(self.remote_files), 15)
+        self.assertEqual(self.remote_files["/cl3/lineage_1/3.sql"], b"select 3")
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_upload_files_parallel_fails_after_max_retries(self):
+        self.failures["/cl3/lineage_2/0.sql"] = 3
+        with mock.patch.object(self.edge_connection, "send_command", return_value=_result(0)):
+            with self.assertRaises(EdgeUploadError):
+                self.edge_connection.upload_files_parallel(
+                    source_folder=str(self.source_directory), target_folder="/cl3", channels=2, max_retries=3
+                )
+        self.assertEqual(len(self.remote_files), 14)
+
+    def test_upload_files_parallel_fails_when_channels_cannot_open(self):
+        self.ssh_client.open_sftp.side_effect = paramiko.SSHException("administratively prohibited")
+        with mock.patch.object(self.edge_connection, "send_command", return_value=_result(0)):
+            with self.assertRaisesRegex(EdgeUploadError, "Uploaded 0/15 files"):
+                self.edge_connection.upload_files_parallel(
+                    source_folder=str(self.source_directory), target_folder="/cl3", channels=2
+                )
+        self.assertEqual(self.remote_files, {})
+
+
+class EdgeConnectionSendCommandTest(unittest.TestCase):
+    def setUp(self):
+        self.ssh_client = mock.Mock()
+        with mock.patch.object(EdgeConnection, "connect", return_value=self.ssh_client):
+            self.edge_connection = EdgeConnection(address="edge", username="user", certificate_path="/cert")
+        select_patcher = mock.patch("src.edge.select.select")
+        self.select = select_patcher.start()
+        self.addCleanup(select_patcher.stop)
+
+    def _exec_command(self, channel: _Channel) -> None:
+        stdout = mock.Mock(channel=channel)
+        self.ssh_client.exec_command.return_value = (mock.Mock(), stdout, mock.Mock())
+
+    def test_send_command_streams_output(self):
+        channel = _Channel(stdout_chunks=[b"upload", b"ing\r\n50%\n", b"100%"], stderr_chunks=[b"warning\n"])
+        # the command completes after the first wait
+        self.select.side_effect = lambda *args: setattr(channel, "exit_status", 3)
+        self._exec_command(channel)
+        lines = []
+
+        result = self.edge_connection.send_command(
+            "edgecli", output_callback=lambda stream, line: lines.append((stream, line))
+        )
+
+        self.assertEqual(lines, [("stdout", "uploading"), ("stdout", "50%"), ("stderr", "warning"), ("stdout", "100%")])
+        self.assertEqual(
+            result, CommandResult(command="edgecli", exit_status=3, stdout="uploading\n50%\n100%", stderr="warning")
+        )
+        self.select.assert_called_once()
+
+    def test_send_command_timeout(self):
+        channel = _Channel(stdout_chunks=[], stderr_chunks=[])
+        self._exec_command(channel)
+        with mock.patch("src.edge.time.monotonic", side_effect=[0.0, 1.0, 6.0]):
+            with self.assertRaises(EdgeCommandTimeoutError):
+                self.edge_connection.send_command("sleep 60", timeout=5)
+        self.assertTrue(channel.closed)
+        self.assertEqual(self.select.call_args.args[3], 1.0)
+
+
+class EdgeConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.hosts = [
+            EdgeHost(address="edge-1", username="user", certificate_path="/cert"),
+            EdgeHost(address="edge-2", username="user", certificate_path="/cert"),
+        ]
+        self.connections = {}
+
+        def edge_connection(address: str, **kwargs: Any) -> mock.Mock:
+            connection = mock.Mock(address=address)
+            connection.sync_folder.return_value = UploadReport(files_uploaded=1)
+            connection.upload_edge_shared_folder.return_value = _result(0)
+            self.connections[address] = connection
+            return connection
+
+        connection_patcher = mock.patch("src.edge.EdgeConnection", side_effect=edge_connection)
+        self.edge_connection = connection_patcher.start()
+        self.addCleanup(connection_patcher.stop)
+
+    def test_publish(self):
+        with EdgeConnectionPool(hosts=self.hosts) as pool:
+            results = pool.publish(source_folder="output", edge_directory="/cl3", shared_connection_folder="shared")
+            self.connections["edge-2"].upload_edge_shared_folder.return_value = _result(1)
+            second_results = pool.publish(
+                source_folder="output", edge_directory="/cl3", shared_connection_folder="shared"
+            )
+
+        self.assertEqual([result.address for result in results], ["edge-1", "edge-2"])
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(results[0].upload_report.files_uploaded, 1)
+        self.assertGreaterEqual(results[0].duration, results[0].upload_duration + results[0].command_duration)
+        self.assertEqual([result.success for result in second_results], [True, False])
+        self.assertEqual(second_results[1].error, "edgecli failed with exit status 1")
+        # the connections are reused, and closed with the pool
+        self.assertEqual(self.edge_connection.call_count, 2)
+        self.connections["edge-1"].ensure_connected.assert_called_once()
+        self.connections["edge-1"].close.assert_called_once()
+
+    def test_publish_retries_dropped_connection(self):
+        with EdgeConnectionPool(hosts=self.hosts[:1]) as pool:
+            connection = pool.connection(self.hosts[0])
+            connection.upload_bundle.side_effect = [paramiko.SSHException("connection dropped"), "sha256"]
+            results = pool.publish(
+                source_folder="output", edge_directory="/cl3", shared_connection_folder="shared", bundle=True
+            )
+
+        self.assertTrue(results[0].success)
+        self.assertEqual(connection.upload_bundle.call_count, 2)
+        self.assertEqual(connection.ensure_connected.call_count, 2)
+        connection.sync_folder.assert_not_called()
+
+    def test_publish_reports_failed_upload_channel(self):
+        source_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, source_directory)
+        (source_directory / "lineage.json").write_text("[]")
+        ssh_clients = {address: mock.Mock() for address in ("edge-1", "edge-2")}
+        ssh_clients["edge-1"].open_sftp.side_effect = lambda: _SFTPClient({})
+        # the SFTP channel of the manifest opens, the upload channel does not
+        ssh_clients["edge-2"].open_sftp.side_effect = [
+            _SFTPClient({}),
+            paramiko.SSHException("administratively prohibited"),
+        ]
+
+        def edge_connection(address: str, **kwargs: Any) -> EdgeConnection:
+            with mock.patch.object(EdgeConnection, "connect", return_value=ssh_clients[address]):
+                return EdgeConnection(address=address, **kwargs)
+
+        self.edge_connection.side_effect = edge_connection
+        with mock.patch.object(EdgeConnection, "send_command", return_value=_result(0)):
+            with EdgeConnectionPool(hosts=self.hosts) as pool:
+                results = pool.publish(
+                    source_folder=str(source_directory), edge_directory="/cl3", shared_connection_folder="shared"
+                )
+
+        self.assertEqual([result.success for result in results], [True, False])
+        self.assertIn("Uploaded 0/1 files to edge-2:/cl3", results[1].error)
+        self.assertIsNone(results[1].command_result)
+
+    def test_connections_are_kept_per_host(self):
+        hosts = [
+            EdgeHost(address="edge-1", username="user", certificate_path="/cert"),
+            EdgeHost(address="edge-1", username="admin", certificate_path="/cert"),
+            EdgeHost(address="edge-1", username="user", certificate_path="/cert", port=2222),
+        ]
+        with EdgeConnectionPool(hosts=hosts) as pool:
+            pool.publish(source_folder="output", edge_directory="/cl3", shared_connection_folder="shared")
+            pool.publish(source_folder="output", edge_directory="/cl3", shared_connection_folder="shared")
+
+        self.assertEqual(self.edge_connection.call_count, 3)
+        self.assertEqual(
+            sorted((call.kwargs["username"], call.kwargs["port"]) for call in self.edge_connection.call_args_list),
+            [("admin", 22), ("user", 22), ("user", 2222)],
+        )
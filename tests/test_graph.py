@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+from src.graph import LineageDigestSet, LineageGraph
+from src.models import Asset, AssetProperties, LeafAsset, Lineage, ParentAsset, SourceCode
+
+
+class LineageGraphTest(unittest.TestCase):
+    def setUp(self):
+        nodes = [Asset(name="SYS1", type="System"), Asset(name="DB1", type="Database")]
+        self.table_1 = ParentAsset(nodes=nodes, parent=Asset(name="T1", type="Table"))
+        self.table_2 = ParentAsset(nodes=nodes, parent=Asset(name="T2", type="Table"))
+        self.column_1 = LeafAsset(
+            nodes=nodes, parent=Asset(name="T1", type="Table"), leaf=Asset(name="C1", type="Column")
+        )
+        self.column_2 = LeafAsset(
+            nodes=nodes, parent=Asset(name="T2", type="Table"), leaf=Asset(name="C1", type="Column")
+        )
+
+    def _lineages(self):
+        return [
+            Lineage(src=self.column_1, trg=self.column_2),
+            Lineage(src=self.table_1, trg=self.table_2),
+            # equal but distinct objects
+            Lineage(src=self.column_1.model_copy(deep=True), trg=self.column_2.model_copy(deep=True)),
+            Lineage(src=self.table_1, trg=self.table_2, source_code=SourceCode(path="source_codes/1.txt")),
+            Lineage(src=self.table_1, trg=self.table_2, source_code=SourceCode(path="source_codes/1.txt")),
+            # different props make a different asset
+            Lineage(
+                src=self.column_1.model_copy(update={"props": AssetProperties(fullname="f", domain_id="d")}),
+                trg=self.column_2,
+            ),
+        ]
+
+    def test_duplicates_are_dropped(self):
+        lineage_graph = LineageGraph()
+        lineages = self._lineages()
+        self.assertEqual(lineage_graph.add_lineages(lineages), 4)
+        self.assertEqual(lineage_graph.duplicates, 2)
+        self.assertEqual(len(lineage_graph), 4)
+        self.assertEqual(
+            [lineage.model_dump(exclude_none=True) for lineage in lineage_graph.lineages()],
+            [lineage.model_dump(exclude_none=True) for lineage in (lineages[0], lineages[1], lineages[3], lineages[5])],
+        )
+
+    def test_edge_slots_grow(self):
+        lineage_graph = LineageGraph()
+        tables = [ParentAsset(nodes=self.table_1.nodes, parent=Asset(name=f"T{i}", type="Table")) for i in range(100)]
+        lineages = [Lineage(src=src, trg=trg) for src in tables for trg in tables[:30]]
+        self.assertEqual(lineage_graph.add_lineages(lineages), 3000)
+        self.assertEqual(lineage_graph.add_lineages(lineages[::7]), 0)
+        self.assertEqual(lineage_graph.duplicates, len(lineages[::7]))
+        self.assertGreaterEqual(len(lineage_graph._edge_slots), 2 * len(lineage_graph))
+
+    def test_digest_set(self):
+        lineages = self._lineages()
+        for max_in_memory in (100, 1):
+            with tempfile.TemporaryDirectory() as spill_directory:
+                with LineageDigestSet(max_in_memory=max_in_memory, spill_directory=spill_directory) as lineage_digests:
+                    self.assertEqual([lineage_digests.add(lineage) for lineage in lineages], [1, 1, 0, 1, 0, 1])
+                    self.assertEqual(lineage_digests.duplicates, 2)
+                    self.assertEqual(len(lineage_digests), 4)
+                    self.assertEqual(lineage_digests.spilled, max_in_memory == 1)
+                    self.assertEqual(len(os.listdir(spill_directory)), int(max_in_memory == 1))
+                # the temporary database is removed
+                self.assertEqual(os.listdir(spill_directory), [])
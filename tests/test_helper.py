@@ -1,9 +1,196 @@
+import json
+import shutil
 import unittest
+from pathlib import Path
+from unittest import mock
 
-from src.helper import get_asset_types_name_from_lineage_json_file
+from pydantic.json import pydantic_encoder
+
+from src.helper import (
+    AssetTypeResolver,
+    LineageWriter,
+    generate_json_files,
+    generate_source_code,
+    get_asset_types_name_from_lineage_json_file,
+)
+from src.models import Asset, AssetType, CustomLineageConfig, LeafAsset, Lineage, ParentAsset
 
 
 class HelperTest(unittest.TestCase):
+    def setUp(self):
+        self.output_directory = Path("./test_data/helper")
+        self.custom_lineage_config = CustomLineageConfig(
+            application_name="unit tests helper",
+            output_directory=str(self.output_directory),
+        )
+        nodes = [Asset(name="SYS1", type="System"), Asset(name="DB1", type="Database")]
+        self.asset_types = [AssetType(name="System", uuid="00000000-0000-0000-0000-000000031302")]
+        self.assets = [ParentAsset(nodes=nodes, parent=Asset(name="T1", type="Table"))]
+        self.lineages = [
+            Lineage(
+                src=LeafAsset(nodes=nodes, parent=Asset(name="T1", type="Table"), leaf=Asset(name="C1", type="Column")),
+                trg=LeafAsset(nodes=nodes, parent=Asset(name="T2", type="Table"), leaf=Asset(name="C1", type="Column")),
+            ),
+            Lineage(
+                src=ParentAsset(nodes=nodes, parent=Asset(name="T1", type="Table")),
+                trg=ParentAsset(nodes=nodes, parent=Asset(name="T2", type="Table")),
+            ),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.output_directory, ignore_errors=True)
+
     def test_get_asset_types_name_from_lineage_json_file(self):
         result = get_asset_types_name_from_lineage_json_file("test_data/conversion/lineage_v3.json")
         assert result == {"System", "Schema", "Database", "Table", "Column"}
+
+    def test_generate_json_files_matches_json_dump(self):
+        generate_json_files(
+            lineages=iter(self.lineages),
+            asset_types=self.asset_types,
+            custom_lineage_config=self.custom_lineage_config,
+            assets=self.assets,
+        )
+
+        expected_lineage = json.dumps(
+            [lineage.model_dump(exclude_none=True) for lineage in self.lineages], default=pydantic_encoder
+        )
+        expected_assets = json.dumps(self.assets, default=pydantic_encoder)
+        self.assertEqual((self.output_directory / "lineage.json").read_text(), expected_lineage)
+        self.assertEqual((self.output_directory / "assets.json").read_text(), expected_assets)
+        with open(self.output_directory / "metadata.json") as input_file:
+            metadata = json.load(input_file)
+        self.assertEqual(metadata["asset_types"], {"System": {"uuid": "00000000-0000-0000-0000-000000031302"}})
+
+    def test_lineage_writer(self):
+        with LineageWriter(custom_lineage_config=self.custom_lineage_config) as writer:
+            self.assertFalse((self.output_directory / "metadata.json").exists())
+            writer.add_lineages(self.lineages)
+            writer.asset_types = self.asset_types
+
+        self.assertEqual(writer.lineage_count, 2)
+        self.assertFalse((self.output_directory / "assets.json").exists())
+        with open(self.output_directory / "lineage.json") as input_file:
+            self.assertEqual(len(json.load(input_file)), 2)
+        self.assertTrue((self.output_directory / "metadata.json").exists())
+
+        with self.assertRaises(ValueError):
+            writer.add_lineage(self.lineages[0])
+
+        # empty output
+        with LineageWriter(custom_lineage_config=self.custom_lineage_config):
+            pass
+        self.assertEqual((self.output_directory / "lineage.json").read_text(), "[]")
+
+    def test_lineage_writer_skips_metadata_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with LineageWriter(custom_lineage_config=self.custom_lineage_config) as writer:
+                writer.add_lineage(self.lineages[0])
+                raise RuntimeError("failure while producing lineages")
+
+        self.assertFalse((self.output_directory / "metadata.json").exists())
+        with open(self.output_directory / "lineage.json") as input_file:
+            self.assertEqual(len(json.load(input_file)), 1)
+
+    def test_generate_source_code_deduplicated(self):
+        custom_lineage_config = CustomLineageConfig(
+            application_name="unit tests helper",
+            output_directory=str(self.output_directory),
+            deduplicate_source_code=True,
+        )
+        source_code_directory = custom_lineage_config.source_code_directory_path
+
+        first = generate_source_code(source_code_text="select 1", custom_lineage_config=custom_lineage_config)
+        second = generate_source_code(
+            source_code_text="select 1", custom_lineage_config=custom_lineage_config, transformation_display_name="t"
+        )
+        other = generate_source_code(source_code_text="select 2", custom_lineage_config=custom_lineage_config)
+        self.assertEqual(first.path, second.path)
+        self.assertNotEqual(first.path, other.path)
+        self.assertEqual(second.transformation_display_name, "t")
+        self.assertEqual((self.output_directory / first.path).read_text(), "select 1")
+
+        # referenced files are copied once and share the name of identical inline source code
+        source_file = self.output_directory / "input.sql"
+        source_file.write_text("select 1")
+        from_file = generate_source_code(source_code_text=str(source_file), custom_lineage_config=custom_lineage_config)
+        self.assertRegex(from_file.path, r"source_codes/[0-9a-f]{64}\.sql")
+        generate_source_code(source_code_text=str(source_file), custom_lineage_config=custom_lineage_config)
+        self.assertEqual(len(list(source_code_directory.iterdir())), 3)
+
+        # a new configuration on the same directory reuses the existing files
+        custom_lineage_config = CustomLineageConfig(
+            application_name="unit tests helper",
+            output_directory=str(self.output_directory),
+            deduplicate_source_code=True,
+        )
+        again = generate_source_code(source_code_text="select 1", custom_lineage_config=custom_lineage_config)
+        self.assertEqual(again.path, first.path)
+        self.assertEqual(len(list(source_code_directory.iterdir())), 3)
+
+    def test_asset_type_resolver(self):
+        catalogue = [
+            AssetType(name="Table", uuid="00000000-0000-0000-0000-000000031007"),
+            AssetType(name="Column", uuid="00000000-0000-0000-0000-000000031008"),
+        ]
+        resolver = AssetTypeResolver(collibra_instance="instance", username="user", password="password")
+        with mock.patch("src.helper.collect_assets_typeid", return_value=catalogue) as collect:
+            self.assertEqual(resolver.resolve("Table"), [catalogue[0]])
+            self.assertEqual(resolver.resolve("column"), [catalogue[1]])
+            self.assertEqual(resolver.resolve("View"), [])
+            self.assertEqual(resolver.asset_types, catalogue)
+        collect.assert_called_once()
+
+    def test_lineage_writer_sharded(self):
+        lineages = []
+        for number in range(5):
+            source_code = generate_source_code(
+                source_code_text=f"select {number % 2}", custom_lineage_config=self.custom_lineage_config
+            )
+            lineages.append(self.lineages[number % 2].model_copy(update={"source_code": source_code}))
+
+        generate_json_files(
+            lineages=lineages,
+            asset_types=self.asset_types,
+            custom_lineage_config=self.custom_lineage_config,
+            assets=self.assets,
+            max_lineages_per_file=2,
+        )
+
+        with open(self.output_directory / "manifest.json") as input_file:
+            manifest = json.load(input_file)
+        self.assertEqual(manifest["lineages"], 5)
+        self.assertEqual(
+            [shard["directory"] for shard in manifest["shards"]], ["lineage_00001", "lineage_00002", "lineage_00003"]
+        )
+        self.assertEqual([shard["lineages"] for shard in manifest["shards"]], [2, 2, 1])
+        self.assertFalse((self.output_directory / "lineage.json").exists())
+        self.assertFalse((self.output_directory / "assets.json").exists())
+        self.assertEqual(
+            sorted(path.name for path in self.output_directory.iterdir()),
+            ["lineage_00001", "lineage_00002", "lineage_00003", "manifest.json"],
+        )
+
+        written = []
+        for shard in manifest["shards"]:
+            shard_directory = self.output_directory / shard["directory"]
+            self.assertEqual((shard_directory / "lineage.json").stat().st_size, shard["bytes"])
+            self.assertTrue((shard_directory / "metadata.json").exists())
+            self.assertTrue((shard_directory / "assets.json").exists())
+            with open(shard_directory / "lineage.json") as input_file:
+                for lineage in json.load(input_file):
+                    # every shard contains the source code files it refers to
+                    self.assertTrue((shard_directory / lineage["source_code"]["path"]).is_file())
+                    written.append(lineage)
+        self.assertEqual(written, [lineage.model_dump(exclude_none=True) for lineage in lineages])
+
+    def test_lineage_writer_sharded_by_size(self):
+        lineage_size = len(json.dumps(self.lineages[0].model_dump(exclude_none=True)))
+        with LineageWriter(
+            custom_lineage_config=self.custom_lineage_config, max_bytes_per_file=2 * lineage_size + 4
+        ) as writer:
+            writer.add_lineages([self.lineages[0]] * 5)
+
+        self.assertEqual([shard["lineages"] for shard in writer.shards], [2, 2, 1])
+        for shard in writer.shards:
+            self.assertLessEqual(shard["bytes"], 2 * lineage_size + 4)
@@ -1,11 +1,19 @@
+import csv
+import io
 import json
 import shutil
+import tempfile
 import unittest
 from pathlib import Path
+from typing import List, Union
+from unittest import mock
 
+from benchmarks.generate import DatasetSpec, generate_csv
 from src.exceptions import InvalidCSVException
 from src.models import (
     Asset,
+    AssetCache,
+    AssetPool,
     AssetProperties,
     CustomLineageConfig,
     LeafAsset,
@@ -13,7 +21,14 @@ from src.models import (
     SourceCode,
     SourceCodeHighLight,
 )
-from tools.ingest_csv import _create_asset, _create_source_code, _validate_header, ingest_csv_files
+from tools.ingest_csv import (
+    _create_asset,
+    _create_lineages_columnar,
+    _create_source_code,
+    _split_csv_file,
+    _validate_header,
+    ingest_csv_files,
+)
 
 
 class TestIngestCSV(unittest.TestCase):
@@ -298,6 +313,79 @@ class TestIngestCSV(unittest.TestCase):
                 line=2,
             )
 
+    def test_create_asset_with_asset_pool(self):
+        dummy_row = ["DB1", "SCH1", "T1", "COL1", "", "", "DB1", "SCH1", "T1", "COL2", "", "", "", "", ""]
+        asset_types = ["Database", "Schema", "Table", "Column"]
+        asset_pool = AssetPool()
+        assets = [
+            _create_asset(
+                asset_types=asset_types,
+                asset_names=asset_names,
+                domain_id="domain",
+                fullname="fullname",
+                csv_file=self.filename,
+                row=dummy_row,
+                line=2,
+                asset_pool=asset_pool,
+            )
+            for asset_names in (["DB1", "SCH1", "T1", "COL1"], ["DB1", "SCH1", "T1", "COL2"], ["DB1", "SCH1", "T1", ""])
+        ]
+
+        self.assertIs(assets[0].nodes, assets[1].nodes)
+        self.assertIs(assets[0].nodes, assets[2].nodes)
+        self.assertIs(assets[0].parent, assets[2].parent)
+        self.assertIs(assets[0].props, assets[1].props)
+        self.assertIsNot(assets[0].leaf, assets[1].leaf)
+        self.assertIsInstance(assets[2], ParentAsset)
+        self.assertEqual(
+            assets[1],
+            LeafAsset(
+                nodes=[Asset(name="DB1", type="Database"), Asset(name="SCH1", type="Schema")],
+                parent=Asset(name="T1", type="Table"),
+                leaf=Asset(name="COL2", type="Column"),
+                props=AssetProperties(fullname="fullname", domain_id="domain"),
+            ),
+        )
+        # DB1, SCH1, T1, COL1, COL2
+        self.assertEqual(len(asset_pool), 5)
+
+    def test_create_asset_with_asset_cache(self):
+        dummy_row = ["DB1", "SCH1", "T1", "COL1", "", "", "DB1", "SCH1", "T1", "COL2", "", "", "", "", ""]
+        asset_types = ["Database", "Schema", "Table", "Column"]
+        asset_cache = AssetCache(maxsize=2)
+
+        def create_asset(asset_names: List[str], fullname: str = "") -> Union[ParentAsset, LeafAsset]:
+            return _create_asset(
+                asset_types=asset_types,
+                asset_names=asset_names,
+                domain_id="domain" if fullname else "",
+                fullname=fullname,
+                csv_file=self.filename,
+                row=dummy_row,
+                line=2,
+                asset_cache=asset_cache,
+            )
+
+        column_1 = create_asset(["DB1", "SCH1", "T1", "COL1"])
+        self.assertIs(create_asset(["DB1", "SCH1", "T1", "COL1"]), column_1)
+        self.assertIsNot(create_asset(["DB1", "SCH1", "T1", "COL1"], fullname="fullname"), column_1)
+        self.assertEqual((asset_cache.hits, asset_cache.misses), (1, 2))
+
+        # COL1 is the most recently used asset, the one with props is evicted
+        self.assertIs(create_asset(["DB1", "SCH1", "T1", "COL1"]), column_1)
+        create_asset(["DB1", "SCH1", "T1", "COL2"])
+        self.assertEqual(len(asset_cache), 2)
+        self.assertIs(create_asset(["DB1", "SCH1", "T1", "COL1"]), column_1)
+        create_asset(["DB1", "SCH1", "T1", "COL1"], fullname="fullname")
+        self.assertEqual((asset_cache.hits, asset_cache.misses), (3, 4))
+        self.assertAlmostEqual(asset_cache.hit_rate, 3 / 7)
+
+        # invalid assets are not cached
+        for _ in range(2):
+            with self.assertRaises(InvalidCSVException):
+                create_asset(["", "", "T1", "COL1"])
+        self.assertEqual(asset_cache.misses, 6)
+
     def test_ingest_csv_files(self):
         ingest_csv_files(
             source_directory="./test_data/csv",
@@ -328,6 +416,267 @@ class TestIngestCSV(unittest.TestCase):
             ignore_errors=True,
         )
 
+    def test_ingest_csv_files_trusted(self):
+        outputs = []
+        for trusted in (False, True):
+            custom_lineage_config = CustomLineageConfig(
+                application_name="unit tests csv",
+                output_directory="./test_data/csv/ingested/",
+                deduplicate_source_code=True,
+            )
+            ingest_csv_files(
+                source_directory="./test_data/csv", custom_lineage_config=custom_lineage_config, trusted=trusted
+            )
+            outputs.append(Path("./test_data/csv/ingested/lineage.json").read_bytes())
+        self.assertEqual(outputs[0], outputs[1])
+
+        # cleanup
+        shutil.rmtree(
+            "./test_data/csv/ingested",
+            ignore_errors=True,
+        )
+
+    def test_ingest_csv_files_with_workers(self):
+        ingest_csv_files(source_directory="./test_data/csv", custom_lineage_config=self.custom_lineage_config)
+        with open("./test_data/csv/ingested/lineage.json") as input_file:
+            sequential_lineage = json.load(input_file)
+
+        ingest_csv_files(
+            source_directory="./test_data/csv", custom_lineage_config=self.custom_lineage_config, workers=2
+        )
+        with open("./test_data/csv/ingested/lineage.json") as input_file:
+            parallel_lineage = json.load(input_file)
+
+        for lineage in sequential_lineage + parallel_lineage:
+            if lineage.get("source_code"):
+                lineage["source_code"]["path"] = "source_codes/uuid.txt"
+        self.assertEqual(sequential_lineage, parallel_lineage)
+
+        # cleanup
+        shutil.rmtree(
+            "./test_data/csv/ingested",
+            ignore_errors=True,
+        )
+
+    def test_ingest_csv_files_streaming(self):
+        source_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, source_directory)
+        self.addCleanup(shutil.rmtree, "./test_data/csv/ingested", ignore_errors=True)
+        # few tables and columns, so there are duplicates within and across files and batches
+        generate_csv(
+            str(source_directory),
+            DatasetSpec(systems=2, tables=3, columns=2, edges=200, source_code_reuse=0.9, files=3),
+        )
+
+        outputs = []
+        for options in ({}, {"streaming": True, "batch_size": 7}, {"streaming": True, "max_digests_in_memory": 5}):
+            custom_lineage_config = CustomLineageConfig(
+                application_name="unit tests csv",
+                output_directory="./test_data/csv/ingested/",
+                deduplicate_source_code=True,
+            )
+            ingest_csv_files(
+                source_directory=str(source_directory), custom_lineage_config=custom_lineage_config, **options
+            )
+            outputs.append(
+                [
+                    Path(f"./test_data/csv/ingested/{file_name}").read_bytes()
+                    for file_name in ("lineage.json", "metadata.json")
+                ]
+            )
+            shutil.rmtree("./test_data/csv/ingested")
+        self.assertLess(len(json.loads(outputs[0][0])), 200)
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[0], outputs[2])
+
+    def test_ingest_csv_files_with_workers_reports_file_and_line(self):
+        source_directory = Path("./test_data/csv_invalid")
+        source_directory.mkdir(exist_ok=True)
+        shutil.copy("./test_data/csv/db1.csv", source_directory / "a.csv")
+        with open("./test_data/csv/db1.csv") as input_file:
+            content = input_file.read()
+        with open(source_directory / "b.csv", "w") as output_file:
+            output_file.write(
+                content.rstrip("\n") + "\nsnowflake,KRISTOF,PUBLIC,,,,,snowflake,KRISTOF,PUBLIC,V2,,,,,,\n"
+            )
+
+        try:
+            with self.assertRaisesRegex(InvalidCSVException, r"b\.csv.*\(line 4\)"):
+                ingest_csv_files(
+                    source_directory=str(source_directory), custom_lineage_config=self.custom_lineage_config, workers=2
+                )
+        finally:
+            shutil.rmtree(source_directory, ignore_errors=True)
+            shutil.rmtree("./test_data/csv/ingested", ignore_errors=True)
+
+    def test_ingest_csv_files_columnar(self):
+        source_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, source_directory)
+        self.addCleanup(shutil.rmtree, "./test_data/csv/ingested", ignore_errors=True)
+        generate_csv(
+            str(source_directory),
+            DatasetSpec(systems=2, tables=3, columns=2, edges=200, source_code_reuse=0.9, files=2),
+        )
+        shutil.copy("./test_data/csv/db1.csv", source_directory / "db1.csv")
+
+        with mock.patch("tools.ingest_csv.COLUMNAR_CHUNK_SIZE", 7):
+            for trusted, deduplicate_source_code in ((False, True), (True, True), (False, False)):
+                outputs = []
+                for engine in ("row", "columnar"):
+                    custom_lineage_config = CustomLineageConfig(
+                        application_name="unit tests csv",
+                        output_directory="./test_data/csv/ingested/",
+                        deduplicate_source_code=deduplicate_source_code,
+                    )
+                    ingest_csv_files(
+                        source_directory=str(source_directory),
+                        custom_lineage_config=custom_lineage_config,
+                        trusted=trusted,
+                        engine=engine,
+                    )
+                    with open("./test_data/csv/ingested/lineage.json") as input_file:
+                        outputs.append(json.load(input_file))
+                    shutil.rmtree("./test_data/csv/ingested")
+                if not deduplicate_source_code:
+                    # random uuid in source code
+                    for lineage in outputs[0] + outputs[1]:
+                        if lineage.get("source_code"):
+                            lineage["source_code"]["path"] = "source_codes/uuid.txt"
+                self.assertEqual(outputs[0], outputs[1])
+
+    def test_ingest_csv_files_columnar_streaming_uses_batch_size(self):
+        source_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, source_directory)
+        self.addCleanup(shutil.rmtree, "./test_data/csv/ingested", ignore_errors=True)
+        generate_csv(str(source_directory), DatasetSpec(systems=2, tables=3, columns=2, edges=100, files=1))
+
+        outputs = []
+        for options in ({}, {"streaming": True, "batch_size": 7}):
+            custom_lineage_config = CustomLineageConfig(
+                application_name="unit tests csv",
+                output_directory="./test_data/csv/ingested/",
+                deduplicate_source_code=True,
+            )
+            with mock.patch(
+                "tools.ingest_csv._create_lineages_columnar", side_effect=_create_lineages_columnar
+            ) as create_lineages:
+                ingest_csv_files(
+                    source_directory=str(source_directory),
+                    custom_lineage_config=custom_lineage_config,
+                    engine="columnar",
+                    **options,
+                )
+            outputs.append(Path("./test_data/csv/ingested/lineage.json").read_bytes())
+            shutil.rmtree("./test_data/csv/ingested")
+        # the chunks of the streaming conversion are no larger than the batches
+        self.assertEqual(max(len(call.args[0]) for call in create_lineages.call_args_list), 7)
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_ingest_csv_files_columnar_errors(self):
+        source_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, source_directory)
+        self.addCleanup(shutil.rmtree, "./test_data/csv/ingested", ignore_errors=True)
+        with open("./test_data/csv/db1.csv") as input_file:
+            content = input_file.read().rstrip("\n")
+        valid_row = content.split("\n")[1]
+        invalid_rows = [
+            "snowflake,KRISTOF,PUBLIC,V2,,,,snowflake,KRISTOF,PUBLIC,V3",
+            "snowflake,KRISTOF,PUBLIC,,,,,snowflake,KRISTOF,PUBLIC,V2,,,,,,",
+            ",,,V1,,,,snowflake,KRISTOF,PUBLIC,V2,,,,,,",
+            "snowflake,KRISTOF,PUBLIC,V1,,,,snowflake,KRISTOF,PUBLIC,V2,,,,select 1,[0:x],",
+        ]
+        with mock.patch("tools.ingest_csv.COLUMNAR_CHUNK_SIZE", 3):
+            for invalid_row in invalid_rows:
+                with open(source_directory / "a.csv", "w") as output_file:
+                    output_file.write("\n".join([content] + [valid_row] * 3 + [invalid_row, valid_row]) + "\n")
+                errors = []
+                for engine in ("row", "columnar"):
+                    with self.assertRaisesRegex(InvalidCSVException, r"line 7") as context:
+                        ingest_csv_files(
+                            source_directory=str(source_directory),
+                            custom_lineage_config=self.custom_lineage_config,
+                            engine=engine,
+                        )
+                    errors.append(str(context.exception))
+                self.assertEqual(errors[0], errors[1])
+
+    def test_split_csv_file(self):
+        source_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, source_directory)
+        csv_path = source_directory / "a.csv"
+        rows = [["System", "Table", "Column", "fullname", "domain_id", "source_code"]] + [
+            ["snowflake", f"T{index}", "C", "", "", f'select "C"\r\nfrom T{index}, ""\n' * (index % 3)]
+            for index in range(30)
+        ]
+        with open(csv_path, "w", newline="", encoding="utf-8-sig") as csv_file:
+            csv.writer(csv_file).writerows(rows)
+
+        for split_size in (1, 7, 50, 10**6):
+            headers, ranges = _split_csv_file(csv_path, split_size)
+            self.assertEqual(headers, rows[0])
+            self.assertEqual([start for start, _ in ranges[1:]], [end for _, end in ranges[:-1]])
+            self.assertEqual(ranges[-1][1], csv_path.stat().st_size)
+            data = csv_path.read_bytes()
+            range_rows = [
+                row for start, end in ranges for row in csv.reader(io.StringIO(data[start:end].decode("utf-8")))
+            ]
+            self.assertEqual(range_rows, rows[1:])
+        self.assertEqual(len(_split_csv_file(csv_path, 1)[1]), 30)
+
+    def test_ingest_csv_files_split(self):
+        source_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, source_directory)
+        self.addCleanup(shutil.rmtree, "./test_data/csv/ingested", ignore_errors=True)
+        generate_csv(
+            str(source_directory),
+            DatasetSpec(systems=2, tables=3, columns=2, edges=200, source_code_reuse=0.9, files=2),
+        )
+
+        outputs = []
+        for options in (
+            {},
+            {"workers": 2, "split_size": 1000},
+            {"workers": 3, "split_size": 3000, "engine": "columnar"},
+        ):
+            custom_lineage_config = CustomLineageConfig(
+                application_name="unit tests csv",
+                output_directory="./test_data/csv/ingested/",
+                deduplicate_source_code=True,
+            )
+            ingest_csv_files(
+                source_directory=str(source_directory), custom_lineage_config=custom_lineage_config, **options
+            )
+            outputs.append(Path("./test_data/csv/ingested/lineage.json").read_bytes())
+            shutil.rmtree("./test_data/csv/ingested")
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[0], outputs[2])
+
+    def test_ingest_csv_files_split_reports_line(self):
+        source_directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, source_directory)
+        self.addCleanup(shutil.rmtree, "./test_data/csv/ingested", ignore_errors=True)
+        (csv_path,) = generate_csv(str(source_directory), DatasetSpec(tables=3, columns=2, edges=100))
+        with open(csv_path, "a", newline="") as csv_file:
+            csv.writer(csv_file).writerow(["system_0", "DB_0", "PUBLIC", "", "", "", ""] * 2 + ["", "", ""])
+
+        errors = []
+        source_code_files = []
+        for options in ({}, {"workers": 2, "split_size": 3000}):
+            custom_lineage_config = CustomLineageConfig(
+                application_name="unit tests csv", output_directory="./test_data/csv/ingested/"
+            )
+            with self.assertRaisesRegex(InvalidCSVException, r"line 102") as context:
+                ingest_csv_files(
+                    source_directory=str(source_directory), custom_lineage_config=custom_lineage_config, **options
+                )
+            errors.append(str(context.exception))
+            self.assertEqual(context.exception.line, 102)
+            source_code_files.append(len(list(Path("./test_data/csv/ingested/source_codes").iterdir())))
+            shutil.rmtree("./test_data/csv/ingested")
+        self.assertEqual(errors[0], errors[1])
+        # the failing range is not converted a second time
+        self.assertEqual(source_code_files[0], source_code_files[1])
+
 
 if __name__ == "__main__":
     unittest.main()
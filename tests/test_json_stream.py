@@ -0,0 +1,80 @@
+import io
+import json
+import unittest
+from unittest import mock
+
+from src.json_stream import JSONStreamReader
+
+
+class JSONStreamReaderTest(unittest.TestCase):
+    document = {
+        "version": "1.0",
+        "tree": [{"name": "snowflake", "children": []}, {"name": "oracle", "leaves": [{"name": "é"}]}],
+        "lineages": [{"src_path": [{"system": "snowflake"}], "count": 12345}, 123456789, -1.5e3, None, True],
+        "empty": [],
+        "codebase_files": {"a.sql": {"mapping_refs": {"m": {"pos_start": 0, "pos_len": 10}}}},
+        "empty_object": {},
+    }
+
+    def test_stream(self):
+        # a tiny chunk size splits keys, strings and numbers over several reads
+        for chunk_size in (1, 3, 7, 1024):
+            for indent in (None, 4):
+                reader = JSONStreamReader(io.StringIO(json.dumps(self.document, indent=indent)), chunk_size=chunk_size)
+                streamed = {}
+                for key in reader.members():
+                    if key in ("tree", "lineages", "empty"):
+                        streamed[key] = list(reader.items())
+                    else:
+                        streamed[key] = reader.value()
+                self.assertEqual(streamed, self.document)
+
+    def test_skip(self):
+        reader = JSONStreamReader(io.StringIO(json.dumps(self.document)), chunk_size=5)
+        keys = []
+        for key in reader.members():
+            keys.append(key)
+            if key == "codebase_files":
+                self.assertEqual(reader.value(), self.document["codebase_files"])
+            else:
+                reader.skip()
+        self.assertEqual(keys, list(self.document))
+
+    def test_skip_does_not_decode(self):
+        document = {"lineages": [{"sql": "select \"[{\" from t where c = '\\\\' -- }]"}, [[], {}]], "version": "2.0"}
+        for chunk_size in (1, 2, 5, 1024):
+            reader = JSONStreamReader(io.StringIO(json.dumps(document)), chunk_size=chunk_size)
+            with mock.patch.object(reader, "value", wraps=reader.value) as value:
+                for key in reader.members():
+                    if key == "version":
+                        self.assertEqual(reader.value(), "2.0")
+                    else:
+                        reader.skip()
+            # the keys and the version only, quotes and brackets within the strings are not structural
+            self.assertEqual(value.call_count, 3)
+
+        reader = JSONStreamReader(io.StringIO('{"lineages": [{"sql": "]"}'), chunk_size=4)
+        with self.assertRaises(json.JSONDecodeError):
+            for key in reader.members():
+                reader.skip()
+
+    def test_elements(self):
+        reader = JSONStreamReader(io.StringIO(json.dumps(self.document)), chunk_size=3)
+        for key in reader.members():
+            if key == "tree":
+                names = []
+                for index in reader.elements():
+                    for member in reader.members():
+                        if member == "name":
+                            names.append((index, reader.value()))
+                        else:
+                            reader.skip()
+                self.assertEqual(names, [(0, "snowflake"), (1, "oracle")])
+            else:
+                reader.skip()
+
+    def test_invalid_document(self):
+        reader = JSONStreamReader(io.StringIO('{"lineages": [1, 2'), chunk_size=4)
+        with self.assertRaises(json.JSONDecodeError):
+            for key in reader.members():
+                list(reader.items())
@@ -0,0 +1,88 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.generate import DatasetSpec, generate_csv, generate_v1
+from src import profiling
+from src.models import CustomLineageConfig
+from tools.ingest_csv import ingest_csv_files
+from tools.translate_to_batch_format import convert
+
+
+def _add(a: int, b: int) -> int:
+    return a + b
+
+
+class ProfilingTest(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(profiling.disable)
+
+    def test_disabled(self):
+        self.assertIsNone(profiling.get_profiler())
+        self.assertIs(profiling.timed("add", _add), _add)
+        with profiling.stage("stage"):
+            profiling.count("counter")
+            profiling.snapshot_memory("stage")
+        self.assertIsNone(profiling.disable())
+
+    def test_enabled(self):
+        profiler = profiling.enable(trace_memory=True)
+        self.assertIs(profiling.get_profiler(), profiler)
+        add = profiling.timed("add", _add)
+        self.assertEqual(add(1, 2), 3)
+        self.assertEqual(add(3, 4), 7)
+        with self.assertRaises(ValueError):
+            with profiling.stage("failing"):
+                raise ValueError()
+        profiling.count("rows")
+        profiling.count("rows", 10)
+        profiling.snapshot_memory("after rows")
+
+        report = profiler.report()
+        self.assertEqual(report["stages"]["add"]["calls"], 2)
+        self.assertEqual(report["stages"]["failing"]["calls"], 1)
+        self.assertEqual(report["counters"], {"rows": 11})
+        self.assertEqual(report["memory_snapshots"][0]["label"], "after rows")
+        self.assertIn("traced_peak_bytes", report["memory_snapshots"][0])
+        self.assertIn("traced_memory", report)
+        self.assertIn("rows", profiler.summary())
+
+        self.assertIs(profiling.disable(), profiler)
+        self.assertIsNone(profiling.get_profiler())
+
+    def test_instrumented_tools(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        spec = DatasetSpec(systems=2, tables=10, columns=3, edges=50, files=2)
+
+        generate_csv(str(directory / "csv"), spec)
+        profiler = profiling.enable()
+        ingest_csv_files(
+            source_directory=str(directory / "csv"),
+            custom_lineage_config=CustomLineageConfig(
+                application_name="profiling", output_directory=str(directory / "csv_output")
+            ),
+        )
+        profiler.write_report(str(directory / "csv_report.json"))
+        with open(directory / "csv_report.json") as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report["counters"]["csv.files"], 2)
+        self.assertEqual(report["counters"]["csv.rows"], 50)
+        self.assertEqual(report["counters"]["json.lineages"] + report["counters"]["lineage.duplicates"], 50)
+        self.assertGreater(report["counters"]["json.bytes_written"], 0)
+        for stage in ("csv.parse", "csv.create_asset", "lineage.deduplicate", "json.write"):
+            self.assertIn(stage, report["stages"])
+
+        generate_v1(str(directory / "v1"), spec)
+        profiler = profiling.enable()
+        convert(
+            input_directory=str(directory / "v1"),
+            output_directory=str(directory / "v1_output"),
+            migrate_source_code=True,
+        )
+        report = profiler.report()
+        self.assertEqual(report["counters"]["v1.lineages"], 50)
+        for stage in ("v1.read", "v1.convert_node", "v1.convert_lineages", "json.write"):
+            self.assertIn(stage, report["stages"])
@@ -1,7 +1,23 @@
+import io
 import json
 import shutil
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+from unittest import mock
 
-from tools.translate_to_batch_format import convert
+from src.json_stream import JSONStreamReader
+from src.models import AssetCache, CustomLineageConfig, validate_lineages
+from tools.translate_to_batch_format import (
+    SourceFileCache,
+    _convert_lineage_node,
+    _convert_lineages_chunk,
+    _init_conversion_worker,
+    _read_codebase_files,
+    convert,
+    convert_tree,
+    iter_leaf_assets_streaming,
+)
 
 
 def test_translate_with_simple_and_advanced_source_code() -> None:
@@ -61,3 +77,237 @@ def test_translat_without_source_code() -> None:
 
     # cleanup
     shutil.rmtree("./test_data/conversion/v3", ignore_errors=True)
+
+
+def test_translate_trusted_is_identical() -> None:
+    for trusted in (False, True):
+        convert(
+            input_directory="./test_data/conversion",
+            output_directory=f"./test_data/conversion/v3_{trusted}",
+            migrate_source_code=True,
+            deduplicate_source_code=True,
+            trusted=trusted,
+        )
+
+    validated_lineage = Path("./test_data/conversion/v3_False/lineage.json").read_bytes()
+    trusted_lineage = Path("./test_data/conversion/v3_True/lineage.json").read_bytes()
+    assert validated_lineage == trusted_lineage
+    assert len(validate_lineages(json.loads(trusted_lineage))) == len(json.loads(validated_lineage))
+
+    # cleanup
+    for trusted in (False, True):
+        shutil.rmtree(f"./test_data/conversion/v3_{trusted}", ignore_errors=True)
+
+
+def test_translate_streaming_is_identical() -> None:
+    for streaming in (False, True):
+        convert(
+            input_directory="./test_data/conversion",
+            output_directory=f"./test_data/conversion/v3_{streaming}",
+            migrate_source_code=True,
+            deduplicate_source_code=True,
+            streaming=streaming,
+        )
+
+    for file_name in ("lineage.json", "assets.json", "metadata.json"):
+        in_memory = Path(f"./test_data/conversion/v3_False/{file_name}").read_bytes()
+        streamed = Path(f"./test_data/conversion/v3_True/{file_name}").read_bytes()
+        assert in_memory == streamed
+    assert sorted(path.name for path in Path("./test_data/conversion/v3_False/source_codes").iterdir()) == sorted(
+        path.name for path in Path("./test_data/conversion/v3_True/source_codes").iterdir()
+    )
+
+    # cleanup
+    for streaming in (False, True):
+        shutil.rmtree(f"./test_data/conversion/v3_{streaming}", ignore_errors=True)
+
+
+def test_source_file_cache(tmp_path: Path) -> None:
+    files = {
+        "ascii.sql": "select 1;\nselect 2;\n",
+        "unicode.sql": "select 'é';\nselect 2;\n",
+        "crlf.sql": "select 1;\r\nselect 2;\r\n",
+        "empty.sql": "",
+    }
+    for file_name, text in files.items():
+        (tmp_path / file_name).write_bytes(text.encode("utf-8"))
+    codebase_files_v1 = {
+        file_name: {"mapping_refs": {"second": {"pos_start": 10, "pos_len": 9}}} for file_name in files
+    }
+
+    with SourceFileCache(codebase_files_v1=codebase_files_v1, input_directory=str(tmp_path)) as source_files:
+        for file_name in files:
+            # same slice as the text read with open(), i.e. character offsets with universal newlines
+            with open(tmp_path / file_name) as f:
+                expected = f.read()[10:19]
+            assert source_files.source_code_text(file_name, "second") == expected
+            assert source_files.source_code_text(file_name, "unknown") == ""
+        assert source_files.source_code_text("ascii.sql", "second") == "select 2;"
+
+
+def test_translate_workers_is_identical() -> None:
+    outputs: Dict[str, Dict[str, Any]] = {
+        "sequential": {},
+        "workers": {"workers": 2},
+        "streaming_workers": {"workers": 2, "streaming": True},
+    }
+    for output, kwargs in outputs.items():
+        convert(
+            input_directory="./test_data/conversion",
+            output_directory=f"./test_data/conversion/v3_{output}",
+            migrate_source_code=True,
+            deduplicate_source_code=True,
+            **kwargs,
+        )
+
+    sequential_lineage = Path("./test_data/conversion/v3_sequential/lineage.json").read_bytes()
+    sequential_source_codes = sorted(
+        path.name for path in Path("./test_data/conversion/v3_sequential/source_codes").iterdir()
+    )
+    for output in ("workers", "streaming_workers"):
+        assert Path(f"./test_data/conversion/v3_{output}/lineage.json").read_bytes() == sequential_lineage
+        assert (
+            sorted(path.name for path in Path(f"./test_data/conversion/v3_{output}/source_codes").iterdir())
+            == sequential_source_codes
+        )
+
+    # cleanup
+    for output in outputs:
+        shutil.rmtree(f"./test_data/conversion/v3_{output}", ignore_errors=True)
+
+
+def test_conversion_worker_reads_codebase_files_once(tmp_path: Path) -> None:
+    lineage_v1_json = json.loads(Path("./test_data/conversion/lineage.json").read_text())
+    custom_lineage_config = CustomLineageConfig(
+        application_name="custom-lineage-batch-converted",
+        output_directory=str(tmp_path),
+        source_code_directory_name="source_codes",
+        deduplicate_source_code=True,
+    )
+    # what a worker process does: initialized once, then converts several chunks
+    for asset_cache_size in (100, 0):
+        _init_conversion_worker(
+            lineage_v1_json["codebase_files"],
+            custom_lineage_config,
+            True,
+            "./test_data/conversion",
+            False,
+            asset_cache_size,
+        )
+        with mock.patch.object(SourceFileCache, "_load", autospec=True, side_effect=SourceFileCache._load) as load:
+            chunks = [_convert_lineages_chunk(lineage_v1_json["lineages"]) for _ in range(3)]
+        assert load.call_count == 1
+        assert chunks[0] == chunks[2]
+        # the assets are only shared by the chunks through the asset cache
+        assert (chunks[0][1].src is chunks[2][1].src) == (asset_cache_size > 0)
+
+
+def test_read_codebase_files_after_lineages(tmp_path: Path) -> None:
+    lineage_v1_json = json.loads(Path("./test_data/conversion/lineage.json").read_text())
+    codebase_files_last = {key: value for key, value in lineage_v1_json.items() if key != "codebase_files"}
+    codebase_files_last["codebase_files"] = lineage_v1_json["codebase_files"]
+    (tmp_path / "lineage.json").write_text(json.dumps(codebase_files_last))
+
+    with mock.patch.object(JSONStreamReader, "value", autospec=True, side_effect=JSONStreamReader.value) as value:
+        codebase_files_v1 = _read_codebase_files(str(tmp_path / "lineage.json"))
+    assert codebase_files_v1 == lineage_v1_json["codebase_files"]
+    # the tree and the lineages are skipped without being decoded: only the keys, the version and the codebase files
+    assert value.call_count == len(codebase_files_last) + 2
+
+
+def test_convert_tree_walks_every_branch() -> None:
+    tree_v1 = [
+        {
+            "name": "snowflake",
+            "type": "system",
+            "children": [
+                {
+                    "name": "DB1",
+                    "type": "database",
+                    "children": [
+                        {"name": "T1", "type": "table", "leaves": [{"name": "c1", "type": "column"}]},
+                        {"name": "T2", "type": "table", "leaves": [{"name": "c1", "type": "column"}]},
+                    ],
+                },
+                {"name": "DB2", "type": "database", "children": [{"name": "T3", "type": "table", "leaves": []}]},
+            ],
+        },
+        {"name": "oracle", "type": "system", "leaves": [{"name": "c2", "type": "column"}]},
+    ]
+
+    leaf_assets = list(convert_tree(tree_v1))
+
+    assert [(leaf_asset.parent.name, leaf_asset.leaf.name) for leaf_asset in leaf_assets] == [
+        ("T1", "c1"),
+        ("T2", "c1"),
+        ("oracle", "c2"),
+    ]
+    assert [node.name for node in leaf_assets[1].nodes] == ["snowflake", "DB1"]
+    assert leaf_assets[0].nodes is leaf_assets[1].nodes
+    assert leaf_assets[2].nodes == []
+
+
+def test_convert_tree_deep_and_wide() -> None:
+    depth = sys.getrecursionlimit() + 100
+    deep_tree = {"name": "leaf_table", "type": "table", "leaves": [{"name": "c", "type": "column"}]}
+    for level in range(depth):
+        deep_tree = {"name": f"n{level}", "type": "schema", "children": [deep_tree]}
+    (leaf_asset,) = convert_tree([deep_tree])
+    assert len(leaf_asset.nodes) == depth
+
+    wide_tree = {
+        "name": "DB",
+        "type": "database",
+        "children": [
+            {"name": f"T{table}", "type": "table", "leaves": [{"name": "c", "type": "column"}]}
+            for table in range(10000)
+        ],
+    }
+    leaf_assets = list(convert_tree([wide_tree]))
+    assert len(leaf_assets) == 10000
+    assert leaf_assets[-1].parent.name == "T9999"
+
+
+def test_iter_leaf_assets_streaming_is_identical() -> None:
+    tree_v1: List[Dict[str, Any]] = [
+        {
+            "name": "snowflake",
+            "type": "system",
+            "children": [
+                {
+                    "name": f"DB{database}",
+                    "type": "database",
+                    "children": [
+                        {"name": f"T{table}", "type": "table", "leaves": [{"name": "c1", "type": "column"}]}
+                        for table in range(3)
+                    ],
+                }
+                for database in range(2)
+            ],
+        },
+        # name and type after the leaves and children
+        {"leaves": [{"name": "c2", "type": "column"}], "name": "oracle", "type": "system"},
+        {"children": [{"name": "T1", "type": "table", "leaves": [{"name": "c3", "type": "column"}]}], "name": "db2"},
+        {"name": "empty", "type": "system", "children": []},
+    ]
+    tree_v1[2]["type"] = "database"
+
+    for chunk_size in (1, 16, 1024):
+        reader = JSONStreamReader(io.StringIO(json.dumps({"tree": tree_v1})), chunk_size=chunk_size)
+        for key in reader.members():
+            streamed = list(iter_leaf_assets_streaming(reader))
+        assert streamed == list(convert_tree(tree_v1))
+
+
+def test_convert_lineage_node_with_asset_cache() -> None:
+    asset_cache = AssetCache(maxsize=1)
+    path_1 = [{"database": "DB1"}, {"schema": "PUBLIC"}, {"table": "T1"}, {"column": "C1"}]
+    path_2 = [{"database": "DB1"}, {"schema": "PUBLIC"}, {"table": "T1"}, {"column": "C2"}]
+
+    leaf_asset = _convert_lineage_node(path_1, asset_cache=asset_cache)
+    assert _convert_lineage_node([dict(asset) for asset in path_1], asset_cache=asset_cache) is leaf_asset
+    assert _convert_lineage_node(path_2, asset_cache=asset_cache).leaf.name == "C2"
+    # path_1 was evicted
+    assert _convert_lineage_node(path_1, asset_cache=asset_cache) is not leaf_asset
+    assert (asset_cache.hits, asset_cache.misses, len(asset_cache)) == (1, 3, 1)
+    assert _convert_lineage_node(path_1, asset_cache=asset_cache) == leaf_asset
@@ -1,9 +1,11 @@
 import json
 import logging
 from argparse import ArgumentParser
+from contextlib import nullcontext
 
 from pydantic.json import pydantic_encoder
 
+from src.cache import MetadataCache
 from src.helper import collect_assets_fullname
 
 logger = logging.getLogger(__name__)
@@ -22,6 +24,10 @@ if __name__ == "__main__":
     parser.add_argument("-d", "--domainId")
     parser.add_argument("-t", "--typeId")
     parser.add_argument("-n", "--name")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the local cache of the asset fullnames")
+    parser.add_argument(
+        "--clear-cache", action="store_true", help="Remove the cached metadata of the Collibra instance first"
+    )
 
     args = parser.parse_args()
     collibra_instance = args.collibraInstance
@@ -30,15 +36,19 @@ if __name__ == "__main__":
     domain_id = args.domainId
     type_id = args.typeId
     name = args.name
-    print(f"Input:\n\t- domain Id: {domain_id},\n\t- type Id: {type_id},\n\t- name: {name}")
-    fullnames = collect_assets_fullname(
-        collibra_instance=collibra_instance,
-        username=username,
-        password=password,
-        domain_id=domain_id,
-        type_id=type_id,
-        name=name,
-    )
-
-    print("Collecting fullnames done. Writing result to file")
-    write_result_to_file(fullnames)
+    with nullcontext() if args.no_cache else MetadataCache() as metadata_cache:
+        if metadata_cache and args.clear_cache:
+            metadata_cache.invalidate(collibra_instance=collibra_instance)
+        print(f"Input:\n\t- domain Id: {domain_id},\n\t- type Id: {type_id},\n\t- name: {name}")
+        fullnames = collect_assets_fullname(
+            collibra_instance=collibra_instance,
+            username=username,
+            password=password,
+            domain_id=domain_id,
+            type_id=type_id,
+            name=name,
+            cache=metadata_cache,
+        )
+
+        print("Collecting fullnames done. Writing result to file")
+        write_result_to_file(fullnames)
@@ -1,9 +1,11 @@
 import json
 from argparse import ArgumentParser
+from contextlib import nullcontext
 
 from pydantic.json import pydantic_encoder
 
-from src.helper import collect_assets_typeid
+from src.cache import MetadataCache
+from src.helper import AssetTypeResolver
 
 
 def write_result_to_file(asset_types: dict) -> None:
@@ -26,6 +28,10 @@ if __name__ == "__main__":
         "-a", "--applicationName", help="The type of data source for which " "you are creating a technical lineage."
     )
     parser.add_argument("-t", "--assetType", help="Name of the asset for which the ID needs to be retrieved")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the local cache of the asset type IDs")
+    parser.add_argument(
+        "--clear-cache", action="store_true", help="Remove the cached metadata of the Collibra instance first"
+    )
 
     args = parser.parse_args()
     collibra_instance = args.collibraInstance
@@ -34,9 +40,13 @@ if __name__ == "__main__":
     application_name = args.applicationName
     asset_type = args.assetType
     result = {"application_name": application_name, "version": "3", "asset_types": {}}
-    asset_types = collect_assets_typeid(
-        collibra_instance=collibra_instance, username=username, password=password, asset_type=asset_type
-    )
-    for asset_type in asset_types:
-        result["asset_types"][asset_type.name] = {"uuid": asset_type.uuid}
-    write_result_to_file(result)
+    with nullcontext() if args.no_cache else MetadataCache() as metadata_cache:
+        if metadata_cache and args.clear_cache:
+            metadata_cache.invalidate(collibra_instance=collibra_instance)
+        asset_type_resolver = AssetTypeResolver(
+            collibra_instance=collibra_instance, username=username, password=password, cache=metadata_cache
+        )
+        asset_types = asset_type_resolver.resolve(asset_type) if asset_type else asset_type_resolver.asset_types
+        for asset_type in asset_types:
+            result["asset_types"][asset_type.name] = {"uuid": asset_type.uuid}
+        write_result_to_file(result)
@@ -1,12 +1,25 @@
 import argparse
+import codecs
 import csv
+import io
+import mmap
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import islice
 from pathlib import Path
-from typing import List, Optional, Set, Union
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
+from src import profiling
+from src.cache import MetadataCache
 from src.exceptions import InvalidCSVException
-from src.helper import collect_assets_typeid, generate_json_files, generate_source_code
+from src.graph import DEFAULT_MAX_DIGESTS_IN_MEMORY, LineageDigestSet, LineageGraph
+from src.helper import AssetTypeResolver, LineageWriter, generate_json_files, generate_source_code
 from src.models import (
+    DEFAULT_ASSET_CACHE_SIZE,
     Asset,
+    AssetCache,
+    AssetPool,
     AssetProperties,
     AssetType,
     CustomLineageConfig,
@@ -18,6 +31,10 @@ from src.models import (
     SourceCodeHighLight,
 )
 
+STREAMING_BATCH_SIZE = 1000
+COLUMNAR_CHUNK_SIZE = 10_000
+ENGINES = ("row", "columnar")
+
 
 def _get_default_asset_types() -> List[AssetType]:
     column_type = AssetType(name="Column", uuid="00000000-0000-0000-0000-000000031008")
@@ -74,39 +91,59 @@ def _create_asset(
     csv_file: str,
     row: List[str],
     line: int,
+    asset_pool: Optional[AssetPool] = None,
+    asset_cache: Optional[AssetCache] = None,
 ) -> Union[ParentAsset, LeafAsset]:
+    if asset_cache is not None:
+        key = (tuple(asset_types), tuple(asset_names), fullname, domain_id)
+        asset = asset_cache.get(key)
+        if asset is None:
+            asset = asset_cache.put(
+                key,
+                _create_asset(
+                    asset_types=asset_types,
+                    asset_names=asset_names,
+                    domain_id=domain_id,
+                    fullname=fullname,
+                    csv_file=csv_file,
+                    row=row,
+                    line=line,
+                    asset_pool=asset_pool,
+                ),
+            )
+        return asset
+
+    asset_pool = asset_pool if asset_pool is not None else AssetPool()
+
     # Creating node asset
-    nodes = []
-    for asset_name, asset_type in zip(asset_names[:-2], asset_types[:-2]):
-        if asset_name:
-            nodes.append(Asset(name=asset_name, type=asset_type))
+    nodes = [
+        (asset_name, asset_type) for asset_name, asset_type in zip(asset_names[:-2], asset_types[:-2]) if asset_name
+    ]
     if not nodes:
-        raise InvalidCSVException(f"No nodes defined in {csv_file} in row {row} (line {line})")
-    nodes_asset = NodeAsset(nodes=nodes)
+        raise InvalidCSVException(f"No nodes defined in {csv_file} in row {row} (line {line})", line=line)
+    node_assets = asset_pool.nodes(nodes)
 
     # Creating the props when relevant
     if fullname and domain_id:
-        props = AssetProperties(fullname=fullname, domain_id=domain_id)
+        props = asset_pool.props(fullname=fullname, domain_id=domain_id)
     else:
         props = None
 
     # Creating parrent asset
     if not asset_names[-2]:
-        raise InvalidCSVException(f"Parent asset not defined in {csv_file} in row {row} (line {line})")
-    parent_asset = ParentAsset(
-        nodes=nodes_asset.nodes, parent=Asset(name=asset_names[-2], type=asset_types[-2]), props=props
-    )
+        raise InvalidCSVException(f"Parent asset not defined in {csv_file} in row {row} (line {line})", line=line)
+    parent = asset_pool.asset(name=asset_names[-2], type=asset_types[-2])
 
     # Creating leaf asset - optionally
     if asset_names[-1]:
-        return LeafAsset(
-            nodes=nodes_asset.nodes,
-            parent=parent_asset.parent,
-            leaf=Asset(name=asset_names[-1], type=asset_types[-1]),
+        return asset_pool.leaf_asset(
+            nodes=node_assets,
+            parent=parent,
+            leaf=asset_pool.asset(name=asset_names[-1], type=asset_types[-1]),
             props=props,
         )
 
-    return parent_asset
+    return asset_pool.parent_asset(nodes=node_assets, parent=parent, props=props)
 
 
 def _create_source_code(
@@ -129,7 +166,8 @@ def _create_source_code(
             except (ValueError, IndexError):
                 raise InvalidCSVException(
                     f"""Invalid highlights provided: {highlights} (line {line}).
-                     Expected format: \"[0:100]\" (single) or \"[0:100],[200:100]\" (multiple)"""
+                     Expected format: \"[0:100]\" (single) or \"[0:100],[200:100]\" (multiple)""",
+                    line=line,
                 )
     else:
         source_code_highlights = None
@@ -142,7 +180,589 @@ def _create_source_code(
     )
 
 
-def ingest_csv_files(source_directory: str, custom_lineage_config: CustomLineageConfig) -> None:
+def _create_lineages(
+    rows: Iterable[List[str]],
+    first_line: int,
+    headers: List[str],
+    index_fullname: Tuple[int, int],
+    csv_file_name: str,
+    custom_lineage_config: CustomLineageConfig,
+    asset_pool: AssetPool,
+    asset_cache: Optional[AssetCache] = None,
+) -> Iterator[Lineage]:
+    # yields the lineage relationships of csv rows one by one, the first row being at line first_line of the file
+    index_fullname_src, index_fullname_trg = index_fullname
+    line = first_line - 1
+    # timed wrappers only when profiling is enabled, the functions themselves otherwise
+    create_asset = profiling.timed("csv.create_asset", _create_asset)
+    create_source_code = profiling.timed("csv.create_source_code", _create_source_code)
+    for line, row in enumerate(rows, start=first_line):
+        if len(row) != len(headers):
+            raise InvalidCSVException(
+                f"""Row {row} (line {line}) in file {csv_file_name} does not contain same amount
+                 of entries as the header""",
+                line=line,
+            )
+
+        src = create_asset(
+            asset_types=headers[:index_fullname_src],
+            asset_names=row[:index_fullname_src],
+            fullname=row[index_fullname_src],
+            domain_id=row[index_fullname_src + 1],
+            csv_file=csv_file_name,
+            row=row,
+            line=line,
+            asset_pool=asset_pool,
+            asset_cache=asset_cache,
+        )
+        trg = create_asset(
+            asset_types=headers[index_fullname_src + 2 : index_fullname_trg],
+            asset_names=row[index_fullname_src + 2 : index_fullname_trg],
+            fullname=row[index_fullname_trg],
+            domain_id=row[index_fullname_trg + 1],
+            csv_file=csv_file_name,
+            row=row,
+            line=line,
+            asset_pool=asset_pool,
+            asset_cache=asset_cache,
+        )
+
+        source_code_text, highlights, transformation_display_name = row[index_fullname_trg + 2 :]
+        source_code = create_source_code(
+            source_code_text=source_code_text,
+            highlights=highlights,
+            transformation_display_name=transformation_display_name,
+            custom_lineage_config=custom_lineage_config,
+            line=line,
+        )
+
+        yield asset_pool.lineage(src=src, trg=trg, source_code=source_code)
+
+    profiling.count("csv.rows", line - first_line + 1)
+
+
+def _create_lineages_columnar(
+    rows: List[List[str]],
+    first_line: int,
+    headers: List[str],
+    index_fullname: Tuple[int, int],
+    csv_file_name: str,
+    custom_lineage_config: CustomLineageConfig,
+    asset_pool: AssetPool,
+) -> List[Lineage]:
+    # same lineage relationships as _create_lineages, but the rows are transposed into columns: the checks run on
+    # whole columns, and the assets, source codes and lineage relationships are only built once per distinct value,
+    # so no asset cache is used. Invalid rows are left to _create_lineages, which reports the first error of the rows
+    # with its line. The chunk of rows is in memory already, its lineage relationships are returned at once.
+    index_fullname_src, index_fullname_trg = index_fullname
+    columns = list(zip(*rows))
+    if (
+        any(len(row) != len(headers) for row in rows)
+        or "" in columns[index_fullname_src - 2]
+        or "" in columns[index_fullname_trg - 2]
+    ):
+        return list(
+            _create_lineages(
+                rows, first_line, headers, index_fullname, csv_file_name, custom_lineage_config, asset_pool
+            )
+        )
+
+    try:
+        src_assets = _create_assets_columnar(
+            headers[:index_fullname_src],
+            columns[: index_fullname_src + 2],
+            rows,
+            first_line,
+            csv_file_name,
+            asset_pool,
+        )
+        trg_assets = _create_assets_columnar(
+            headers[index_fullname_src + 2 : index_fullname_trg],
+            columns[index_fullname_src + 2 : index_fullname_trg + 2],
+            rows,
+            first_line,
+            csv_file_name,
+            asset_pool,
+        )
+        source_codes = _create_source_codes_columnar(
+            columns[index_fullname_trg + 2 :], first_line, custom_lineage_config
+        )
+    except InvalidCSVException:
+        return list(
+            _create_lineages(
+                rows, first_line, headers, index_fullname, csv_file_name, custom_lineage_config, asset_pool
+            )
+        )
+
+    # rows with the same assets and source code share their lineage relationship
+    lineages: Dict[Tuple[int, int, int], Lineage] = {}
+    chunk_lineages = []
+    for src, trg, source_code in zip(src_assets, trg_assets, source_codes):
+        key = (id(src), id(trg), id(source_code))
+        lineage = lineages.get(key)
+        if lineage is None:
+            lineage = lineages[key] = asset_pool.lineage(src=src, trg=trg, source_code=source_code)
+        chunk_lineages.append(lineage)
+    profiling.count("csv.rows", len(rows))
+    return chunk_lineages
+
+
+def _create_assets_columnar(
+    asset_types: List[str],
+    columns: List[Tuple[str, ...]],
+    rows: List[List[str]],
+    first_line: int,
+    csv_file_name: str,
+    asset_pool: AssetPool,
+) -> List[Union[ParentAsset, LeafAsset]]:
+    # columns are the asset names followed by the fullname and the domain id; returns the asset of every row
+    keys = list(zip(*columns))
+    # index of the first row of every distinct asset
+    first_rows = dict(zip(reversed(keys), range(len(keys) - 1, -1, -1)))
+    assets = {
+        key: _create_asset(
+            asset_types=asset_types,
+            asset_names=list(key[:-2]),
+            fullname=key[-2],
+            domain_id=key[-1],
+            csv_file=csv_file_name,
+            row=rows[index],
+            line=first_line + index,
+            asset_pool=asset_pool,
+        )
+        for key, index in first_rows.items()
+    }
+    profiling.count("csv.distinct_assets", len(assets))
+    return list(map(assets.__getitem__, keys))
+
+
+def _create_source_codes_columnar(
+    columns: List[Tuple[str, ...]], first_line: int, custom_lineage_config: CustomLineageConfig
+) -> List[Optional[SourceCode]]:
+    # columns are the source code, highlights and transformation display name; returns the source code of every row
+    if not custom_lineage_config.deduplicate_source_code:
+        # every row gets its own source code file
+        return [
+            _create_source_code(
+                source_code_text=source_code_text,
+                highlights=highlights,
+                transformation_display_name=transformation_display_name,
+                custom_lineage_config=custom_lineage_config,
+                line=line,
+            )
+            for line, (source_code_text, highlights, transformation_display_name) in enumerate(
+                zip(*columns), start=first_line
+            )
+        ]
+
+    keys = list(zip(*columns))
+    first_rows = dict(zip(reversed(keys), range(len(keys) - 1, -1, -1)))
+    source_codes = {
+        key: _create_source_code(
+            source_code_text=key[0],
+            highlights=key[1],
+            transformation_display_name=key[2],
+            custom_lineage_config=custom_lineage_config,
+            line=first_line + index,
+        )
+        for key, index in first_rows.items()
+    }
+    return list(map(source_codes.__getitem__, keys))
+
+
+def _create_lineages_with_engine(
+    rows: Iterable[List[str]],
+    first_line: int,
+    headers: List[str],
+    csv_file_name: str,
+    custom_lineage_config: CustomLineageConfig,
+    asset_pool: AssetPool,
+    engine: str = "row",
+    asset_cache: Optional[AssetCache] = None,
+    chunk_size: Optional[int] = None,
+) -> Iterator[Lineage]:
+    # yields the lineage relationships of csv rows with the given engine, the first row being at line first_line; the
+    # columnar engine holds chunk_size rows in memory, COLUMNAR_CHUNK_SIZE by default
+    index_fullname = _validate_header(headers=headers, csv_file=Path(csv_file_name))
+    index_fullname_src, index_fullname_trg = index_fullname
+    if engine == "columnar":
+        create_lineages = profiling.timed("csv.create_lineages_columnar", _create_lineages_columnar)
+        row_iterator = iter(rows)
+        while True:
+            chunk = list(islice(row_iterator, chunk_size or COLUMNAR_CHUNK_SIZE))
+            if not chunk:
+                break
+            yield from create_lineages(
+                chunk,
+                first_line,
+                headers,
+                (index_fullname_src, index_fullname_trg),
+                csv_file_name,
+                custom_lineage_config,
+                asset_pool,
+            )
+            first_line += len(chunk)
+    elif engine == "row":
+        yield from _create_lineages(
+            rows,
+            first_line,
+            headers,
+            (index_fullname_src, index_fullname_trg),
+            csv_file_name,
+            custom_lineage_config,
+            asset_pool,
+            asset_cache,
+        )
+    else:
+        raise ValueError(f"Unknown engine {engine}, expected one of {', '.join(ENGINES)}")
+
+
+def _iter_csv_file(
+    csv_file_to_ingest: Path,
+    custom_lineage_config: CustomLineageConfig,
+    asset_pool: AssetPool,
+    unique_asset_types: Set[str],
+    engine: str = "row",
+    asset_cache: Optional[AssetCache] = None,
+    chunk_size: Optional[int] = None,
+) -> Iterator[Lineage]:
+    # yields the lineage relationships of a csv file, and adds the asset types of its header to unique_asset_types
+    with open(csv_file_to_ingest, "r", encoding="utf-8-sig") as csv_file:
+        csv_reader = csv.reader(
+            csv_file,
+        )
+        headers = next(csv_reader)
+        index_fullname_src, index_fullname_trg = _validate_header(headers=headers, csv_file=csv_file_to_ingest)
+        unique_asset_types.update(headers[:index_fullname_src])
+        unique_asset_types.update(headers[index_fullname_src + 2 : index_fullname_trg])
+        yield from _create_lineages_with_engine(
+            csv_reader,
+            2,
+            headers,
+            str(csv_file_to_ingest),
+            custom_lineage_config,
+            asset_pool,
+            engine,
+            asset_cache,
+            chunk_size,
+        )
+
+    profiling.count("csv.files")
+
+
+def _ingest_csv_file(
+    csv_file_to_ingest: Path,
+    custom_lineage_config: CustomLineageConfig,
+    asset_pool: Optional[AssetPool] = None,
+    engine: str = "row",
+    asset_cache: Optional[AssetCache] = None,
+) -> Tuple[List[Lineage], Set[str]]:
+    asset_pool = asset_pool if asset_pool is not None else AssetPool()
+    unique_asset_types: Set[str] = set()
+    lineages = list(
+        _iter_csv_file(
+            csv_file_to_ingest,
+            custom_lineage_config,
+            asset_pool,
+            unique_asset_types,
+            engine=engine,
+            asset_cache=asset_cache,
+        )
+    )
+    return lineages, unique_asset_types
+
+
+@contextmanager
+def _map_csv_file(csv_file_to_ingest: Path) -> Iterator[mmap.mmap]:
+    with open(csv_file_to_ingest, "rb") as csv_file:
+        with mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as csv_map:
+            yield csv_map
+
+
+def _record_end(csv_map: mmap.mmap, position: int, quoted: bool = False) -> int:
+    # returns the position following the first line break at or after `position` which ends a record, i.e. which is
+    # not inside a quoted field; `quoted` tells whether `position` itself is inside a quoted field. Escaped quotes
+    # ("") toggle the state twice, so the quote parity gives the state at any position.
+    while True:
+        newline = csv_map.find(b"\n", position)
+        if newline == -1:
+            return len(csv_map)
+        quoted ^= csv_map[position:newline].count(b'"') % 2 == 1
+        if not quoted:
+            return newline + 1
+        position = newline + 1
+
+
+def _split_csv_file(csv_file_to_ingest: Path, split_size: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Splits a csv file in byte ranges of about `split_size` bytes, aligned on the boundaries of the records so that
+    quoted fields spanning several lines, such as source code, are never cut.
+
+    :returns: the header of the file and the (start, end) byte ranges of its records
+    :rtype: Tuple[List[str], List[Tuple[int, int]]]
+    """
+    with _map_csv_file(csv_file_to_ingest) as csv_map:
+        header_start = len(codecs.BOM_UTF8) if csv_map[: len(codecs.BOM_UTF8)] == codecs.BOM_UTF8 else 0
+        start = _record_end(csv_map, header_start)
+        headers = next(csv.reader(io.StringIO(csv_map[header_start:start].decode("utf-8"))))
+        ranges = []
+        while start < len(csv_map):
+            end = min(start + split_size, len(csv_map))
+            if end < len(csv_map):
+                # start is a record boundary, so the quote parity of the range tells whether end is inside a field
+                end = _record_end(csv_map, end, quoted=csv_map[start:end].count(b'"') % 2 == 1)
+            ranges.append((start, end))
+            start = end
+    return headers, ranges
+
+
+def _ingest_csv_range(
+    csv_file_to_ingest: Path,
+    byte_range: Tuple[int, int],
+    headers: List[str],
+    custom_lineage_config: CustomLineageConfig,
+    asset_pool: AssetPool,
+    engine: str = "row",
+    asset_cache: Optional[AssetCache] = None,
+) -> Tuple[List[Lineage], int]:
+    # converts the records of a byte range of a csv file; returns the lineage relationships and the number of rows.
+    # Workers do not know how many rows precede their range, so the lines in their errors are relative to the range,
+    # as if it were a whole file.
+    with _map_csv_file(csv_file_to_ingest) as csv_map:
+        text = csv_map[byte_range[0] : byte_range[1]].decode("utf-8")
+    rows = list(csv.reader(io.StringIO(text)))
+    lineages = list(
+        _create_lineages_with_engine(
+            rows,
+            2,
+            headers,
+            str(csv_file_to_ingest),
+            custom_lineage_config,
+            asset_pool,
+            engine,
+            asset_cache,
+        )
+    )
+    return lineages, len(rows)
+
+
+def _csv_tasks(
+    csv_files: List[Path], split_size: Optional[int], unique_asset_types: Set[str]
+) -> Iterator[Tuple[Path, Optional[Tuple[int, int]], List[str]]]:
+    # yields (file, byte range, header) for the files larger than split_size, and (file, None, []) for the others
+    for csv_file_to_ingest in csv_files:
+        if not split_size or csv_file_to_ingest.stat().st_size <= split_size:
+            yield csv_file_to_ingest, None, []
+            continue
+        headers, ranges = _split_csv_file(csv_file_to_ingest, split_size)
+        index_fullname_src, index_fullname_trg = _validate_header(headers=headers, csv_file=csv_file_to_ingest)
+        unique_asset_types.update(headers[:index_fullname_src])
+        unique_asset_types.update(headers[index_fullname_src + 2 : index_fullname_trg])
+        profiling.count("csv.files")
+        profiling.count("csv.ranges", len(ranges))
+        for byte_range in ranges:
+            yield csv_file_to_ingest, byte_range, headers
+
+
+def _ingest_csv_files_parallel(
+    csv_files: List[Path],
+    custom_lineage_config: CustomLineageConfig,
+    workers: int,
+    unique_asset_types: Set[str],
+    trusted: bool = False,
+    engine: str = "row",
+    asset_cache: Optional[AssetCache] = None,
+    split_size: Optional[int] = None,
+) -> Iterator[List[Lineage]]:
+    # parses the csv files in a process pool and yields their lineage relationships in the order of the files. Files
+    # larger than split_size are split in byte ranges parsed by different workers. At most two tasks per worker are
+    # in flight, so the results of a large file do not pile up in memory.
+    asset_pool = AssetPool(trusted=trusted)
+    # number of rows of the ranges already consumed per file, to give the line in the file of an error
+    rows_before: Dict[Path, int] = {}
+    pending: Deque[Tuple[Future, Path, Optional[Tuple[int, int]], List[str]]] = deque()
+
+    def consume() -> List[Lineage]:
+        future, csv_file_to_ingest, byte_range, headers = pending.popleft()
+        if byte_range is None:
+            file_lineages, file_asset_types = future.result()
+            unique_asset_types.update(file_asset_types)
+            return file_lineages
+        try:
+            range_lineages, range_rows = future.result()
+        except InvalidCSVException as e:
+            # the line in the error of the worker is relative to its range
+            raise e.shift_line(rows_before.get(csv_file_to_ingest, 0)) from None
+        rows_before[csv_file_to_ingest] = rows_before.get(csv_file_to_ingest, 0) + range_rows
+        return range_lineages
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for csv_file_to_ingest, byte_range, headers in _csv_tasks(csv_files, split_size, unique_asset_types):
+            future: Future
+            if byte_range is None:
+                future = executor.submit(
+                    _ingest_csv_file, csv_file_to_ingest, custom_lineage_config, asset_pool, engine, asset_cache
+                )
+            else:
+                future = executor.submit(
+                    _ingest_csv_range,
+                    csv_file_to_ingest,
+                    byte_range,
+                    headers,
+                    custom_lineage_config,
+                    asset_pool,
+                    engine,
+                    asset_cache,
+                )
+            pending.append((future, csv_file_to_ingest, byte_range, headers))
+            if len(pending) >= 2 * workers:
+                yield consume()
+        while pending:
+            yield consume()
+
+
+def _count_asset_cache(asset_cache: Optional[AssetCache]) -> None:
+    # hits and misses of the cache of the current process, the copies used by worker processes are not counted
+    if asset_cache is not None:
+        profiling.count("asset_cache.hits", asset_cache.hits)
+        profiling.count("asset_cache.misses", asset_cache.misses)
+
+
+def _resolve_asset_types(
+    unique_asset_types: Set[str], custom_lineage_config: CustomLineageConfig, metadata_cache: Optional[MetadataCache]
+) -> List[AssetType]:
+    if not custom_lineage_config.dic_info_provided:
+        # standard asset types
+        return _get_default_asset_types()
+
+    # collect uuid from DIC
+    asset_types: List[AssetType] = []
+    asset_type_resolver = AssetTypeResolver(
+        collibra_instance=custom_lineage_config.dic_instance,
+        username=custom_lineage_config.dic_username,
+        password=custom_lineage_config.dic_password,
+        cache=metadata_cache,
+    )
+    resolve_asset_type = profiling.timed("asset_types.resolve", asset_type_resolver.resolve)
+    for asset_type in unique_asset_types:
+        dic_asset_types = resolve_asset_type(asset_type)
+        if dic_asset_types:
+            asset_types.extend(dic_asset_types)
+        else:
+            print(f"Did not find asset type uuid for asset type {asset_type} specified in input.")
+    return asset_types
+
+
+def _ingest_csv_files_streaming(
+    csv_files: List[Path],
+    custom_lineage_config: CustomLineageConfig,
+    metadata_cache: Optional[MetadataCache],
+    trusted: bool,
+    max_lineages_per_file: Optional[int],
+    max_bytes_per_file: Optional[int],
+    batch_size: int,
+    max_digests_in_memory: int,
+    engine: str = "row",
+    asset_cache: Optional[AssetCache] = None,
+) -> None:
+    unique_asset_types: Set[str] = set()
+    asset_pool = AssetPool(trusted=trusted)
+    lineages = (
+        lineage
+        for csv_file_to_ingest in csv_files
+        for lineage in _iter_csv_file(
+            csv_file_to_ingest,
+            custom_lineage_config,
+            asset_pool,
+            unique_asset_types,
+            engine=engine,
+            asset_cache=asset_cache,
+            # the rows of a columnar chunk are held in memory as well
+            chunk_size=batch_size,
+        )
+    )
+    with profiling.stage("csv.parse"), LineageDigestSet(max_in_memory=max_digests_in_memory) as lineage_digests:
+        # metadata.json is written when the writer is closed, once the asset types of all the headers are known
+        with LineageWriter(
+            custom_lineage_config=custom_lineage_config,
+            max_lineages_per_file=max_lineages_per_file,
+            max_bytes_per_file=max_bytes_per_file,
+        ) as writer:
+            while True:
+                batch = list(islice(lineages, batch_size))
+                if not batch:
+                    break
+                for lineage in batch:
+                    # duplicates are detected on a digest of the lineage relationships instead of a LineageGraph,
+                    # which would hold all of them in memory
+                    if lineage_digests.add(lineage):
+                        writer.add_lineage(lineage)
+                # the lineage relationships of the batch are written, the assets they share can be released
+                asset_pool.clear()
+            writer.asset_types = _resolve_asset_types(unique_asset_types, custom_lineage_config, metadata_cache)
+        duplicates = lineage_digests.duplicates
+    profiling.count("lineage.duplicates", duplicates)
+    profiling.snapshot_memory("csv.parse")
+    if duplicates:
+        print(f"Dropped {duplicates} duplicate lineage relationships.")
+
+
+def ingest_csv_files(
+    source_directory: str,
+    custom_lineage_config: CustomLineageConfig,
+    workers: int = 1,
+    metadata_cache: Optional[MetadataCache] = None,
+    trusted: bool = False,
+    max_lineages_per_file: Optional[int] = None,
+    max_bytes_per_file: Optional[int] = None,
+    streaming: bool = False,
+    batch_size: int = STREAMING_BATCH_SIZE,
+    max_digests_in_memory: int = DEFAULT_MAX_DIGESTS_IN_MEMORY,
+    engine: str = "row",
+    asset_cache_size: int = DEFAULT_ASSET_CACHE_SIZE,
+    split_size: Optional[int] = None,
+) -> None:
+    """
+    Converts all the csv files in the source directory into the batch definition format.
+
+    :param source_directory: Directory containing the csv files
+    :type source_directory: str
+    :param custom_lineage_config: Configuration object
+    :type custom_lineage_config: CustomLineageConfig
+    :param workers: Number of processes used to parse the csv files. Files are parsed in a process pool when higher
+        than 1; the lineage relationships are always written in the order of the sorted file names.
+    :type workers: int
+    :param metadata_cache: Cache used for the asset types fetched from Collibra
+    :type metadata_cache: MetadataCache, optional
+    :param trusted: Skip the validation of the lineage models, only for csv files which are known to be valid
+    :type trusted: bool
+    :param max_lineages_per_file: Shard the output in batch definitions of at most this many lineage relationships
+    :type max_lineages_per_file: int, optional
+    :param max_bytes_per_file: Shard the output in batch definitions with a lineage.json of at most this many bytes
+    :type max_bytes_per_file: int, optional
+    :param streaming: Write the lineage relationships as the rows are read instead of collecting them first, so that
+        memory usage does not depend on the number of rows of the csv files. It still grows with the number of
+        distinct source codes when `deduplicate_source_code` is set: `source_code_index` keeps the file name of each
+        of them. The files are parsed in the current process, `workers` is not used. The output is identical to the
+        default conversion.
+    :type streaming: bool
+    :param batch_size: In streaming mode, number of lineage relationships held in memory before they are written,
+        and number of rows per chunk of the columnar engine
+    :type batch_size: int
+    :param max_digests_in_memory: In streaming mode, number of distinct lineage relationships above which the state
+        used to drop the duplicates is moved to a temporary SQLite database
+    :type max_digests_in_memory: int
+    :param engine: "row" converts the rows one by one; "columnar" (experimental) reads the rows in chunks of columns,
+        checks whole columns at once and builds the assets and source codes once per distinct value. It is not faster
+        than the row engine in the benchmarks so far. Both engines give the same output and the same errors.
+    :type engine: str
+    :param asset_cache_size: Number of most recently used assets kept built in an `AssetCache`, 0 disables the cache.
+        Only used by the row engine.
+    :type asset_cache_size: int
+    :param split_size: With `workers` higher than 1, csv files larger than this many bytes are split in byte ranges
+        of about this size, aligned on the records, which are parsed in parallel. Not used in streaming mode.
+    :type split_size: int, optional
+    """
     source_dir = Path(source_directory)
     unique_asset_types: Set[str] = set()
 
@@ -153,79 +773,72 @@ def ingest_csv_files(source_directory: str, custom_lineage_config: CustomLineage
         )
 
     # Extract csv files from source directory
-    csv_files = [f for f in source_dir.iterdir() if f.is_file() and f.suffix == ".csv"]
+    csv_files = sorted(f for f in source_dir.iterdir() if f.is_file() and f.suffix == ".csv")
     if not csv_files:
         raise InvalidCSVException(
             f"No csv files found in {source_dir}, please make sure to provide directory with csv files."
         )
 
+    # the columnar engine already builds each distinct asset once per chunk, the cache does not speed it up
+    asset_cache = AssetCache(maxsize=asset_cache_size) if asset_cache_size > 0 and engine == "row" else None
+    if streaming:
+        _ingest_csv_files_streaming(
+            csv_files=csv_files,
+            custom_lineage_config=custom_lineage_config,
+            metadata_cache=metadata_cache,
+            trusted=trusted,
+            max_lineages_per_file=max_lineages_per_file,
+            max_bytes_per_file=max_bytes_per_file,
+            batch_size=batch_size,
+            max_digests_in_memory=max_digests_in_memory,
+            engine=engine,
+            asset_cache=asset_cache,
+        )
+        _count_asset_cache(asset_cache)
+        return
+
     # Extract the lineage relationships from the csv files
-    lineages = []
-    for csv_file_to_ingest in csv_files:
-        with open(csv_file_to_ingest, "r", encoding="utf-8-sig") as csv_file:
-            csv_reader = csv.reader(
-                csv_file,
-            )
-            headers = next(csv_reader)
-            index_fullname_src, index_fullname_trg = _validate_header(headers=headers, csv_file=csv_file_to_ingest)
-            unique_asset_types.update(headers[:index_fullname_src])
-            unique_asset_types.update(headers[index_fullname_src + 2 : index_fullname_trg])
-            for line, row in enumerate(csv_reader, start=2):
-                if len(row) != len(headers):
-                    raise InvalidCSVException(
-                        f"""Row {row} (line {line}) in file {csv_file} does not contain same amount
-                         of entries as the header"""
-                    )
-
-                src = _create_asset(
-                    asset_types=headers[:index_fullname_src],
-                    asset_names=row[:index_fullname_src],
-                    fullname=row[index_fullname_src],
-                    domain_id=row[index_fullname_src + 1],
-                    csv_file=csv_file.name,
-                    row=row,
-                    line=line,
-                )
-                trg = _create_asset(
-                    asset_types=headers[index_fullname_src + 2 : index_fullname_trg],
-                    asset_names=row[index_fullname_src + 2 : index_fullname_trg],
-                    fullname=row[index_fullname_trg],
-                    domain_id=row[index_fullname_trg + 1],
-                    csv_file=csv_file.name,
-                    row=row,
-                    line=line,
+    lineage_graph = LineageGraph()
+    add_lineages = profiling.timed("lineage.deduplicate", lineage_graph.add_lineages)
+    with profiling.stage("csv.parse"):
+        if workers > 1 and (len(csv_files) > 1 or split_size):
+            # the results come in the order of csv_files and the first failure is re-raised; every task gets its own
+            # copy of the asset cache
+            for file_lineages in _ingest_csv_files_parallel(
+                csv_files=csv_files,
+                custom_lineage_config=custom_lineage_config,
+                workers=workers if split_size else min(workers, len(csv_files)),
+                unique_asset_types=unique_asset_types,
+                trusted=trusted,
+                engine=engine,
+                asset_cache=asset_cache,
+                split_size=split_size,
+            ):
+                add_lineages(file_lineages)
+        else:
+            asset_pool = AssetPool(trusted=trusted)
+            for csv_file_to_ingest in csv_files:
+                file_lineages, file_asset_types = _ingest_csv_file(
+                    csv_file_to_ingest, custom_lineage_config, asset_pool, engine, asset_cache
                 )
+                add_lineages(file_lineages)
+                unique_asset_types.update(file_asset_types)
+    profiling.count("lineage.duplicates", lineage_graph.duplicates)
+    profiling.snapshot_memory("csv.parse")
+    _count_asset_cache(asset_cache)
 
-                source_code_text, highlights, transformation_display_name = row[index_fullname_trg + 2 :]
-                source_code = _create_source_code(
-                    source_code_text=source_code_text,
-                    highlights=highlights,
-                    transformation_display_name=transformation_display_name,
-                    custom_lineage_config=custom_lineage_config,
-                    line=line,
-                )
+    if lineage_graph.duplicates:
+        print(f"Dropped {lineage_graph.duplicates} duplicate lineage relationships.")
 
-                lineages.append(Lineage(src=src, trg=trg, source_code=source_code))
-
-    if custom_lineage_config.dic_info_provided:
-        # collect uuid from DIC
-        asset_types: List[AssetType] = []
-        for asset_type in unique_asset_types:
-            dic_asset_types = collect_assets_typeid(
-                collibra_instance=custom_lineage_config.dic_instance,
-                username=custom_lineage_config.dic_username,
-                password=custom_lineage_config.dic_password,
-                asset_type=asset_type,
-            )
-            if dic_asset_types:
-                asset_types.extend(dic_asset_types)
-            else:
-                print(f"Did not find asset type uuid for asset type {asset_type} specified in input.")
-    else:
-        # standard asset types
-        asset_types = _get_default_asset_types()
+    asset_types = _resolve_asset_types(unique_asset_types, custom_lineage_config, metadata_cache)
 
-    generate_json_files(lineages=lineages, custom_lineage_config=custom_lineage_config, asset_types=asset_types)
+    generate_json_files(
+        lineages=lineage_graph.lineages(),
+        custom_lineage_config=custom_lineage_config,
+        asset_types=asset_types,
+        max_lineages_per_file=max_lineages_per_file,
+        max_bytes_per_file=max_bytes_per_file,
+    )
 
 
 if __name__ == "__main__":
@@ -248,7 +861,83 @@ if __name__ == "__main__":
     parser.add_argument(
         "-p", "--password", default="", help="Collibra account's password used fetch the asset type IDs"
     )
+    parser.add_argument(
+        "--deduplicateSourceCode",
+        action="store_true",
+        help="Store identical source code only once, in a file named after the hash of its content",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1, help="Number of processes used to parse the csv files in parallel"
+    )
+    parser.add_argument(
+        "--trusted",
+        action="store_true",
+        help="Skip the validation of the lineage models, only for csv files which are known to be valid",
+    )
+    parser.add_argument(
+        "--maxLineagesPerFile", type=int, help="Shard the output in batch definitions of at most this many lineages"
+    )
+    parser.add_argument(
+        "--maxBytesPerFile", type=int, help="Shard the output in batch definitions of at most this many bytes"
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Write the lineage relationships as the rows are read, with bounded memory usage; --workers is not used",
+    )
+    parser.add_argument(
+        "--batchSize",
+        type=int,
+        default=STREAMING_BATCH_SIZE,
+        help="With --streaming, number of lineage relationships held in memory before they are written, and number of "
+        "rows per chunk of the columnar engine",
+    )
+    parser.add_argument(
+        "--maxDigestsInMemory",
+        type=int,
+        default=DEFAULT_MAX_DIGESTS_IN_MEMORY,
+        help="With --streaming, number of distinct lineage relationships above which duplicates are detected on disk",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="row",
+        help="'columnar' (experimental) processes the rows in chunks of columns and builds every distinct asset once "
+        "per chunk",
+    )
+    parser.add_argument(
+        "--splitSize",
+        type=int,
+        help="With --workers, split the csv files larger than this many bytes in ranges of about this size parsed in "
+        "parallel",
+    )
+    parser.add_argument(
+        "--assetCacheSize",
+        type=int,
+        default=DEFAULT_ASSET_CACHE_SIZE,
+        help="Number of most recently used assets kept built, so assets repeated on many rows are built once; 0 "
+        "disables the cache. Only used by the row engine",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the local cache of the asset type IDs")
+    parser.add_argument(
+        "--clear-cache", action="store_true", help="Remove the cached metadata of the Collibra instance first"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="REPORT_PATH",
+        help="Print a summary of the time spent per stage, counters and memory usage, "
+        "and write the full report as json to REPORT_PATH when provided",
+    )
+    parser.add_argument(
+        "--profileMemory",
+        action="store_true",
+        help="With --profile, also trace the Python memory allocations (slower)",
+    )
     args = parser.parse_args()
+    if args.profile is not None:
+        profiling.enable(trace_memory=args.profileMemory)
 
     custom_lineage_config = CustomLineageConfig(
         application_name="custom-lineage-batch-csv-ingested",
@@ -257,6 +946,31 @@ if __name__ == "__main__":
         dic_instance=args.collibraInstance,
         dic_username=args.username,
         dic_password=args.password,
+        deduplicate_source_code=args.deduplicateSourceCode,
     )
 
-    ingest_csv_files(source_directory=args.source_directory, custom_lineage_config=custom_lineage_config)
+    with nullcontext() if args.no_cache else MetadataCache() as metadata_cache:
+        if metadata_cache and args.clear_cache:
+            metadata_cache.invalidate(collibra_instance=args.collibraInstance)
+
+        ingest_csv_files(
+            source_directory=args.source_directory,
+            custom_lineage_config=custom_lineage_config,
+            workers=args.workers,
+            metadata_cache=metadata_cache,
+            trusted=args.trusted,
+            max_lineages_per_file=args.maxLineagesPerFile,
+            max_bytes_per_file=args.maxBytesPerFile,
+            streaming=args.streaming,
+            batch_size=args.batchSize,
+            max_digests_in_memory=args.maxDigestsInMemory,
+            engine=args.engine,
+            asset_cache_size=args.assetCacheSize,
+            split_size=args.splitSize,
+        )
+
+    profiler = profiling.disable()
+    if profiler is not None:
+        print(profiler.summary())
+        if args.profile:
+            profiler.write_report(args.profile)
@@ -1,11 +1,22 @@
 import argparse
 import json
+import mmap
 import os
-from typing import Dict, List, Optional
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from types import TracebackType
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union, cast
 
-from src.helper import generate_json_files, generate_source_code
+from src import profiling
+from src.graph import LineageDigestSet, LineageGraph
+from src.helper import LineageWriter, generate_json_files, generate_source_code
+from src.json_stream import JSONStreamReader
 from src.models import (
+    DEFAULT_ASSET_CACHE_SIZE,
     Asset,
+    AssetCache,
+    AssetPool,
     AssetProperties,
     AssetType,
     CustomLineageConfig,
@@ -17,31 +28,191 @@ from src.models import (
     SourceCodeHighLight,
 )
 
+STREAMING_BATCH_SIZE = 1000
 
-def _convert_asset_hierarchy(asset_hierarchy: dict, nodes: Optional[List[Asset]] = None) -> List[LeafAsset]:
-    nodes = nodes if nodes else []
-    if "children" in asset_hierarchy:
-        nodes.append(Asset(name=asset_hierarchy["name"], type=asset_hierarchy["type"]))
-        for child in asset_hierarchy["children"]:
-            return _convert_asset_hierarchy(asset_hierarchy=child, nodes=nodes)
-    leaf_assets = []
-    if "leaves" in asset_hierarchy:
-        for leaf in asset_hierarchy["leaves"]:
-            leaf_assets.append(
-                LeafAsset(
-                    nodes=nodes,
-                    parent=Asset(name=asset_hierarchy["name"], type=asset_hierarchy["type"]),
-                    leaf=Asset(name=leaf["name"], type=leaf["type"]),
+
+def iter_leaf_assets(
+    tree_v1: Iterable[dict],
+    asset_pool: Optional[AssetPool] = None,
+    ancestors: Tuple[Tuple[str, str], ...] = (),
+) -> Iterator[LeafAsset]:
+    """
+    Walks the v1 asset tree depth first and yields a `LeafAsset` for every leaf of every branch.
+
+    The tree is walked with an explicit stack instead of recursion, so deep trees do not hit the recursion limit.
+    The node list of a parent asset is built once, through the asset pool, and shared by all its leaves.
+
+    :param tree_v1: tree section of the v1 lineage.json
+    :type tree_v1: Iterable[dict]
+    :param asset_pool: Optional parameter - asset pool used to share the assets and node lists
+    :type asset_pool: AssetPool
+    :param ancestors: Optional parameter - (name, type) of the ancestors of the tree, when it is a subtree
+    :type ancestors: Tuple[Tuple[str, str], ...]
+    :returns: the leaf assets, in the order of the tree
+    :rtype: Iterator[LeafAsset]
+    """
+    asset_pool = asset_pool if asset_pool is not None else AssetPool()
+    # stack of (asset hierarchy, (name, type) of its ancestors), children are pushed in reverse to keep their order
+    stack: List[Tuple[dict, Tuple[Tuple[str, str], ...]]] = [
+        (asset_hierarchy, ancestors) for asset_hierarchy in reversed(list(tree_v1))
+    ]
+    while stack:
+        asset_hierarchy, ancestors = stack.pop()
+        name, type = asset_hierarchy["name"], asset_hierarchy["type"]
+        if asset_hierarchy.get("leaves"):
+            nodes = asset_pool.nodes(ancestors)
+            parent = asset_pool.asset(name=name, type=type)
+            for leaf in asset_hierarchy["leaves"]:
+                yield asset_pool.leaf_asset(
+                    nodes=nodes, parent=parent, leaf=asset_pool.asset(name=leaf["name"], type=leaf["type"])
                 )
-            )
-    return leaf_assets
+        if asset_hierarchy.get("children"):
+            path = ancestors + ((name, type),)
+            stack.extend((child, path) for child in reversed(asset_hierarchy["children"]))
+
+
+def iter_leaf_assets_streaming(reader: JSONStreamReader, trusted: bool = False) -> Iterator[LeafAsset]:
+    """
+    Same as `iter_leaf_assets`, but reads the tree section incrementally from a `JSONStreamReader` positioned on it.
+
+    The leaves and children of every asset hierarchy are converted as they are read instead of decoding a whole
+    system at once, so memory usage is bounded by the depth of the tree and the size of a single leaf, whatever the
+    size of the systems. The leaf assets are yielded in the order of the document, which is the order of
+    `iter_leaf_assets` when the leaves of an asset hierarchy come before its children.
+
+    :param reader: Reader positioned on the tree section of the v1 lineage.json
+    :type reader: JSONStreamReader
+    :param trusted: Construct the assets without validation
+    :type trusted: bool
+    :returns: the leaf assets, in the order of the document
+    :rtype: Iterator[LeafAsset]
+    """
+    # stack of the arrays and asset hierarchies being read, each yielding leaf assets and the ancestors of the next
+    # asset hierarchy to read; the top of the stack is read until it is exhausted
+    stack: List[Iterator[Union[LeafAsset, Tuple[Tuple[str, str], ...]]]] = [_read_children(reader, ())]
+    while stack:
+        event = next(stack[-1], None)
+        if event is None:
+            stack.pop()
+        elif isinstance(event, tuple):
+            stack.append(_read_asset_hierarchy(reader, event, trusted))
+        else:
+            yield event
+
+
+def _read_children(
+    reader: JSONStreamReader, ancestors: Tuple[Tuple[str, str], ...]
+) -> Iterator[Tuple[Tuple[str, str], ...]]:
+    # the caller reads every child from the reader before requesting the next one
+    for _ in reader.elements():
+        yield ancestors
+
+
+def _read_asset_hierarchy(
+    reader: JSONStreamReader, ancestors: Tuple[Tuple[str, str], ...], trusted: bool
+) -> Iterator[Union[LeafAsset, Tuple[Tuple[str, str], ...]]]:
+    asset_hierarchy: Dict[str, Any] = {}
+    for key in reader.members():
+        known = "name" in asset_hierarchy and "type" in asset_hierarchy
+        if key in ("name", "type"):
+            asset_hierarchy[key] = reader.value()
+        elif key == "leaves" and known:
+            # a pool per table keeps the memory bounded, the node list is shared by its leaves
+            asset_pool = AssetPool(trusted=trusted)
+            nodes = asset_pool.nodes(ancestors)
+            parent = asset_pool.asset(name=asset_hierarchy["name"], type=asset_hierarchy["type"])
+            for leaf in reader.items():
+                yield asset_pool.leaf_asset(
+                    nodes=nodes, parent=parent, leaf=asset_pool.asset(name=leaf["name"], type=leaf["type"])
+                )
+        elif key == "children" and known:
+            yield from _read_children(reader, ancestors + ((asset_hierarchy["name"], asset_hierarchy["type"]),))
+        elif key in ("leaves", "children"):
+            # the name or type comes later in the document, the value is decoded in full
+            asset_hierarchy[key] = reader.value()
+        else:
+            reader.skip()
+    if "leaves" in asset_hierarchy or "children" in asset_hierarchy:
+        yield from iter_leaf_assets([asset_hierarchy], asset_pool=AssetPool(trusted=trusted), ancestors=ancestors)
+
+
+def convert_tree(tree_v1: Iterable[dict], asset_pool: Optional[AssetPool] = None) -> Iterator[LeafAsset]:
+    return iter_leaf_assets(tree_v1=tree_v1, asset_pool=asset_pool)
 
 
-def convert_tree(tree_v1: List[dict]) -> List[LeafAsset]:
-    leaf_assets = []
-    for asset_hierarchy in tree_v1:
-        leaf_assets.extend(_convert_asset_hierarchy(asset_hierarchy=asset_hierarchy))
-    return leaf_assets
+class SourceFileCache:
+    """
+    Read access to the codebase files referred to by advanced custom technical lineage v1.
+
+    Every codebase file is opened once and memory-mapped, and the positions of the mappings are indexed by (file,
+    mapping), so extracting the source code of a lineage relationship only reads the bytes of its mapping. The
+    positions are character offsets in the text of the file: files which are not plain ASCII or contain carriage
+    returns are decoded once and kept as text instead.
+
+    :param codebase_files_v1: codebase_files section of the v1 lineage.json
+    :type codebase_files_v1: Dict[str, dict]
+    :param input_directory: Directory of the codebase files
+    :type input_directory: str
+    """
+
+    def __init__(self, codebase_files_v1: Dict[str, dict], input_directory: str) -> None:
+        self.input_directory = input_directory
+        self.positions: Dict[Tuple[str, str], Tuple[int, int]] = {
+            (source_code_file_v1, mapping_v1): (mapping_ref_v1.get("pos_start", 0), mapping_ref_v1.get("pos_len", 0))
+            for source_code_file_v1, codebase_file_v1 in codebase_files_v1.items()
+            for mapping_v1, mapping_ref_v1 in codebase_file_v1.get("mapping_refs", {}).items()
+        }
+        self._files: Dict[str, Union[mmap.mmap, str]] = {}
+
+    def __enter__(self) -> "SourceFileCache":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for content in self._files.values():
+            if isinstance(content, mmap.mmap):
+                content.close()
+        self._files.clear()
+
+    def _load(self, source_code_file_v1: str) -> Union[mmap.mmap, str]:
+        path = os.path.join(self.input_directory, source_code_file_v1)
+        with open(path, "rb") as f:
+            try:
+                content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty file
+                return ""
+        if content[:].isascii() and content.find(b"\r") == -1:
+            return content
+        content.close()
+        with open(path) as f:
+            return f.read()
+
+    def source_code_text(self, source_code_file_v1: str, mapping_v1: str) -> str:
+        """
+        Returns the source code of a mapping
+
+        :param source_code_file_v1: Path of the codebase file, relative to the input directory
+        :type source_code_file_v1: str
+        :param mapping_v1: Name of the mapping
+        :type mapping_v1: str
+        :returns: the source code of the mapping, or an empty string when the mapping is not in codebase_files
+        :rtype: str
+        """
+        content = self._files.get(source_code_file_v1)
+        if content is None:
+            content = self._files[source_code_file_v1] = self._load(source_code_file_v1)
+        pos_start, pos_len = self.positions.get((source_code_file_v1, mapping_v1), (0, 0))
+        if isinstance(content, str):
+            return content[pos_start : pos_start + pos_len]
+        return content[pos_start : pos_start + pos_len].decode("ascii")
 
 
 def _convert_lineage_source(
@@ -49,6 +220,7 @@ def _convert_lineage_source(
     codebase_files_v1: Dict[str, dict],
     custom_lineage_config: CustomLineageConfig,
     input_directory: str,
+    source_files: Optional[SourceFileCache] = None,
 ) -> Optional[SourceCode]:
     # simple custom technical lineage v1
     if "source_code" in lineage_relationship_v1:
@@ -71,49 +243,61 @@ def _convert_lineage_source(
         if not source_code_file_v1:
             return None
 
-        pos_start = (
-            codebase_files_v1.get(source_code_file_v1, {})
-            .get("mapping_refs", {})
-            .get(mapping_v1, {})
-            .get("pos_start", 0)
-        )
-        pos_len = (
-            codebase_files_v1.get(source_code_file_v1, {}).get("mapping_refs", {}).get(mapping_v1, {}).get("pos_len", 0)
-        )
-
-        try:
-            with open(os.path.join(input_directory, source_code_file_v1)) as source_code_file_v1_file:
-                return generate_source_code(
-                    source_code_text=source_code_file_v1_file.read()[pos_start : pos_start + pos_len],
+        if source_files is None:
+            with SourceFileCache(codebase_files_v1=codebase_files_v1, input_directory=input_directory) as source_files:
+                return _convert_lineage_source(
+                    lineage_relationship_v1=lineage_relationship_v1,
+                    codebase_files_v1=codebase_files_v1,
                     custom_lineage_config=custom_lineage_config,
-                    transformation_display_name=mapping_v1,
-                    highlights=[
-                        SourceCodeHighLight(start=highlight_v1["pos_start"], len=highlight_v1["pos_len"])
-                        for highlight_v1 in codebase_pos_v1
-                    ],
+                    input_directory=input_directory,
+                    source_files=source_files,
                 )
+
+        try:
+            source_code_text = source_files.source_code_text(source_code_file_v1, mapping_v1)
         except FileNotFoundError as e:
             print(
                 f"Could not find {source_code_file_v1} which is specified in your lineage.json file in \
                     the input directory: {input_directory}. Make sure all the referenced files are available."
             )
             raise e
+        return generate_source_code(
+            source_code_text=source_code_text,
+            custom_lineage_config=custom_lineage_config,
+            transformation_display_name=mapping_v1,
+            highlights=[
+                SourceCodeHighLight(start=highlight_v1["pos_start"], len=highlight_v1["pos_len"])
+                for highlight_v1 in codebase_pos_v1
+            ],
+        )
 
     return None
 
 
-def _convert_lineage_node(lineage_node: List[Dict[str, str]]) -> LeafAsset:
+def _convert_lineage_node(
+    lineage_node: List[Dict[str, str]],
+    asset_pool: Optional[AssetPool] = None,
+    asset_cache: Optional[AssetCache] = None,
+) -> LeafAsset:
+    if asset_cache is not None:
+        key = tuple(tuple(asset_dict.items()) for asset_dict in lineage_node)
+        asset = asset_cache.get(key)
+        if asset is None:
+            asset = asset_cache.put(key, _convert_lineage_node(lineage_node, asset_pool=asset_pool))
+        return cast(LeafAsset, asset)
+
+    asset_pool = asset_pool if asset_pool is not None else AssetPool()
     nodes = []
     for asset_dict in lineage_node:
         for asset_type, asset_name in asset_dict.items():
             if asset_type.lower() == "column":
-                leaf = Asset(name=asset_name, type=asset_type.title())
+                leaf = asset_pool.asset(name=asset_name, type=asset_type.title())
             elif asset_type.lower() == "table":
-                parent = Asset(name=asset_name, type=asset_type.title())
+                parent = asset_pool.asset(name=asset_name, type=asset_type.title())
             else:
-                nodes.append(Asset(name=asset_name, type=asset_type.title()))
+                nodes.append((asset_name, asset_type.title()))
 
-    return LeafAsset(nodes=nodes, parent=parent, leaf=leaf)
+    return asset_pool.leaf_asset(nodes=asset_pool.nodes(nodes), parent=parent, leaf=leaf)
 
 
 def convert_lineages(
@@ -122,21 +306,48 @@ def convert_lineages(
     custom_lineage_config: CustomLineageConfig,
     migrate_source_code: bool,
     input_directory: str,
+    asset_pool: Optional[AssetPool] = None,
+    source_files: Optional[SourceFileCache] = None,
+    asset_cache: Optional[AssetCache] = None,
 ) -> List[Lineage]:
+    asset_pool = asset_pool if asset_pool is not None else AssetPool()
+    if source_files is None:
+        with SourceFileCache(codebase_files_v1=codebase_files_v1, input_directory=input_directory) as source_files:
+            return convert_lineages(
+                lineage_v1=lineage_v1,
+                codebase_files_v1=codebase_files_v1,
+                custom_lineage_config=custom_lineage_config,
+                migrate_source_code=migrate_source_code,
+                input_directory=input_directory,
+                asset_pool=asset_pool,
+                source_files=source_files,
+                asset_cache=asset_cache,
+            )
+
     lineage_batch: List[Lineage] = []
+    # the cache may be shared by several calls, only the lookups of this call are counted
+    cache_hits, cache_misses = (asset_cache.hits, asset_cache.misses) if asset_cache is not None else (0, 0)
+    # timed wrappers only when profiling is enabled, the functions themselves otherwise
+    convert_lineage_node = profiling.timed("v1.convert_node", _convert_lineage_node)
+    convert_lineage_source = profiling.timed("v1.convert_source", _convert_lineage_source)
     for lineage_relationship_v1 in lineage_v1:
         # lineage relationship
-        lineage_relationship = Lineage(
-            src=_convert_lineage_node(lineage_relationship_v1["src_path"]),
-            trg=_convert_lineage_node(lineage_relationship_v1["trg_path"]),
+        lineage_relationship = asset_pool.lineage(
+            src=convert_lineage_node(
+                lineage_relationship_v1["src_path"], asset_pool=asset_pool, asset_cache=asset_cache
+            ),
+            trg=convert_lineage_node(
+                lineage_relationship_v1["trg_path"], asset_pool=asset_pool, asset_cache=asset_cache
+            ),
         )
         # source code
         if migrate_source_code:
-            source_code = _convert_lineage_source(
+            source_code = convert_lineage_source(
                 lineage_relationship_v1=lineage_relationship_v1,
                 codebase_files_v1=codebase_files_v1,
                 custom_lineage_config=custom_lineage_config,
                 input_directory=input_directory,
+                source_files=source_files,
             )
             if source_code:
                 lineage_relationship.source_code = source_code
@@ -144,20 +355,268 @@ def convert_lineages(
         # adding the lineage relationship and source code
         lineage_batch.append(lineage_relationship)
 
+    profiling.count("v1.lineages", len(lineage_batch))
+    if asset_cache is not None:
+        profiling.count("asset_cache.hits", asset_cache.hits - cache_hits)
+        profiling.count("asset_cache.misses", asset_cache.misses - cache_misses)
     return lineage_batch
 
 
-def convert(input_directory: str, output_directory: str, migrate_source_code: bool) -> None:
+def _asset_types() -> List[AssetType]:
+    column_type = AssetType(name="Column", uuid="00000000-0000-0000-0000-000000031008")
+    table_type = AssetType(name="Table", uuid="00000000-0000-0000-0000-000000031007")
+    schema_type = AssetType(name="Schema", uuid="00000000-0000-0000-0001-000400000002")
+    database_type = AssetType(name="Database", uuid="00000000-0000-0000-0000-000000031006")
+    system_type = AssetType(name="System", uuid="00000000-0000-0000-0000-000000031302")
+    return [system_type, database_type, schema_type, table_type, column_type]
+
+
+def _read_codebase_files(lineage_v1_json: str) -> Dict[str, dict]:
+    with open(lineage_v1_json) as f:
+        reader = JSONStreamReader(f)
+        for key in reader.members():
+            if key == "codebase_files":
+                return reader.value()
+            reader.skip()
+    return {}
+
+
+class _ConversionWorker:
+    # state of a worker process of convert_lineages_parallel, created once per process: the codebase files are opened
+    # and the assets are cached once for all the chunks converted by the process
+    def __init__(
+        self,
+        codebase_files_v1: Dict[str, dict],
+        custom_lineage_config: CustomLineageConfig,
+        migrate_source_code: bool,
+        input_directory: str,
+        trusted: bool,
+        asset_cache_size: int,
+    ) -> None:
+        self.codebase_files_v1 = codebase_files_v1
+        self.custom_lineage_config = custom_lineage_config
+        self.migrate_source_code = migrate_source_code
+        self.input_directory = input_directory
+        self.trusted = trusted
+        # the memory maps are released when the process exits
+        self.source_files = SourceFileCache(codebase_files_v1=codebase_files_v1, input_directory=input_directory)
+        self.asset_cache = AssetCache(maxsize=asset_cache_size) if asset_cache_size > 0 else None
+
+    def convert(self, lineage_v1: List[dict]) -> List[Lineage]:
+        # a new asset pool per chunk keeps the memory of the process bounded
+        return convert_lineages(
+            lineage_v1=lineage_v1,
+            codebase_files_v1=self.codebase_files_v1,
+            custom_lineage_config=self.custom_lineage_config,
+            migrate_source_code=self.migrate_source_code,
+            input_directory=self.input_directory,
+            asset_pool=AssetPool(trusted=self.trusted),
+            source_files=self.source_files,
+            asset_cache=self.asset_cache,
+        )
+
+
+_conversion_worker: Optional[_ConversionWorker] = None
+
+
+def _init_conversion_worker(
+    codebase_files_v1: Dict[str, dict],
+    custom_lineage_config: CustomLineageConfig,
+    migrate_source_code: bool,
+    input_directory: str,
+    trusted: bool,
+    asset_cache_size: int,
+) -> None:
+    # initializer of the worker processes, the arguments are sent once per process instead of once per chunk
+    global _conversion_worker
+    _conversion_worker = _ConversionWorker(
+        codebase_files_v1=codebase_files_v1,
+        custom_lineage_config=custom_lineage_config,
+        migrate_source_code=migrate_source_code,
+        input_directory=input_directory,
+        trusted=trusted,
+        asset_cache_size=asset_cache_size,
+    )
+
+
+def _convert_lineages_chunk(lineage_v1: List[dict]) -> List[Lineage]:
+    # runs in a worker process, which writes its own source code files
+    assert _conversion_worker is not None
+    return _conversion_worker.convert(lineage_v1)
+
+
+def convert_lineages_parallel(
+    lineage_v1_chunks: Iterable[List[dict]],
+    codebase_files_v1: Dict[str, dict],
+    custom_lineage_config: CustomLineageConfig,
+    migrate_source_code: bool,
+    input_directory: str,
+    workers: int,
+    trusted: bool = False,
+    asset_cache_size: int = DEFAULT_ASSET_CACHE_SIZE,
+) -> Iterator[Lineage]:
+    """
+    Converts chunks of v1 lineage relationships in a process pool and yields the lineage relationships in the order
+    of the input. At most two chunks per worker are in flight, so chunks can be read lazily from a large input.
+    `codebase_files_v1` and the configuration are sent once to every worker process, which keeps its codebase files
+    open and its asset cache for all its chunks; only the chunks themselves are sent per task.
+
+    :param lineage_v1_chunks: Chunks of v1 lineage relationships
+    :type lineage_v1_chunks: Iterable[List[dict]]
+    :param workers: Number of processes
+    :type workers: int
+    :param asset_cache_size: Size of the `AssetCache` of every worker process, 0 disables the cache
+    :type asset_cache_size: int
+    :returns: the converted lineage relationships
+    :rtype: Iterator[Lineage]
+    """
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_conversion_worker,
+        initargs=(
+            codebase_files_v1,
+            custom_lineage_config,
+            migrate_source_code,
+            input_directory,
+            trusted,
+            asset_cache_size,
+        ),
+    ) as executor:
+        pending: Deque[Future] = deque()
+        for lineage_v1_chunk in lineage_v1_chunks:
+            pending.append(executor.submit(_convert_lineages_chunk, lineage_v1_chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _chunks(items: Iterable[dict], chunk_size: int) -> Iterator[List[dict]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _convert_lineages_streaming(
+    lineage_v1_items: Iterator[dict],
+    codebase_files_v1: Dict[str, dict],
+    custom_lineage_config: CustomLineageConfig,
+    migrate_source_code: bool,
+    input_directory: str,
+    trusted: bool,
+    source_files: SourceFileCache,
+    workers: int = 1,
+    asset_cache_size: int = DEFAULT_ASSET_CACHE_SIZE,
+) -> Iterator[Lineage]:
+    if workers > 1:
+        yield from convert_lineages_parallel(
+            lineage_v1_chunks=_chunks(lineage_v1_items, STREAMING_BATCH_SIZE),
+            codebase_files_v1=codebase_files_v1,
+            custom_lineage_config=custom_lineage_config,
+            migrate_source_code=migrate_source_code,
+            input_directory=input_directory,
+            workers=workers,
+            trusted=trusted,
+            asset_cache_size=asset_cache_size,
+        )
+        return
+    # the bounded asset cache is shared by the batches
+    asset_cache = AssetCache(maxsize=asset_cache_size) if asset_cache_size > 0 else None
+    for lineage_v1_batch in _chunks(lineage_v1_items, STREAMING_BATCH_SIZE):
+        # a new asset pool per batch keeps the memory bounded
+        yield from convert_lineages(
+            lineage_v1=lineage_v1_batch,
+            codebase_files_v1=codebase_files_v1,
+            custom_lineage_config=custom_lineage_config,
+            migrate_source_code=migrate_source_code,
+            input_directory=input_directory,
+            asset_pool=AssetPool(trusted=trusted),
+            source_files=source_files,
+            asset_cache=asset_cache,
+        )
+
+
+def _convert_streaming(
+    lineage_v1_json: str,
+    input_directory: str,
+    custom_lineage_config: CustomLineageConfig,
+    migrate_source_code: bool,
+    trusted: bool,
+    max_lineages_per_file: Optional[int],
+    max_bytes_per_file: Optional[int],
+    workers: int = 1,
+    asset_cache_size: int = DEFAULT_ASSET_CACHE_SIZE,
+) -> None:
+    # codebase_files may come after the lineages in the document, so it is read in a first pass
+    codebase_files_v1 = _read_codebase_files(lineage_v1_json) if migrate_source_code else {}
+
+    source_files = SourceFileCache(codebase_files_v1, input_directory)
+    with source_files, open(lineage_v1_json) as f, LineageDigestSet() as lineage_digests:
+        with LineageWriter(
+            custom_lineage_config=custom_lineage_config,
+            asset_types=_asset_types(),
+            max_lineages_per_file=max_lineages_per_file,
+            max_bytes_per_file=max_bytes_per_file,
+        ) as writer:
+            reader = JSONStreamReader(f)
+            for key in reader.members():
+                if key == "tree":
+                    writer.add_assets(iter_leaf_assets_streaming(reader, trusted=trusted))
+                elif key == "lineages":
+                    for lineage in _convert_lineages_streaming(
+                        lineage_v1_items=reader.items(),
+                        codebase_files_v1=codebase_files_v1,
+                        custom_lineage_config=custom_lineage_config,
+                        migrate_source_code=migrate_source_code,
+                        input_directory=input_directory,
+                        trusted=trusted,
+                        source_files=source_files,
+                        workers=workers,
+                        asset_cache_size=asset_cache_size,
+                    ):
+                        # duplicates are detected on a digest of the lineage relationships instead of a
+                        # LineageGraph, which would hold all of them in memory
+                        if lineage_digests.add(lineage):
+                            writer.add_lineage(lineage)
+                else:
+                    reader.skip()
+        duplicates = lineage_digests.duplicates
+    profiling.count("lineage.duplicates", duplicates)
+    if duplicates:
+        print(f"Dropped {duplicates} duplicate lineage relationships.")
+
+
+def convert(
+    input_directory: str,
+    output_directory: str,
+    migrate_source_code: bool,
+    deduplicate_source_code: bool = False,
+    trusted: bool = False,
+    max_lineages_per_file: Optional[int] = None,
+    max_bytes_per_file: Optional[int] = None,
+    streaming: bool = False,
+    workers: int = 1,
+    asset_cache_size: int = DEFAULT_ASSET_CACHE_SIZE,
+) -> None:
     """
     Main function that converts custom lineage v1 format into batch custom lineage format (v3).
+
+    When `trusted` is set, the lineage models are constructed without validation; only use it for input which is
+    known to be valid. `max_lineages_per_file` and `max_bytes_per_file` shard the output, see `LineageWriter`.
+    When `streaming` is set, lineage.json is parsed incrementally and the converted lineage relationships are written
+    as they are converted, so memory usage is bounded by the size of `codebase_files` instead of the whole document;
+    the tree section is read incrementally as well, see `iter_leaf_assets_streaming`.
+    When `workers` is higher than 1, the lineage relationships are converted in chunks in a process pool; the output
+    is the same as the sequential conversion. `asset_cache_size` is the number of most recently used assets kept built
+    in an `AssetCache` (per worker process), 0 disables the cache.
     """
 
     # input directory should contain lineage.json file to be converted
     lineage_v1_json = os.path.join(input_directory, "lineage.json")
-    try:
-        with open(lineage_v1_json) as f:
-            custom_lineage = json.load(f)
-    except FileNotFoundError:
+    if not os.path.isfile(lineage_v1_json):
         print(f"Could not find lineage.json in the input directory: {input_directory}")
         return
 
@@ -165,31 +624,75 @@ def convert(input_directory: str, output_directory: str, migrate_source_code: bo
         application_name="custom-lineage-batch-converted",
         output_directory=output_directory,
         source_code_directory_name="source_codes",
+        deduplicate_source_code=deduplicate_source_code,
     )
 
+    if streaming:
+        _convert_streaming(
+            lineage_v1_json=lineage_v1_json,
+            input_directory=input_directory,
+            custom_lineage_config=custom_lineage_config,
+            migrate_source_code=migrate_source_code,
+            trusted=trusted,
+            max_lineages_per_file=max_lineages_per_file,
+            max_bytes_per_file=max_bytes_per_file,
+            workers=workers,
+            asset_cache_size=asset_cache_size,
+        )
+        return
+
+    with open(lineage_v1_json) as f, profiling.stage("v1.read"):
+        custom_lineage = json.load(f)
+    profiling.snapshot_memory("v1.read")
+
     # Generate asset types
-    column_type = AssetType(name="Column", uuid="00000000-0000-0000-0000-000000031008")
-    table_type = AssetType(name="Table", uuid="00000000-0000-0000-0000-000000031007")
-    schema_type = AssetType(name="Schema", uuid="00000000-0000-0000-0001-000400000002")
-    database_type = AssetType(name="Database", uuid="00000000-0000-0000-0000-000000031006")
-    system_type = AssetType(name="System", uuid="00000000-0000-0000-0000-000000031302")
-    asset_types = [system_type, database_type, schema_type, table_type, column_type]
+    asset_types = _asset_types()
 
-    # creating the assets
-    leaf_assets = convert_tree(custom_lineage.get("tree", []))
+    # creating the assets, which are written as they are generated
+    leaf_assets = convert_tree(custom_lineage.get("tree", []), asset_pool=AssetPool(trusted=trusted))
 
-    # creating the lineage relationships
-    lineage_batch = convert_lineages(
-        lineage_v1=custom_lineage.get("lineages", []),
-        codebase_files_v1=custom_lineage.get("codebase_files", {}),
-        custom_lineage_config=custom_lineage_config,
-        migrate_source_code=migrate_source_code,
-        input_directory=input_directory,
-    )
+    # creating the lineage relationships and dropping the duplicates; the parallel conversion is lazy, so both are
+    # timed together
+    lineage_v1 = custom_lineage.get("lineages", [])
+    lineage_batch: Iterable[Lineage]
+    lineage_graph = LineageGraph()
+    with profiling.stage("v1.convert_lineages"):
+        if workers > 1 and len(lineage_v1) > 1:
+            lineage_batch = convert_lineages_parallel(
+                lineage_v1_chunks=_chunks(lineage_v1, max(1, -(-len(lineage_v1) // (4 * workers)))),
+                codebase_files_v1=custom_lineage.get("codebase_files", {}),
+                custom_lineage_config=custom_lineage_config,
+                migrate_source_code=migrate_source_code,
+                input_directory=input_directory,
+                workers=workers,
+                trusted=trusted,
+                asset_cache_size=asset_cache_size,
+            )
+        else:
+            lineage_batch = convert_lineages(
+                lineage_v1=lineage_v1,
+                codebase_files_v1=custom_lineage.get("codebase_files", {}),
+                custom_lineage_config=custom_lineage_config,
+                migrate_source_code=migrate_source_code,
+                input_directory=input_directory,
+                asset_pool=AssetPool(trusted=trusted),
+                asset_cache=AssetCache(maxsize=asset_cache_size) if asset_cache_size > 0 else None,
+            )
+
+        lineage_graph.add_lineages(lineage_batch)
+    profiling.count("lineage.duplicates", lineage_graph.duplicates)
+    profiling.snapshot_memory("v1.convert_lineages")
+    if lineage_graph.duplicates:
+        print(f"Dropped {lineage_graph.duplicates} duplicate lineage relationships.")
 
     # creating the json files
     generate_json_files(
-        assets=leaf_assets, lineages=lineage_batch, custom_lineage_config=custom_lineage_config, asset_types=asset_types
+        assets=leaf_assets,
+        lineages=lineage_graph.lineages(),
+        custom_lineage_config=custom_lineage_config,
+        asset_types=asset_types,
+        max_lineages_per_file=max_lineages_per_file,
+        max_bytes_per_file=max_bytes_per_file,
     )
 
 
@@ -204,9 +707,75 @@ if __name__ == "__main__":
         action=argparse.BooleanOptionalAction,
         help="Option indicating whether source_code and mapping should be migrated or not",
     )
+    parser.add_argument(
+        "--deduplicate_source_code",
+        action=argparse.BooleanOptionalAction,
+        help="Option indicating whether identical source code should be stored only once, "
+        "in a file named after the hash of its content",
+    )
+    parser.add_argument(
+        "--trusted",
+        action=argparse.BooleanOptionalAction,
+        help="Option indicating whether the validation of the lineage models should be skipped, "
+        "only for input which is known to be valid",
+    )
+    parser.add_argument(
+        "--max_lineages_per_file",
+        type=int,
+        help="Shard the output in batch definitions of at most this many lineage relationships",
+    )
+    parser.add_argument(
+        "--max_bytes_per_file",
+        type=int,
+        help="Shard the output in batch definitions with a lineage.json of at most this many bytes",
+    )
+    parser.add_argument(
+        "--streaming",
+        action=argparse.BooleanOptionalAction,
+        help="Option indicating whether lineage.json should be parsed and converted incrementally, "
+        "for files too large to be loaded in memory",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1, help="Number of processes used to convert the lineages in parallel"
+    )
+    parser.add_argument(
+        "--asset_cache_size",
+        type=int,
+        default=DEFAULT_ASSET_CACHE_SIZE,
+        help="Number of most recently used assets kept built, so assets repeated on many lineages are built once; 0 "
+        "disables the cache",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="REPORT_PATH",
+        help="Print a summary of the time spent per stage, counters and memory usage, "
+        "and write the full report as json to REPORT_PATH when provided",
+    )
+    parser.add_argument(
+        "--profile_memory",
+        action=argparse.BooleanOptionalAction,
+        help="With --profile, also trace the Python memory allocations (slower)",
+    )
     args = parser.parse_args()
+    if args.profile is not None:
+        profiling.enable(trace_memory=bool(args.profile_memory))
     convert(
         input_directory=args.source_directory,
         output_directory=args.target_directory,
         migrate_source_code=args.migrate_source_code,
+        deduplicate_source_code=bool(args.deduplicate_source_code),
+        trusted=bool(args.trusted),
+        max_lineages_per_file=args.max_lineages_per_file,
+        max_bytes_per_file=args.max_bytes_per_file,
+        streaming=bool(args.streaming),
+        workers=args.workers,
+        asset_cache_size=args.asset_cache_size,
     )
+
+    profiler = profiling.disable()
+    if profiler is not None:
+        print(profiler.summary())
+        if args.profile:
+            profiler.write_report(args.profile)